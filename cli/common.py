@@ -4,7 +4,6 @@ import re
 import click
 import yaml
 from pathlib import Path
-from urllib.request import urlretrieve
 
 import tcp
 
@@ -36,12 +36,11 @@ def deleteSelection(client, prefix=None, suffix=None):
     for k, v in body.items():
         logging.info(f"  - {k}: {v}")
     try:
-        res = client.query().data.post(body)
-        for uri in res["files"] + res["dirs"]:
-            if uri == "/": continue
+        uris = [uri for uri in client.iter_data(**body) if uri != "/"]
+        for uri in uris:
             logging.info(f"removing {uri}")
-            client.query().data.remove.post({'uri':uri})
-            logging.info(f"removed {uri}")
+        client.remove_many(uris)
+        logging.info(f"removed {len(uris)} files and directories")
     except tcp.exceptions.HttpClientError as err:
         logging.error(err.content)
         return False
@@ -1,33 +1,20 @@
 from .common import *
 
 def monitor(client, pid):
-    res = None
+    res = {}
     state = None
-    lastState = None
-    delay=0
     logging.info(f"Start monitoring process {pid}...")
-    while True:
-        # No delay for first loop, then 1 min
-        time.sleep(delay)
-        delay=60
-        # get the process info
-        res = client.query().app.process(str(pid)).get()
+    # States are pushed over the websocket, or polled at adaptive intervals
+    for res in client.watch_process(pid):
         state = res["state"]
-        # if no change, new loop
-        if state == lastState: continue
-        # if change, log it and store it
         logging.info(f"-> Current state: {state}")
-        lastState = state
-        # if a final state has been reached, exit the monitoring loop
-        if state=="dead": break
-        elif state.startswith("failed"): break
     logging.info(f"Stop monitoring process {pid}...")
-    if res['errors']:
+    if res.get('errors'):
         msg  = "Errors encountered during process:\n--> " 
         msg += res['errors'].replace('\n', '\n--> ')
         logging.error(msg)
         return False
-    elif state.startswith("failed"):
+    elif state is None or state.startswith("failed"):
         logging.error(f"Failed final state ({state})")
         return False
     return True
@@ -36,16 +23,15 @@ def collect(client, pid, dst=None):
     logging.info(f"Collect result for process {pid}")
     collected = []
     try:
-        dst = Path(pid) if dst is None else Path(dst)
-        res = client.query().app.process(str(pid)).get()
-        src = res['outputs']
-        logging.info(f"found {len(res['outputs'])} files")
-        for name, src in res['outputs'].items():
-            dst_file = dst/name
-            logging.info(f"downloading {src} to {dst_file}...")
-            dst_file.parent.mkdir(parents=True, exist_ok=True)
-            urlretrieve(src, dst_file)
-            collected.append(dst_file)
+        dst = Path(str(pid)) if dst is None else Path(dst)
+        # Outputs already collected with the same content are skipped
+        res = client.collect_outputs(pid, dst)
+        logging.info(f"found {len(res)} files")
+        for path, status in res.items():
+            logging.info(f"{path}: {status}")
+            collected.append(Path(path))
     except tcp.exceptions.HttpClientError as err:
         logging.error(err.content)
+    except tcp.exceptions.DownloadError as err:
+        logging.error(str(err))
     return collected
@@ -0,0 +1,690 @@
+import asyncio
+import json
+import os
+import sys
+
+from . import exceptions
+from .client import client as _client
+from .clientAPI import clientResource
+from .json_serializer import FastJsonSerializer
+
+_json = FastJsonSerializer()
+
+
+class _Response(object):
+    """
+    Failed answer carried by exceptions, read as the requests.Response of tcp.client errors.
+    """
+
+    def __init__(self, resp, content):
+        self.status_code = self.status = resp.status
+        self.reason = resp.reason
+        self.url = str(resp.url)
+        self.headers = resp.headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+
+class Resource(object):
+    """
+    Asynchronous counterpart of clientResource.
+
+    Attributes and calls build the URL as with slumber (`query().app.processes`,
+    `query().data.next(token)`), and the HTTP methods are coroutines.
+    Failed requests are retried following the client's RetryPolicy, awaiting asyncio.sleep.
+    """
+
+    def __init__(self, client, url):
+        self._client = client
+        self._url = url
+
+    def __getattr__(self, item):
+        if item.startswith("_"):
+            raise AttributeError(item)
+
+        return Resource(self._client, f"{self._url}/{item}")
+
+    def __call__(self, id=None):
+        if id is None:
+            return self
+
+        return Resource(self._client, f"{self._url}/{id}")
+
+    async def get(self, **kwargs):
+        return await self._request("GET", params=kwargs)
+
+    async def post(self, data=None, **kwargs):
+        return await self._request("POST", data, params=kwargs)
+
+    async def put(self, data=None, **kwargs):
+        return await self._request("PUT", data, params=kwargs)
+
+    async def patch(self, data=None, **kwargs):
+        return await self._request("PATCH", data, params=kwargs)
+
+    async def delete(self, **kwargs):
+        return await self._request("DELETE", params=kwargs)
+
+    async def _request(self, method, data=None, params=None, track=True):
+        import aiohttp
+        from .logs import warning
+
+        if track and self._client.keep_track:
+            await self._client._track(self._url, method)
+
+        session = self._client._get_session()
+        policy = self._client.retry
+        limiter = self._client.rate_limiter
+        breaker = self._client.circuit_breaker
+        body = None if data is None else json.dumps(data)
+        retry = 0
+
+        if breaker is not None:
+            path = self._url.replace(self._client.host, "")
+            key = breaker.key(self._client.host, path)
+
+        while True:
+            response = None
+            content = b""
+            failed = True
+
+            if breaker is not None:
+                breaker.before(key)
+
+            if limiter is not None:
+                slot = await limiter.acquire_async()
+
+            try:
+                async with session.request(
+                    method,
+                    self._url,
+                    data=body,
+                    params=params or None,
+                    headers={"Content-Type": "application/json"},
+                ) as resp:
+                    content = await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if not policy.should_retry(method, retry, error=err):
+                    raise
+                reason = type(err).__name__
+            else:
+                failed = resp.status >= 500
+
+                if resp.status < 400:
+                    policy.on_success()
+                    return self._deserialize(resp, content)
+
+                if resp.status >= 500 and policy.exhausted(retry):
+                    raise exceptions.HttpServerError(
+                        f"API endpoint still in maintenance after {retry + 1} attempts."
+                        "Stop trying.",
+                        response=_Response(resp, content),
+                        content=content,
+                    )
+
+                if resp.status == 401:
+                    raise exceptions.InvalidCredentials(
+                        f"Client Error {resp.status}: {self._url}",
+                        response=_Response(resp, content),
+                        content=content,
+                    )
+
+                if not policy.should_retry(method, retry, resp.status):
+                    if resp.status < 500:
+                        raise exceptions.HttpClientError(
+                            f"Client Error {resp.status}: {self._url}",
+                            response=_Response(resp, content),
+                            content=content,
+                        )
+                    raise exceptions.HttpServerError(
+                        f"Server Error {resp.status}: {self._url}",
+                        response=_Response(resp, content),
+                        content=content,
+                    )
+
+                response, reason = resp, str(resp.status)
+            finally:
+                if limiter is not None:
+                    limiter.release(slot, len(body or "") + len(content))
+                if breaker is not None:
+                    breaker.record(key, failed)
+
+            if breaker is not None:
+                breaker.check(key)
+
+            retry_in = policy.delay(retry, response)
+            retry += 1
+
+            warning(
+                f"API endpoint is currently unavailable ({reason}). Try again in "
+                f"{retry_in:.1f} seconds... (retry {retry} on {policy.max_retries})"
+            )
+            await asyncio.sleep(retry_in)
+
+    def _deserialize(self, resp, content):
+        if not content:
+            return content
+
+        if resp.content_type == "application/json":
+            return _json.loads(content)
+
+        if resp.content_type in ["text/plain", "text/html"]:
+            return content.decode("utf-8")
+
+        return content
+
+
+class client(object):
+    """
+    Asynchronous OOP to TCP API, on top of aiohttp.
+
+    Mirrors tcp.client: `await client.query().data.post({...})`. Every query goes
+    through one pooled aiohttp session, created on first use from the running loop.
+
+    Args:
+        host (str): uri of TCP SDK as protocol + ip + port + api version (e.g https://api.thecrossproduct.xyz/v1)
+        token (str): connection JWT. If not set, the environment variable TCP_API_TOKEN is used.
+        user_agent (str): Additional info for logging purposes.
+        keep_track (bool): log every requests in a dict (f'{addr}+{method}':integer).
+        pool_size (int): maximum number of connections kept open by the session.
+        keep_alive (bool): reuse connections between queries (default).
+        retry (tcp.retry.RetryPolicy): optional. As in tcp.client; the default budget is shared by every query of the client.
+        rate_limiter (tcp.ratelimit.RateLimiter): optional. Paces queries, awaiting instead of blocking.
+        circuit_breaker: optional. Either True or a tcp.breaker.CircuitBreaker, as in tcp.client.
+
+    Exceptions:
+        tcp.exceptions.InvalidCredentials
+
+    Notes:
+        aiohttp is an optional dependency: pip install tcp-sdk[aio]
+    """
+
+    user_agent = _client.user_agent
+
+    def __init__(
+        self,
+        host: str = None,
+        token: str = None,
+        user_agent: str = None,
+        keep_track=False,
+        pool_size: int = 100,
+        keep_alive: bool = True,
+        retry=None,
+        rate_limiter=None,
+        circuit_breaker=None,
+    ):
+        if host == None:
+            host = os.environ.get("TCP_HOST", "https://api.thecrossproduct.xyz/v1")
+
+        self.host = host
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.keep_track = keep_track
+
+        if retry is None:
+            from .retry import RetryBudget, RetryPolicy
+
+            retry = RetryPolicy(
+                max_retries=clientResource.MAX_RETRIES,
+                max_delay=clientResource.MAX_DELAY,
+                budget=RetryBudget(),
+            )
+
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+
+        if circuit_breaker is True:
+            from .breaker import CircuitBreaker
+
+            circuit_breaker = CircuitBreaker()
+
+        self.circuit_breaker = circuit_breaker or None
+
+        if user_agent:
+            self.user_agent = user_agent
+
+        self.token = token or os.environ.get("TCP_API_TOKEN")
+
+        if not self.token:
+            raise exceptions.InvalidCredentials(
+                "No token available: either set token or the env var $TCP_API_TOKEN"
+            )
+
+        self._session = None
+        self._transfer_session = None
+        self._tracking = False
+        self._tracking_lock = asyncio.Lock()
+
+    async def _get_endpoints(self):
+        routes = await Resource(self, f"{self.host}/help")._request("GET", track=False)
+
+        if isinstance(routes, dict):
+            return routes["routes"]
+        return routes
+
+    async def _track(self, url, method):
+        """
+        Counts a query in TrackUsage, initialized from the routes of the API on the first one.
+        """
+        from types import SimpleNamespace
+        from .track_usage import TrackUsage
+
+        if not self._tracking:
+            async with self._tracking_lock:
+                if not self._tracking:
+                    routes = await self._get_endpoints()
+                    TrackUsage().init(SimpleNamespace(_get_endpoints=lambda: routes))
+                    self._tracking = True
+
+        TrackUsage().count(url.replace(self.host, "") + "+" + method)
+
+    def _make_session(self, headers):
+        import aiohttp
+
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.pool_size, force_close=not self.keep_alive
+            ),
+            headers=dict(headers, **{"User-Agent": self.user_agent}),
+        )
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = self._make_session(
+                {"Authorization": f"Bearer {self.token}"}
+            )
+
+        return self._session
+
+    def _get_transfer_session(self):
+        """
+        Session used against presigned storage URLs: it carries no TCP credentials.
+        """
+
+        if self._transfer_session is None or self._transfer_session.closed:
+            self._transfer_session = self._make_session({})
+
+        return self._transfer_session
+
+    async def close(self):
+        """
+        Closes the connections held by the sessions.
+        """
+
+        for session in [self._session, self._transfer_session]:
+            if session is not None:
+                await session.close()
+
+        self._session = None
+        self._transfer_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def query(self):
+        """
+        Use this method to perform a query to TCP API.
+        """
+
+        return Resource(self, self.host)
+
+    async def upload(
+        self,
+        src_local,
+        dest_s3,
+        max_part_size=None,
+        overwrite: bool = False,
+        num_tries: int = 3,
+        delay_between_tries: float = 1.0,
+        verbose: bool = False,
+        compute_md5sum: bool = True,
+        max_concurrency: int = None,
+    ):
+        """
+        Multipart upload of a file or a directory from local repository to S3 repository.
+
+        Args:
+            src_local (str): path to local file or directory
+            dest_s3 (str): desired path in TCP S3 bucket
+            max_part_size (str): optional. Size of each part to be sent. Either an int (number of bytes) or a human formatted string (example: "1Gb")
+            overwrite (bool): optional. If the destination already exists, abort. (false by default).
+            num_tries (int): optional. Number of attempts per part.
+            delay_between_tries (float): optional. Seconds awaited between attempts.
+            verbose (bool): optional.
+            compute_md5sum (bool): optional. Sends the md5 of the file, computed while its parts are sent.
+            max_concurrency (int): optional. Number of parts in flight, over every file (default: pool_size).
+
+        Exceptions:
+            tcp.exceptions.UploadError
+        """
+
+        max_concurrency = max_concurrency or self.pool_size
+        semaphore = asyncio.Semaphore(max_concurrency)
+        args = [max_part_size, overwrite, num_tries, delay_between_tries, verbose]
+        args += [compute_md5sum, semaphore, max_concurrency]
+
+        if not os.path.isdir(src_local):
+            return await self._upload_file(src_local, dest_s3, *args)
+
+        root_in_s3 = os.path.basename(os.path.normpath(src_local))
+
+        if dest_s3:
+            root_in_s3 = os.path.join(os.path.normpath(dest_s3), root_in_s3)
+
+        uploads = []
+
+        for root, dirs, names in os.walk(src_local):
+            for name in names:
+                path = os.path.normpath(os.path.join(root, name))
+                new_dest_s3 = os.path.join(
+                    root_in_s3, os.path.relpath(path, src_local)
+                ).replace("\\", "/")
+
+                uploads.append(self._upload_file(path, new_dest_s3, *args))
+
+        await asyncio.gather(*uploads)
+
+    async def _upload_file(
+        self,
+        src_local,
+        dest_s3,
+        max_part_size,
+        overwrite,
+        num_tries,
+        delay_between_tries,
+        verbose,
+        compute_md5sum,
+        semaphore,
+        max_concurrency,
+    ):
+        import aiohttp
+        from .digest import OrderedHasher
+        from .upload import FileSlice
+
+        if not overwrite:
+            try:
+                await self.query().data.exists.post({"uri": dest_s3})
+            except exceptions.HttpClientError as err:
+                pass
+            else:
+                raise exceptions.UploadError(
+                    f"{dest_s3} already exists. Please set overwrite to True."
+                )
+
+        if verbose:
+            sys.stderr.write(
+                f"Uploading {src_local} to {dest_s3} (max part size: {max_part_size})\n"
+            )
+
+        file_size = os.path.getsize(src_local)
+        presigned_body = {"uri": dest_s3, "size": str(file_size)}
+
+        if max_part_size:
+            presigned_body.update({"part_size": max_part_size})
+
+        try:
+            resp = await self.query().data.upload.multipart.post(presigned_body)
+        except exceptions.HttpClientError as err:
+            raise exceptions.UploadError(str(err), **err.__dict__) from err
+
+        upload_id = resp["upload_id"]
+        part_size = resp["part_size"]
+        hasher = None
+        if compute_md5sum:
+            hasher = OrderedHasher.for_parts(
+                src_local, file_size, part_size, max_concurrency
+            )
+
+        async def send(part_no, url):
+            offset = (part_no - 1) * part_size
+
+            for try_num in range(num_tries):
+                if try_num > 0:
+                    await asyncio.sleep(delay_between_tries)
+
+                async with semaphore:
+                    body = await asyncio.to_thread(
+                        FileSlice,
+                        src_local,
+                        offset,
+                        part_size,
+                        on_read=hasher.feed if hasher else None,
+                    )
+
+                    try:
+                        async with self._get_transfer_session().put(
+                            url,
+                            data=_blocks(body),
+                            headers={"Content-Length": str(len(body))},
+                        ) as r:
+                            await r.read()
+                            status, etag = r.status, r.headers.get("ETag", "")
+                    except aiohttp.ClientError:
+                        continue
+                    finally:
+                        body.close()
+
+                if status == 200:
+                    return {"ETag": etag.strip('"'), "PartNumber": part_no}
+
+            raise exceptions.UploadError(f"Part number {part_no} failed")
+
+        try:
+            parts = await asyncio.gather(
+                *[send(part_no, url) for part_no, url in enumerate(resp["parts"], 1)]
+            )
+        except BaseException:
+            try:
+                await self.query().data.upload.multipart.abort.post(
+                    {"upload_id": upload_id, "uri": dest_s3}
+                )
+            except exceptions.HttpClientError:
+                pass
+            raise
+
+        body = {"upload_id": upload_id, "parts": parts, "uri": dest_s3}
+
+        if hasher:
+            body["md5sum"] = await asyncio.to_thread(hasher.hexdigest)
+
+        try:
+            await self.query().data.upload.multipart.complete.post(body)
+        except exceptions.HttpClientError as err:
+            raise exceptions.UploadError(str(err), **err.__dict__) from err
+
+        if verbose:
+            sys.stderr.write(f"Uploaded {src_local} to {dest_s3}\n")
+
+    async def download(
+        self,
+        src_s3,
+        dest_local,
+        chunk_size: int = 1024 * 1024,
+        num_tries: int = 3,
+        delay_between_tries: float = 1.0,
+        verbose: bool = False,
+        ignore_md5: bool = True,
+        num_connections: int = 1,
+        segment_size: int = 16 * 1024 * 1024,
+    ):
+        """
+        Download a file from S3 repository to local repository.
+
+        Args:
+            src_s3 (str): path to file in TCP S3 bucket
+            dest_local (str): local path of the downloaded file
+            chunk_size (int): optional. Size of the chunks written to disk.
+            num_tries (int): optional. Number of attempts per request.
+            delay_between_tries (float): optional. Seconds awaited between attempts.
+            verbose (bool): optional.
+            ignore_md5 (bool): optional. Skip the comparison with the md5 given by the API.
+            num_connections (int): optional. Number of parallel Range requests.
+            segment_size (int): optional. Size of the ranges requested when num_connections > 1.
+
+        Exceptions:
+            tcp.exceptions.DownloadError
+        """
+
+        from .digest import OrderedHasher
+        from .download import _segments
+
+        body = {"uri": src_s3}
+
+        try:
+            resp = await self.query().data.download.post(body)
+        except exceptions.HttpClientError as err:
+            raise exceptions.DownloadError(str(err), **err.__dict__) from err
+
+        url = resp[src_s3]
+        md5sum = resp.get("md5sum")
+
+        lock = asyncio.Lock()
+
+        async def refresh(stale):
+            nonlocal url
+            async with lock:
+                if url == stale:
+                    url = (await self.query().data.download.post(body))[src_s3]
+            return url
+
+        if verbose:
+            sys.stderr.write(f"Downloading {src_s3} to {dest_local}\n")
+
+        total = None
+
+        if num_connections > 1:
+            total = await self._content_length(url, refresh)
+
+        segments = [[0, None]] if total is None else _segments(
+            total, num_connections, segment_size
+        )
+
+        fd = os.open(
+            dest_local,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+            0o666,
+        )
+
+        try:
+            if total is not None:
+                os.ftruncate(fd, total)
+
+            hasher = None
+            if not ignore_md5 and md5sum:
+                hasher = OrderedHasher(dest_local, total or 0)
+
+            semaphore = asyncio.Semaphore(num_connections)
+
+            async def fetch(start, end):
+                async with semaphore:
+                    for try_num in range(num_tries):
+                        if try_num > 0:
+                            await asyncio.sleep(delay_between_tries)
+
+                        current = url
+                        try:
+                            return await self._download_segment(
+                                current, fd, start, end, chunk_size, hasher
+                            )
+                        except exceptions.DownloadError as err:
+                            if try_num == num_tries - 1:
+                                raise
+                            if getattr(err, "status", None) == 403:
+                                await refresh(current)
+
+            sizes = await asyncio.gather(*[fetch(*ss) for ss in segments])
+        finally:
+            os.close(fd)
+
+        if hasher:
+            if total is None:
+                hasher.size = sum(sizes)
+
+            digest = await asyncio.to_thread(hasher.hexdigest)
+
+            if digest != md5sum:
+                raise exceptions.DownloadError(
+                    f"md5sum of {dest_local} ({digest}) does not match the API ({md5sum})"
+                )
+
+    async def _content_length(self, url, refresh):
+        """
+        Returns the size of the object behind url, or None if Range requests are not honoured.
+        """
+
+        for try_num in range(2):
+            session = self._get_transfer_session()
+
+            async with session.get(url, headers={"Range": "bytes=0-0"}) as r:
+                if r.status == 403 and try_num == 0:
+                    url = await refresh(url)
+                    continue
+
+                if r.status != 206:
+                    return None
+
+                total = r.headers.get("Content-Range", "").rpartition("/")[2]
+
+                return int(total) if total.isdigit() else None
+
+    async def _download_segment(self, url, fd, start, end, chunk_size, hasher):
+        """
+        Writes the bytes [start, end) of url at the same offset of fd (the whole object if end is None).
+
+        Returns:
+            The number of bytes written.
+        """
+
+        import aiohttp
+        from .download import _write_at
+
+        headers = {}
+        if end is not None:
+            headers["Range"] = f"bytes={start}-{end - 1}"
+
+        offset = start
+
+        try:
+            async with self._get_transfer_session().get(url, headers=headers) as r:
+                if r.status >= 400:
+                    raise exceptions.DownloadError(
+                        f"Storage answered {r.status}", status=r.status
+                    )
+
+                if end is not None and r.status != 206:
+                    raise exceptions.DownloadError(f"Range {start}-{end - 1} not honoured")
+
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    await asyncio.to_thread(_write_at, fd, chunk, offset)
+                    if hasher:
+                        await asyncio.to_thread(hasher.feed, offset, chunk)
+                    offset += len(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise exceptions.DownloadError(str(err)) from err
+
+        if end is not None and offset != end:
+            raise exceptions.DownloadError(
+                f"Range {start}-{end - 1} ended after {offset - start} bytes"
+            )
+
+        return offset - start
+
+
+async def _blocks(body):
+    """
+    Yields the blocks of a FileSlice, each read in a worker thread.
+    """
+
+    while True:
+        block = await asyncio.to_thread(body.read)
+
+        if not block:
+            return
+
+        yield block
@@ -0,0 +1,159 @@
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Values of the circuit_state gauge
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast the API calls of a route that keeps failing.
+
+    Every host and route (ids replaced by <id>, see tcp.metrics.route_of) has its own
+    circuit. It opens after failure_threshold consecutive failed attempts (5xx answers,
+    connection errors and timeouts; other answers count as successes). While open, calls
+    raise tcp.exceptions.CircuitOpenError without being sent. After reset_timeout seconds,
+    half_open_max_calls probes are let through: the circuit closes if they succeed and
+    opens again if one fails.
+
+    Args:
+        failure_threshold (int): consecutive failures opening a circuit.
+        reset_timeout (float): seconds a circuit stays open before it is probed.
+        half_open_max_calls (int): probes in flight at once while half-open.
+        per_route (bool): one circuit per route (default). If false, one circuit per host.
+        metrics (tcp.metrics.Metrics): optional. The state of every circuit is reported as the circuit_state gauge (0 closed, 1 open, 2 half-open).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        per_route: bool = True,
+        metrics=None,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.per_route = per_route
+        self.metrics = metrics
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def key(self, host: str, path: str):
+        """
+        Circuit of a call to path (relative to host).
+        """
+
+        from .metrics import route_of
+
+        return (host, route_of(path) if self.per_route else "*")
+
+    def _circuit(self, key):
+        circuit = self._circuits.get(key)
+
+        if circuit is None:
+            circuit = self._circuits[key] = {
+                "state": CLOSED,
+                "failures": 0,
+                "opened": 0.0,
+                "probes": 0,
+            }
+            self._report(key, circuit)
+
+        return circuit
+
+    def _set_state(self, key, circuit, state):
+        if circuit["state"] != state:
+            circuit["state"] = state
+            self._report(key, circuit)
+
+    def _report(self, key, circuit):
+        if self.metrics is not None:
+            self.metrics.set_gauge(
+                "circuit_state",
+                {"host": key[0], "route": key[1]},
+                STATE_VALUES[circuit["state"]],
+            )
+
+    def state(self, key):
+        with self._lock:
+            return self._circuit(key)["state"]
+
+    def _check_open(self, key, circuit):
+        from .exceptions import CircuitOpenError
+
+        retry_in = circuit["opened"] + self.reset_timeout - time.monotonic()
+
+        if circuit["state"] == OPEN and retry_in > 0:
+            raise CircuitOpenError(
+                f"Circuit of {key[0]}{key[1]} is open after {circuit['failures']} "
+                f"consecutive failures. Try again in {retry_in:.1f} seconds.",
+                key=key,
+                retry_in=retry_in,
+            )
+
+    def check(self, key):
+        """
+        Raises tcp.exceptions.CircuitOpenError if the circuit of key is open, e.g. to give up
+        retrying without waiting.
+        """
+
+        with self._lock:
+            self._check_open(key, self._circuit(key))
+
+    def before(self, key):
+        """
+        Called before an attempt.
+
+        Exceptions:
+            tcp.exceptions.CircuitOpenError: if the circuit of key is open, or half-open with enough probes in flight.
+        """
+
+        from .exceptions import CircuitOpenError
+
+        with self._lock:
+            circuit = self._circuit(key)
+
+            if circuit["state"] == OPEN:
+                self._check_open(key, circuit)
+                self._set_state(key, circuit, HALF_OPEN)
+                circuit["probes"] = 0
+
+            if circuit["state"] == HALF_OPEN:
+                if circuit["probes"] >= self.half_open_max_calls:
+                    raise CircuitOpenError(
+                        f"Circuit of {key[0]}{key[1]} is half-open and already probed.",
+                        key=key,
+                        retry_in=0.0,
+                    )
+
+                circuit["probes"] += 1
+
+    def record(self, key, failed: bool):
+        """
+        Called once an attempt allowed by before has ended.
+        """
+
+        with self._lock:
+            circuit = self._circuit(key)
+
+            if circuit["state"] == HALF_OPEN:
+                circuit["probes"] = max(0, circuit["probes"] - 1)
+
+            if not failed:
+                circuit["failures"] = 0
+                self._set_state(key, circuit, CLOSED)
+                return
+
+            circuit["failures"] += 1
+
+            if (
+                circuit["state"] == HALF_OPEN
+                or circuit["failures"] >= self.failure_threshold
+            ):
+                circuit["opened"] = time.monotonic()
+                self._set_state(key, circuit, OPEN)
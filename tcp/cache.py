@@ -0,0 +1,185 @@
+import base64
+import collections
+import json
+import os
+import threading
+import time
+
+# Seconds a response of these routes is served without asking the API.
+# "*" matches one path segment, a trailing "**" any number of them.
+DEFAULT_TTLS = {
+    "/help": 3600,
+    "/help/**": 3600,
+    "/app": 300,
+    "/app/datacenters": 300,
+    "/app/datacenters/**": 300,
+    "/app/*/*/inputs": 300,
+}
+
+
+def route_matches(pattern: str, path: str):
+    """
+    Returns True if path (e.g. "/app/test/helloworld/inputs") matches pattern (e.g. "/app/*/*/inputs").
+    """
+
+    pp = pattern.strip("/").split("/")
+    ss = path.strip("/").split("/")
+
+    if pp[-1] == "**":
+        pp = pp[:-1]
+        if len(ss) < len(pp):
+            return False
+    elif len(ss) != len(pp):
+        return False
+
+    return all(p == "*" or p == s for p, s in zip(pp, ss))
+
+
+class ResponseCache(object):
+    """
+    LRU cache of the GET responses of TCP API.
+
+    A response is served from memory while its route's TTL runs. Once it has expired,
+    the next GET is sent with If-None-Match if the API gave an ETag, and a 304 answer
+    renews the cached response without transferring it again.
+
+    Args:
+        ttls (dict): seconds of freshness per route pattern (default: DEFAULT_TTLS). Routes matching no pattern are not cached.
+        default_ttl (float): TTL of routes matching no pattern (default: 0, not cached).
+        max_entries (int): responses kept before the least recently used ones are evicted.
+        path (str): optional. JSON file the cache is persisted to, and loaded from.
+    """
+
+    def __init__(
+        self,
+        ttls: dict = None,
+        default_ttl: float = 0,
+        max_entries: int = 1024,
+        path: str = None,
+    ):
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        if path:
+            self.load()
+
+    def ttl(self, route: str):
+        """
+        TTL of route, a path relative to the API host.
+        """
+
+        for pattern, ttl in self.ttls.items():
+            if route_matches(pattern, route):
+                return ttl
+
+        return self.default_ttl
+
+    @staticmethod
+    def key(url: str, params=None, auth: str = None):
+        """
+        Key of a GET of url with params, on behalf of the credentials auth (never stored in clear).
+        """
+
+        import hashlib
+
+        auth = hashlib.sha1((auth or "").encode()).hexdigest()
+
+        return json.dumps([auth, url, sorted((params or {}).items())], default=str)
+
+    def get(self, key: str):
+        """
+        Returns the entry stored under key, fresh or not, or None.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+            return entry
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() < entry["expires"]
+
+    def put(self, key: str, ttl: float, status: int, headers: dict, content: bytes):
+        entry = {
+            "expires": time.time() + ttl,
+            "ttl": ttl,
+            "etag": headers.get("ETag"),
+            "status": status,
+            "headers": dict(headers),
+            "content": content,
+        }
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        self.save()
+
+        return entry
+
+    def renew(self, entry):
+        """
+        Marks entry fresh again, after the API answered 304 Not Modified.
+        """
+
+        with self._lock:
+            entry["expires"] = time.time() + entry["ttl"]
+
+        self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+        self.save()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            for key, entry in entries:
+                entry["content"] = base64.b64decode(entry["content"])
+                self._entries[key] = entry
+
+    def save(self):
+        """
+        Writes the cache to path, if set.
+        """
+
+        if not self.path:
+            return
+
+        with self._lock:
+            entries = [
+                [key, dict(entry, content=base64.b64encode(entry["content"]).decode())]
+                for key, entry in self._entries.items()
+            ]
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self._entries)
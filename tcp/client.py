@@ -1,12 +1,14 @@
 import platform
 import requests
 import sys
+import threading
 
-from slumber.serialize import Serializer, JsonSerializer
+from slumber.serialize import Serializer
 from slumber.exceptions import HttpClientError, HttpServerError
 
 from .clientAPI import clientAPI
 from . import exceptions
+from .json_serializer import FastJsonSerializer
 from .text_serializer import PlainTextSerializer
 from ._version import __version__
 
@@ -26,6 +28,15 @@ class client(object):
         usermail: str = None,
         passwd: str = None,
         keep_track=False,
+        pool_size: int = 10,
+        keep_alive: bool = True,
+        cache=None,
+        collect_metrics=False,
+        retry=None,
+        rate_limiter=None,
+        circuit_breaker=None,
+        websocket_host: str = None,
+        websocket=False,
     ):
         """
         OOP to TCP API.
@@ -37,6 +48,15 @@ class client(object):
             usermail (str): If no token, then it will connect using credentials.
             passwd (str)
             keep_track (bool): log every requests in a dict (f'{addr}+{method}':integer).
+            websocket_host (str): optional. uri of TCP websocket, used to follow processes. If not set, the environment variable TCP_WEBSOCKET_HOST is used.
+            websocket: optional. Either True or a tcp.ws.WebSocketTransport: queries are then sent as actions over one persistent websocket connection, falling back to HTTP when it is unavailable.
+            pool_size (int): maximum number of connections kept open per host by the shared session.
+            keep_alive (bool): reuse connections between queries (default). If false, every query closes its connection.
+            retry (tcp.retry.RetryPolicy): optional. When and how long failed queries are retried. By default, 5xx and 429 answers, and connection errors of idempotent methods, are retried with jittered exponential backoff, within a retry budget shared by every query of the client.
+            rate_limiter (tcp.ratelimit.RateLimiter): optional. Paces queries (requests/s, bytes/s, queries in flight), possibly across processes.
+            circuit_breaker: optional. Either True or a tcp.breaker.CircuitBreaker: queries to a route failing again and again then raise tcp.exceptions.CircuitOpenError at once instead of being retried, until a probe succeeds.
+            collect_metrics: optional. Either True or a tcp.metrics.Metrics: latency, bytes, retries and errors of every query, and throughput of transfers, are then collected in client.metrics.
+            cache: optional. Either True or a tcp.cache.ResponseCache: GET responses of static routes (help, app specs, datacenters) are then cached and revalidated with their ETag.
 
         Exceptions:
             tcp.exceptions.InvalidCredentials
@@ -54,6 +74,53 @@ class client(object):
                 host = "https://api.thecrossproduct.xyz/v1"
 
         self.host = host
+        self.websocket_host = websocket_host or os.environ.get("TCP_WEBSOCKET_HOST")
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+
+        if cache is True:
+            from .cache import ResponseCache
+
+            cache = ResponseCache()
+
+        self.cache = None if cache is False else cache
+
+        if collect_metrics is True:
+            from .metrics import Metrics
+
+            collect_metrics = Metrics()
+
+        self.metrics = collect_metrics or None
+
+        if retry is None:
+            from .clientAPI import clientResource
+            from .retry import RetryBudget, RetryPolicy
+
+            retry = RetryPolicy(
+                max_retries=clientResource.MAX_RETRIES,
+                max_delay=clientResource.MAX_DELAY,
+                budget=RetryBudget(),
+            )
+
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+
+        if circuit_breaker is True:
+            from .breaker import CircuitBreaker
+
+            circuit_breaker = CircuitBreaker(metrics=self.metrics)
+
+        self.circuit_breaker = circuit_breaker or None
+        self.websocket = websocket or None
+
+        self._serializer = Serializer(
+            default="json", serializers=[FastJsonSerializer(), PlainTextSerializer()]
+        )
+
+        self._session = None
+        self._session_key = None
+        self._transfer_session = None
+        self._session_lock = threading.Lock()
 
         if user_agent:
             self.user_agent = user_agent
@@ -68,13 +135,14 @@ class client(object):
             import json
             from .logs import warning
 
-            resp = clientAPI(
-                self.host,
-                self.host,
-                session=self._make_requests_session(),
-                auth=HTTPBasicAuth(usermail, passwd),
-                keep_track=keep_track,
-            ).auth.login.get()
+            with self._make_requests_session() as session:
+                resp = clientAPI(
+                    self.host,
+                    self.host,
+                    session=session,
+                    auth=HTTPBasicAuth(usermail, passwd),
+                    keep_track=keep_track,
+                ).auth.login.get()
 
             self.token = resp["token"]
 
@@ -95,28 +163,133 @@ class client(object):
     def _make_requests_session(self):
         session = requests.Session()
 
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
         session.headers.update({"User-Agent": self.user_agent})
 
+        if not self.keep_alive:
+            session.headers.update({"Connection": "close"})
+
         if self.token:
             session.headers.update({"Authorization": f"Bearer {self.token}"})
 
         return session
 
+    def _get_session(self):
+        """
+        Returns the pooled session shared by every query.
+
+        The session is created on first use and rebuilt if the token or the user agent changes.
+        """
+
+        key = (self.token, self.user_agent)
+
+        with self._session_lock:
+            if self._session is None or self._session_key != key:
+                if self._session is not None:
+                    self._session.close()
+
+                self._session = self._make_requests_session()
+                self._session_key = key
+
+            return self._session
+
+    def _get_transfer_session(self):
+        """
+        Returns the pooled session used against presigned storage URLs.
+
+        It carries no TCP credentials, and its pool is large enough for a full executor.
+        """
+
+        with self._session_lock:
+            if self._transfer_session is None:
+                from .executor import default_concurrency
+
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=self.pool_size,
+                    pool_maxsize=max(self.pool_size, default_concurrency()),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": self.user_agent})
+
+                self._transfer_session = session
+
+            return self._transfer_session
+
+    def _get_websocket(self):
+        """
+        Returns the WebSocketTransport shared by every query, or None if queries go over HTTP.
+        """
+
+        with self._session_lock:
+            if self.websocket is True:
+                if not self.websocket_host:
+                    return None
+
+                from .ws import WebSocketTransport
+
+                self.websocket = WebSocketTransport(self.websocket_host, self.token)
+
+            return self.websocket
+
+    def close(self):
+        """
+        Closes the connections held by the shared sessions, and the websocket.
+        """
+
+        if self.websocket not in (None, True):
+            self.websocket.close()
+
+        with self._session_lock:
+            for session in [self._session, self._transfer_session]:
+                if session is not None:
+                    session.close()
+            self._session = None
+            self._session_key = None
+            self._transfer_session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def query(self, **kwargs):
         """
         Use this method to perform a query to TCP API.
+
+        Every query goes through the client's pooled session, so connections are reused across calls.
+
+        With websocket=True, calls whose websocket action (path segments and method joined by
+        "_", e.g. data_download_post) is known and idempotent (tcp.ws.IDEMPOTENT_ACTIONS) are
+        sent over TCP websocket instead.
+
+        With stream=[names of arrays] (e.g. `client.query(stream=["files", "dirs"]).data.post(body)`),
+        JSON answers are not decoded at once but returned as a tcp.jsonstream.JsonArrayStream,
+        yielding the entries of these arrays as they are received.
         """
 
         if hasattr(self, "keep_track"):
             kwargs["keep_track"] = self.keep_track
 
+        kwargs.setdefault("cache", self.cache)
+        kwargs.setdefault("metrics", self.metrics)
+        kwargs.setdefault("retry", self.retry)
+        kwargs.setdefault("limiter", self.rate_limiter)
+        kwargs.setdefault("breaker", self.circuit_breaker)
+        kwargs.setdefault("ws", self._get_websocket())
+
         api = clientAPI(
             self.host,
             self.host,
-            session=self._make_requests_session(),
-            serializer=Serializer(
-                default="json", serializers=[JsonSerializer(), PlainTextSerializer()]
-            ),
+            session=self._get_session(),
+            serializer=self._serializer,
             **kwargs,
         )
 
@@ -126,15 +299,18 @@ class client(object):
         api = clientAPI(
             self.host,
             self.host + "/help",
-            session=self._make_requests_session(),
-            serializer=Serializer(
-                default="json", serializers=[JsonSerializer(), PlainTextSerializer()]
-            ),
+            session=self._get_session(),
+            serializer=self._serializer,
+            cache=self.cache,
+            metrics=self.metrics,
+            retry=self.retry,
+            limiter=self.rate_limiter,
+            breaker=self.circuit_breaker,
         )
         routes = api._get_resource(**api._store).get()
         if isinstance(routes, dict):
-            return api._get_resource(**api._store).get()["routes"]
-        return api._get_resource(**api._store).get()
+            return routes["routes"]
+        return routes
 
     def help(self, app=None):
         """
@@ -227,6 +403,16 @@ class client(object):
             "download\t- from TCP S3 storage to your local storage\n"
             "upload\t\t- from your local storage to TCP S3 storage\n"
             "upload_gdrive\t - from your google drive to TCP S3 storage\n"
+            "iter_data\t- lazy listing of your files, page after page\n"
+            "iter_processes\t- lazy listing of your processes, page after page\n"
+            "exists_many\t- existence of many files, in batches\n"
+            "remove_many\t- removal of many files, in batches\n"
+            "copy_many\t- copy of many files, in batches\n"
+            "run_many\t- launch of many processes at once\n"
+            "watch_process\t- states of a process until it ends\n"
+            "watch_processes\t- states of many processes until they end\n"
+            "track_processes\t- states of many processes, through listings\n"
+            "collect_outputs\t- download of the outputs of a process\n"
             #               "metrics\t\t- display %cpu and %rss for a given proces"
         )
 
@@ -252,6 +438,455 @@ class client(object):
                 print("Use this line to query help on a specific application:\n")
                 print(f"client.help(app='{list_of_apps[0]}')")
 
+    def iter_data(
+        self,
+        prefix: str = None,
+        suffix: str = None,
+        page_size: int = None,
+        stream: bool = False,
+        **kwargs,
+    ):
+        """
+        Lazily lists files and directories, following the pages of data.post.
+
+        The next page is fetched in the background while the current one is consumed.
+
+        Args:
+            prefix (str): optional. Only list URIs starting with prefix.
+            suffix (str): optional. Only list URIs ending with suffix.
+            page_size (int): optional. Number of entries per page (items_per_page).
+            stream (bool): optional. Decode every page incrementally, so that memory is bounded by one entry rather than one page. Pages are then fetched one after the other.
+            kwargs: other fields of the data.post body (e.g. group, expands_info)
+
+        Returns:
+            A generator of the entries of "files" then "dirs" of every page.
+        """
+        from .paging import iter_items, iter_pages, iter_streamed_items
+
+        body = dict(kwargs)
+
+        if prefix:
+            body["prefix"] = prefix
+        if suffix:
+            body["suffix"] = suffix
+        if page_size:
+            body["items_per_page"] = page_size
+
+        if stream:
+            api = self.query(stream=["files", "dirs"]).data
+
+            return iter_streamed_items(api, lambda: api.post(body))
+
+        api = self.query().data
+
+        return iter_items(iter_pages(api, lambda: api.post(body)), ["files", "dirs"])
+
+    def iter_processes(self, page_size: int = None, **kwargs):
+        """
+        Lazily lists processes, following the pages of app.processes.
+
+        Args:
+            page_size (int): optional. Number of processes per page (items_per_page).
+            kwargs: other query parameters of app.processes
+
+        Returns:
+            A generator of the processes of every page.
+        """
+        from .paging import iter_items, iter_pages
+
+        params = dict(kwargs)
+
+        if page_size:
+            params["items_per_page"] = page_size
+
+        api = self.query().app.processes
+
+        return iter_items(iter_pages(api, lambda: api.get(**params)), ["processes"])
+
+    def watch_process(self, pid, **kwargs):
+        """
+        Follows a process until it ends.
+
+        Args:
+            pid: id of the process
+            kwargs: options of tcp.watch.ProcessWatcher (e.g. min_interval, max_interval)
+
+        Returns:
+            A generator of the body of app.process(pid).get every time its state changes, up to a terminal state (dead, terminated or failed*).
+        """
+
+        for _, process in self.watch_processes([pid], **kwargs):
+            yield process
+
+    def watch_processes(self, pids, **kwargs):
+        """
+        Follows many processes until they all end.
+
+        States are received over TCP websocket, or polled at adaptive intervals when it is unavailable.
+
+        Args:
+            pids (list): ids of the processes
+            kwargs: options of tcp.watch.ProcessWatcher (e.g. min_interval, max_interval)
+
+        Returns:
+            A generator of (pid, body of app.process(pid).get) every time the state of a process changes.
+        """
+        from .watch import ProcessWatcher
+
+        return iter(ProcessWatcher(self, pids, **kwargs))
+
+    def track_processes(self, pids=(), **kwargs):
+        """
+        Tracks the states of many processes through listings of app.processes.
+
+        Args:
+            pids (list): optional. ids of the processes (more can be added with tracker.add)
+            kwargs: options of tcp.tracker.ProcessTracker (e.g. intervals, page_size, filters of app.processes)
+
+        Returns:
+            A tcp.tracker.ProcessTracker: see its refresh, run, on_transition and events methods.
+        """
+        from .tracker import ProcessTracker
+
+        return ProcessTracker(self, pids, **kwargs)
+
+    def collect_outputs(
+        self,
+        pid,
+        dest=None,
+        max_concurrency: int = None,
+        chunk_size: int = 1024 * 1024,
+        num_tries: int = 3,
+        delay_between_tries: float = 1.0,
+        num_connections: int = 1,
+        segment_size: int = 16 * 1024 * 1024,
+    ):
+        """
+        Downloads the outputs of a process, many at once.
+
+        Outputs are listed page after page with app.process.outputs(pid), and fetched from
+        their URLs over the pooled transfer session, trying again like download. At most
+        2 * max_concurrency outputs are pending at once.
+
+        An output already in dest with the size and md5 of the remote object is not fetched
+        again. Every fetched output is checked against the md5 of the remote object.
+
+        Args:
+            pid: id of the process
+            dest (str): optional. Local directory of the outputs (default: ./<pid>).
+            max_concurrency (int): optional. Number of outputs fetched at once (default: pool_size).
+            chunk_size (int): optional. Chunk size of the streamed downloads.
+            num_tries (int): optional. Attempts per output.
+            delay_between_tries (float): optional. Seconds between two attempts.
+            num_connections (int): optional. If greater than 1, each output is fetched over that many parallel Range requests.
+            segment_size (int): optional. Size of each Range request in parallel mode.
+
+        Returns:
+            dict mapping the local path of every output to "downloaded" or "skipped", in completion order.
+
+        Exceptions:
+            tcp.exceptions.DownloadError: if an output cannot be fetched, or its key is outside of dest. Downloads not started yet are cancelled.
+            tcp.exceptions.HttpClientError: if the outputs cannot be listed.
+
+        Notes:
+
+            The md5 of a remote object is given by its ETag, which storage only sets for
+            objects uploaded in one part: other outputs are always fetched, and not checked.
+        """
+        import itertools
+        import os
+        import time
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from .download import (
+            TRANSIENT_ERRORS,
+            PresignedURL,
+            _download_ranges,
+            _download_stream,
+            _file_md5,
+            _remote_object,
+        )
+        from .executor import make_executor
+        from .paging import iter_items, iter_pages
+
+        pid = str(pid)
+        dest = os.path.abspath(pid if dest is None else str(dest))
+        max_concurrency = max_concurrency or self.pool_size
+        session = self._get_transfer_session()
+
+        def remote_object(url):
+            for try_num in range(num_tries):
+                if try_num > 0:
+                    time.sleep(delay_between_tries)
+                try:
+                    return _remote_object(session, url)
+                except TRANSIENT_ERRORS as err:
+                    if try_num == (num_tries - 1):
+                        raise exceptions.DownloadError(str(err), err.__dict__)
+
+        def collect(output):
+            path = os.path.normpath(os.path.join(dest, output["key"]))
+
+            if os.path.commonpath([dest, path]) != dest:
+                raise exceptions.DownloadError(f"{output['key']} is outside of {dest}")
+
+            started = time.perf_counter()
+            size, md5sum = remote_object(output["url"])
+
+            if (
+                md5sum is not None
+                and os.path.isfile(path)
+                and os.path.getsize(path) == size
+                and _file_md5(path) == md5sum
+            ):
+                return path, "skipped"
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            source = PresignedURL(output["url"])
+            done, received = False, None
+
+            if num_connections > 1:
+                done, received = _download_ranges(
+                    session,
+                    source,
+                    path,
+                    num_connections,
+                    segment_size,
+                    chunk_size,
+                    num_tries,
+                    delay_between_tries,
+                    False,
+                    compute_md5=md5sum is not None,
+                    metrics=self.metrics,
+                )
+
+            if not done:
+                received = _download_stream(
+                    session,
+                    source,
+                    path,
+                    chunk_size,
+                    num_tries,
+                    delay_between_tries,
+                    False,
+                    md5sum is not None,
+                )
+
+            if md5sum is not None and received != md5sum:
+                raise exceptions.DownloadError(f"md5sums of {output['key']} do not match")
+
+            if self.metrics:
+                self.metrics.observe_transfer(
+                    "download",
+                    "file",
+                    os.path.getsize(path),
+                    time.perf_counter() - started,
+                )
+
+            return path, "downloaded"
+
+        api = self.query().app.process.outputs(pid)
+        todo = iter_items(iter_pages(api, api.get), ["outputs"])
+        pending = set()
+        out = {}
+
+        with make_executor("thread", max_concurrency) as executor:
+            try:
+                while True:
+                    room = 2 * max_concurrency - len(pending)
+
+                    for output in itertools.islice(todo, room):
+                        pending.add(executor.submit(collect, output))
+
+                    if not pending:
+                        return out
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        path, status = future.result()
+                        out[path] = status
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def exists_many(self, uris, batch_size: int = 100, max_concurrency: int = None):
+        """
+        Checks the existence of many files or directories.
+
+        URIs are sent batch_size at a time to data.exists, which answers 404 unless every
+        URI of the list exists. A refused batch is split in halves until its missing URIs
+        are isolated: k missing URIs among a batch cost about k * log2(batch_size / k)
+        more requests, and up to 2 * batch_size when none exists. To check URIs that
+        mostly do not exist, listing their common prefix with iter_data is cheaper.
+
+        Args:
+            uris (list): URIs to check
+            batch_size (int): optional. Number of URIs per request.
+            max_concurrency (int): optional. Number of requests in flight.
+
+        Returns:
+            dict mapping each URI to True if it exists, False otherwise
+        """
+        from .executor import make_executor
+
+        uris = list(dict.fromkeys(uris))
+
+        def exists(batch):
+            try:
+                self.query().data.exists.post({"uri": batch})
+            except exceptions.HttpClientError as err:
+                return False
+            return True
+
+        batches = [uris[ii : ii + batch_size] for ii in range(0, len(uris), batch_size)]
+        out = {}
+
+        with make_executor("thread", max_concurrency or self.pool_size) as executor:
+            while batches:
+                futures = [executor.submit(exists, batch) for batch in batches]
+                refused = []
+
+                for batch, future in zip(batches, futures):
+                    if future.result():
+                        out.update({uu: True for uu in batch})
+                    elif len(batch) == 1:
+                        out[batch[0]] = False
+                    else:
+                        half = len(batch) // 2
+                        refused += [batch[:half], batch[half:]]
+
+                batches = refused
+
+        return {uu: out[uu] for uu in uris}
+
+    def remove_many(self, uris, batch_size: int = 100):
+        """
+        Removes many files or directories, batch_size URIs per data.remove request.
+
+        Returns:
+            list of the responses of data.remove
+        """
+
+        uris = list(uris)
+
+        return [
+            self.query().data.remove.post({"uri": uris[ii : ii + batch_size]})
+            for ii in range(0, len(uris), batch_size)
+        ]
+
+    def copy_many(self, src, dest, batch_size: int = 100, **options):
+        """
+        Copies many files or directories, batch_size pairs per data.copy request.
+
+        Args:
+            src (list): URIs to copy
+            dest (list): destination of each URI of src
+            batch_size (int): optional. Number of pairs per request.
+            options: forwarded in every request body (e.g. overwrite=True)
+
+        Returns:
+            list of the responses of data.copy
+        """
+
+        src, dest = list(src), list(dest)
+
+        if len(src) != len(dest):
+            raise ValueError("src and dest must have the same length")
+
+        return [
+            self.query().data.copy.post(
+                dict(
+                    options,
+                    src=src[ii : ii + batch_size],
+                    dest=dest[ii : ii + batch_size],
+                )
+            )
+            for ii in range(0, len(src), batch_size)
+        ]
+
+    def run_many(
+        self,
+        domain: str,
+        app: str,
+        bodies,
+        max_concurrency: int = None,
+        tags=None,
+        rate_limiter=None,
+        return_exceptions: bool = False,
+    ):
+        """
+        Launches one process of app per body, many at once.
+
+        Bodies are read lazily and at most 2 * max_concurrency are pending at once, so that
+        sweeps of thousands of processes need neither thousands of threads nor much memory.
+
+        Args:
+            domain (str): domain of the application (e.g. "test")
+            app (str): name of the application (e.g. "helloworld")
+            bodies: iterable of app.<domain>.<app>.run bodies (e.g. {"inputs": {...}})
+            max_concurrency (int): optional. Number of requests in flight (default: pool_size).
+            tags: optional. Iterable of one tag per body: it is added to the tags of the process and identifies its pid.
+            rate_limiter (tcp.ratelimit.RateLimiter): optional. Paces the launches, instead of the client's limiter.
+            return_exceptions (bool): optional. Yield the error of a failed launch instead of raising it.
+
+        Returns:
+            A generator of (tag, pid) in the order pids are allocated, tag being the index of the body if tags is not set.
+
+        Exceptions:
+            tcp.exceptions.HttpClientError, tcp.exceptions.HttpServerError, requests.exceptions.ConnectionError: if a launch fails and return_exceptions is false. Launches not sent yet are cancelled.
+        """
+        import collections
+        import itertools
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from .executor import make_executor
+
+        max_concurrency = max_concurrency or self.pool_size
+        query = {} if rate_limiter is None else {"limiter": rate_limiter}
+
+        def run(tag, body):
+            body = dict(body)
+
+            if tags is not None:
+                body["tags"] = list(body.get("tags") or []) + [str(tag)]
+
+            api = getattr(getattr(self.query(**query).app, domain), app)
+
+            return api.run.post(body)["id"]
+
+        keys = itertools.count() if tags is None else iter(tags)
+        todo = zip(keys, bodies)
+        pending = collections.OrderedDict()
+
+        with make_executor("thread", max_concurrency) as executor:
+            try:
+                while True:
+                    room = 2 * max_concurrency - len(pending)
+
+                    for tag, body in itertools.islice(todo, room):
+                        pending[executor.submit(run, tag, body)] = tag
+
+                    if not pending:
+                        return
+
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        tag = pending.pop(future)
+
+                        try:
+                            yield tag, future.result()
+                        except (
+                            exceptions.tcpHttpBaseException,
+                            requests.exceptions.RequestException,
+                        ) as err:
+                            if not return_exceptions:
+                                raise
+                            yield tag, err
+            finally:
+                for future in pending:
+                    future.cancel()
+
     def upload_gdrive(
         self,
         src_gdrive: str,
@@ -321,6 +956,11 @@ class client(object):
         verbose: bool = False,
         compute_md5sum: bool = True,
         md5sum_chunk_size=8192,
+        max_concurrency: int = None,
+        executor="thread",
+        resume: bool = False,
+        journal_dir: str = None,
+        singlepart_threshold: int = 16 * 1024 * 1024,
     ):
         """
         Multipart upload of a file from local repository to S3 repository.
@@ -330,6 +970,16 @@ class client(object):
             dest_s3 (str): desired path in TCP S3 bucket
             max_part_size (str): optional. Size of each part to be sent. Either an int (number of bytes) or a human formatted string (example: "1Gb")
             overwrite (bool): optional. If the destination already exists, abort. (false by default).
+            compute_md5sum (bool): optional. Send the md5 of the file, computed from the parts while they are streamed.
+            md5sum_chunk_size (int): unused since the md5 is computed in-stream, kept for compatibility.
+            max_concurrency (int): optional. Number of parts sent at once.
+            executor: optional. Either a backend name ("thread") or an executor from tcp.executor, shared across retries and files. Asyncio programs upload with tcp.aio.client.
+            resume (bool): optional. Journal the upload on disk, and continue a journaled upload of the same file instead of starting over. A failed upload is then left open rather than aborted.
+            journal_dir (str): optional. Where journals are kept (default: ~/.tcp/uploads).
+            singlepart_threshold (int): optional. When uploading a directory, files up to this size are sent in a single request.
+
+        Returns:
+            None for a file. For a directory, a summary of the upload (see tcp.upload.DirectoryUpload).
 
         Exceptions:
             tcp.exceptions.UploadError
@@ -348,49 +998,61 @@ class client(object):
         import os
         import slumber
         import time
-        import multiprocessing
         from sys import stderr
-        import hashlib
+
+        if isinstance(executor, str):
+            from .executor import make_executor
+
+            with make_executor(executor, max_concurrency) as pool:
+                return self.upload(
+                    src_local,
+                    dest_s3,
+                    max_part_size,
+                    overwrite,
+                    num_tries,
+                    delay_between_tries,
+                    verbose,
+                    compute_md5sum,
+                    md5sum_chunk_size,
+                    executor=pool,
+                    resume=resume,
+                    journal_dir=journal_dir,
+                    singlepart_threshold=singlepart_threshold,
+                )
 
         # Uploading directory
         if os.path.isdir(src_local):
+            from .upload import DirectoryUpload
+
             root_in_s3 = os.path.basename(os.path.normpath(src_local))
 
-            for root, dirs, files in os.walk(src_local):
-                for file in files:
+            if dest_s3:
+                root_in_s3 = os.path.join(os.path.normpath(dest_s3), root_in_s3)
+
+            files = []
 
+            for root, dirs, names in os.walk(src_local):
+                for name in names:
+                    path = os.path.normpath(os.path.join(root, name))
                     new_dest_s3 = os.path.join(
-                            root_in_s3,
-                            os.path.normpath(
-                                os.path.join(
-                                    os.path.normpath(root[len(src_local) :]), file
-                                )
-                            ),
-                        ).replace("\\", "/")
-
-                    if dest_s3:
-                       new_dest_s3 = os.path.join(
-                            os.path.join(os.path.normpath(dest_s3), root_in_s3),
-                            os.path.normpath(
-                                os.path.join(
-                                    os.path.normpath(root[len(src_local) :]), file
-                                )
-                            ),
-                        ).replace("\\", "/")
-
-                    self.upload(
-                        os.path.normpath(os.path.join(root, file)),
-                        new_dest_s3,
-                        max_part_size,
-                        overwrite,
-                        num_tries,
-                        delay_between_tries,
-                        verbose,
-                        compute_md5sum,
-                        md5sum_chunk_size,
-                    )
-            return
+                        root_in_s3, os.path.relpath(path, src_local)
+                    ).replace("\\", "/")
 
+                    files.append([path, new_dest_s3])
+
+            return DirectoryUpload(
+                self,
+                executor,
+                max_part_size,
+                overwrite,
+                num_tries,
+                delay_between_tries,
+                verbose,
+                compute_md5sum,
+                resume,
+                journal_dir,
+                singlepart_threshold,
+            ).run(files)
 
         def check_if_exists ():
             try:
@@ -407,16 +1069,21 @@ class client(object):
                 f"Uploading {src_local} to {dest_s3} (max part size: {max_part_size})"
             )
 
+        started = time.perf_counter()
         file_size = str(os.path.getsize(src_local))
         presigned_body = {"uri": dest_s3, "size": file_size}
 
         if max_part_size:
             presigned_body.update({"part_size": max_part_size})
 
-        try:
-            resp = self.query().data.upload.multipart.post(presigned_body)
-        except slumber.exceptions.SlumberHttpBaseException as err:
-            raise exceptions.UploadError(str(err), err.__dict__)
+        from .upload import UploadJournal
+
+        journal = None
+
+        if resume:
+            journal = UploadJournal(src_local, dest_s3, journal_dir)
+
+        resp = self._start_multipart(presigned_body, journal)
 
         # 2: File's parts loading
         uploadId = resp["upload_id"]
@@ -429,10 +1096,30 @@ class client(object):
         if verbose:
             stderr.write(f"  * part_size: {part_size}")
 
-        completed_parts = []
-        todo_parts = [[url, part_no + 1] for part_no, url in enumerate(urls)]
+        completed_parts = journal.completed_parts() if journal else []
+        todo_parts = [
+            [url, part_no + 1]
+            for part_no, url in enumerate(urls)
+            if not journal or part_no + 1 not in journal.completed
+        ]
 
+        import functools
         from .upload import _upload_part
+        from .digest import OrderedHasher
+
+        hasher = None
+
+        if compute_md5sum:
+            hasher = OrderedHasher.for_parts(
+                src_local, int(file_size), part_size, executor.max_concurrency
+            )
+
+        upload_part = functools.partial(
+            _upload_part,
+            session=self._get_transfer_session(),
+            hasher=hasher,
+            metrics=self.metrics,
+        )
 
         for try_num in range(num_tries):
             if not todo_parts:
@@ -448,22 +1135,23 @@ class client(object):
 
             failed_parts = []
 
-            with multiprocessing.Pool() as pool:
-                for result in pool.imap_unordered(
-                    _upload_part,
-                    (
-                        [url, part_no, [src_local, part_size]]
-                        for url, part_no in todo_parts
-                    ),
-                ):
-                    has_successed, out = result
-
-                    if has_successed:
-                        completed_parts.append(out)
-                    else:
-                        if verbose:
-                            stderr.write(f"  * Failed {out}")
-                        failed_parts.append([out["url"], out["PartNumber"]])
+            for result in executor.imap_unordered(
+                upload_part,
+                (
+                    [url, part_no, [src_local, part_size]]
+                    for url, part_no in todo_parts
+                ),
+            ):
+                has_successed, out = result
+
+                if has_successed:
+                    completed_parts.append(out)
+                    if journal:
+                        journal.add(out)
+                else:
+                    if verbose:
+                        stderr.write(f"  * Failed {out}")
+                    failed_parts.append([out["url"], out["PartNumber"]])
 
             todo_parts = failed_parts
 
@@ -478,6 +1166,11 @@ class client(object):
             body["upload_id"] = uploadId
             body["uri"] = dest_s3
 
+            if journal:
+                raise exceptions.UploadError(
+                    f"{len(todo_parts)} parts failed ({len(urls)} in totals). Call upload again with resume=True to send them."
+                )
+
             stderr.write(f"  * Aborting {src_local}")
 
             self.query().data.upload.multipart.abort.post(body)
@@ -494,18 +1187,65 @@ class client(object):
         body["parts"] = completed_parts
         body["uri"] = dest_s3
 
-        if compute_md5sum:
-            hash_md5 = hashlib.md5()
-            with open(src_local, "rb") as f:
-                for chunk in iter(lambda: f.read(md5sum_chunk_size), b""):
-                    hash_md5.update(chunk)
-            body["md5sum"] = hash_md5.hexdigest()
+        if hasher:
+            body["md5sum"] = hasher.hexdigest()
 
         try:
             self.query().data.upload.multipart.complete.post(body)
         except slumber.exceptions.SlumberHttpBaseException as err:
             raise exceptions.UploadError(str(err), err.__dict__)
 
+        if journal:
+            journal.remove()
+
+        if self.metrics:
+            self.metrics.observe_transfer(
+                "upload", "file", int(file_size), time.perf_counter() - started
+            )
+
+    def _start_multipart(self, presigned_body, journal=None):
+        """
+        Opens a multipart upload, or reopens the one recorded in journal.
+
+        Returns:
+            The response of data.upload.multipart.post (upload_id, parts, part_size)
+        """
+        import slumber
+
+        resp = None
+
+        if journal and journal.load():
+            # Presigned urls are not journaled: ask for new ones
+            try:
+                resp = self.query().data.upload.multipart.post(
+                    presigned_body
+                    | {"upload_id": journal.upload_id, "part_size": journal.part_size}
+                )
+            except exceptions.HttpClientError as err:
+                resp = None
+
+            if not resp or resp["upload_id"] != journal.upload_id:
+                try:
+                    self.query().data.upload.multipart.abort.post(
+                        {"upload_id": journal.upload_id, "uri": presigned_body["uri"]}
+                    )
+                except exceptions.HttpClientError as err:
+                    pass
+
+                if resp:
+                    journal.start(resp["upload_id"], resp["part_size"])
+
+        if resp is None:
+            try:
+                resp = self.query().data.upload.multipart.post(presigned_body)
+            except slumber.exceptions.SlumberHttpBaseException as err:
+                raise exceptions.UploadError(str(err), err.__dict__)
+
+            if journal:
+                journal.start(resp["upload_id"], resp["part_size"])
+
+        return resp
+
     def download(
         self,
         src_s3,
@@ -515,7 +1255,11 @@ class client(object):
         delay_between_tries: float = 1.0,
         verbose: bool = False,
         md5sum_chunk_size=8192,
-        ignore_md5: bool = True
+        ignore_md5: bool = True,
+        num_connections: int = 1,
+        segment_size: int = 16 * 1024 * 1024,
+        resume: bool = False,
+        verify_after_write: bool = False,
     ):
         """
         Download of a file from local repository to S3 repository.
@@ -524,6 +1268,11 @@ class client(object):
             src_s3 (str): path in TCP S3 bucket
             dest_local (str): desired path in your local computer
             chunk_size (int): desired chunk size for streaming download
+            num_connections (int): optional. If greater than 1, the file is fetched over that many parallel Range requests.
+            segment_size (int): optional. Size of each Range request in parallel mode.
+            resume (bool): optional. Record completed ranges in a sidecar file (dest_local + ".tcpdl"), so that a later call only fetches the missing ones.
+            ignore_md5 (bool): optional. Skip the md5 check, computed while the file is received (true by default).
+            verify_after_write (bool): optional. Also read the written file back and check its md5.
 
         Exceptions:
             tcp.exceptions.DownloadError
@@ -532,7 +1281,11 @@ class client(object):
 
             Works accordingly to the following sequence:
                 1. Get a temporary link to our S3
-                2. Download file from that link using a stream
+                2. Download file from that link using a stream, or several ones in parallel mode
+
+            Parallel mode falls back to a single stream if the server ignores Range requests.
+            Resuming implies Range requests, even over a single connection.
+            An expired link is requested again from TCP.
 
             Internally it uses the following TCP endpoints:
                 - POST generate_presigned_get
@@ -540,11 +1293,14 @@ class client(object):
 
         import slumber
         from . import exceptions
+        import os
         import time
         import sys
         import hashlib
         import urllib3
 
+        started = time.perf_counter()
+
         body = {}
         body["uri"] = src_s3
 
@@ -553,36 +1309,66 @@ class client(object):
         except slumber.exceptions.SlumberHttpBaseException as err:
             raise exceptions.DownloadError(str(err), err.__dict__)
 
-        url = resp[src_s3]
+        from .download import PresignedURL, _download_ranges, _download_stream
 
-        for try_num in range(num_tries):
-            if try_num > 0:
-                if verbose:
-                    sys.stderr.write(
-                        f"download {dest_local}: trying again ({try_num+1}/{num_tries})"
-                    )
-                time.sleep(delay_between_tries)
+        source = PresignedURL(
+            resp[src_s3], lambda: self.query().data.download.post(body)[src_s3]
+        )
+        session = self._get_transfer_session()
+
+        done = False
+        md5sum = None
+        check_md5 = not ignore_md5 and "md5sum" in resp
+
+        if num_connections > 1 or resume:
+            checkpoint_key = None
+            if resume:
+                checkpoint_key = {"uri": src_s3, "md5sum": resp.get("md5sum")}
+
+            done, md5sum = _download_ranges(
+                session,
+                source,
+                dest_local,
+                num_connections,
+                segment_size,
+                chunk_size,
+                num_tries,
+                delay_between_tries,
+                verbose,
+                checkpoint_key,
+                check_md5,
+                self.metrics,
+            )
 
-            try:
-                with requests.get(url, stream=True) as r:
-                    r.raise_for_status()
-                    with open(dest_local, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=chunk_size):
-                            f.write(chunk)
-                break
+        if not done:
+            md5sum = _download_stream(
+                session,
+                source,
+                dest_local,
+                chunk_size,
+                num_tries,
+                delay_between_tries,
+                verbose,
+                check_md5,
+            )
 
-            except (requests.exceptions.ChunkedEncodingError,
-                    requests.exceptions.HTTPError,
-                    urllib3.exceptions.ProtocolError) as err:
-                if try_num == (num_tries-1):
-                    raise exceptions.DownloadError(str(err), err.__dict__)
+        if check_md5 and md5sum != resp["md5sum"]:
+            raise exceptions.DownloadError("md5sums do not match")
 
-        if not ignore_md5 and "md5sum" in resp:
+        if check_md5 and verify_after_write:
             hash_md5 = hashlib.md5()
             with open(dest_local, "rb") as f:
                 for chunk in iter(lambda: f.read(md5sum_chunk_size), b""):
                     hash_md5.update(chunk)
             if hash_md5.hexdigest() != resp["md5sum"]:
-                raise exceptions.DownloadError("md5sums do not match")
+                raise exceptions.DownloadError("md5sums of the written file do not match")
+
+        if self.metrics:
+            self.metrics.observe_transfer(
+                "download",
+                "file",
+                os.path.getsize(dest_local),
+                time.perf_counter() - started,
+            )
 
         return
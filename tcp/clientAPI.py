@@ -1,12 +1,71 @@
+import functools
 import time
 import slumber
 from .logs import warning
 from . import exceptions
 
 
+def _exchanged_bytes(resp):
+    """
+    (bytes sent, bytes received) by the request of resp, a requests.Response or None.
+    """
+
+    if resp is None:
+        return 0, 0
+
+    sent = 0
+    if resp.request is not None and resp.request.body:
+        sent = len(resp.request.body)
+
+    if resp._content is False:
+        # Streamed body, not read yet
+        return sent, int(resp.headers.get("Content-Length") or 0)
+
+    return sent, len(resp.content or b"")
+
+
+def _raise_for_status(resp, url):
+    """
+    Raises the slumber exception of resp if it is a 4xx or 5xx, as slumber does.
+    """
+
+    if 400 <= resp.status_code <= 499:
+        exception_class = (
+            slumber.exceptions.HttpNotFoundError
+            if resp.status_code == 404
+            else slumber.exceptions.HttpClientError
+        )
+        raise exception_class(
+            "Client Error %s: %s" % (resp.status_code, url),
+            response=resp,
+            content=resp.content,
+        )
+    elif 500 <= resp.status_code <= 599:
+        raise slumber.exceptions.HttpServerError(
+            "Server Error %s: %s" % (resp.status_code, url),
+            response=resp,
+            content=resp.content,
+        )
+
+
+@functools.lru_cache(maxsize=64)
+def _serializer_for(serializer, header):
+    """
+    Serializer of serializer (a slumber.serialize.Serializer) decoding a content-type header, or None.
+    """
+
+    content_type = header.split(";")[0].strip()
+
+    try:
+        return serializer.get_serializer(content_type=content_type)
+    except slumber.exceptions.SerializerNotAvailable:
+        return None
+
+
 class clientResource(slumber.Resource):
     MAX_RETRIES = 8
     MAX_DELAY = 32
+    STREAM_CHUNK_SIZE = 1024 * 1024
 
     def _get_help(self):
         new_uri = (
@@ -32,60 +91,320 @@ class clientResource(slumber.Resource):
         return min(2**retry, self.MAX_DELAY)
 
     def _request(self, *args, **kwargs):
-        retry = 0
-
         from .track_usage import TrackUsage
 
+        path = self._store["base_url"].replace(self._store["host"], "")
+
         if self._store["keep_track"] and hasattr(TrackUsage(), "uses"):
-            key = (
-                self._store["base_url"].replace(self._store["host"], "") + "+" + args[0]
+            TrackUsage().count(path + "+" + args[0])
+
+        metrics = self._store.get("metrics")
+
+        if metrics is None:
+            return self._request_with_retries(*args, **kwargs)
+
+        start = time.perf_counter()
+        resp, error = None, None
+
+        try:
+            resp = self._request_with_retries(*args, **kwargs)
+            return resp
+        except Exception as err:
+            resp = getattr(err, "response", None)
+            error = str(resp.status_code) if resp is not None else type(err).__name__
+            raise
+        finally:
+            sent, received = _exchanged_bytes(resp)
+
+            metrics.observe_request(
+                args[0], path, time.perf_counter() - start, sent, received, error
             )
-            import re
 
-            for pattern in TrackUsage().uses:
-                if re.fullmatch(pattern, key):
-                    TrackUsage().uses[pattern] += 1
-                    break
+    def _retry_policy(self):
+        from .retry import RetryPolicy
+
+        policy = self._store.get("retry")
+
+        if policy is None:
+            policy = RetryPolicy(max_retries=self.MAX_RETRIES, max_delay=self.MAX_DELAY)
+
+        return policy
+
+    def _request_with_retries(self, *args, **kwargs):
+        import requests
+
+        policy = self._retry_policy()
+        method = args[0]
+        retry = 0
 
         while True:
+            response = None
+
             try:
-                return super(clientResource, self)._request(*args, **kwargs)
+                resp = self._send(*args, **kwargs)
+                policy.on_success()
+                return resp
             except slumber.exceptions.HttpClientError as err:
                 if err.response.status_code == 401:
                     raise exceptions.InvalidCredentials(
                         str(err), **err.__dict__
                     ) from err
-                raise exceptions.HttpClientError(str(err), **err.__dict__) from err
+                if not policy.should_retry(method, retry, err.response.status_code):
+                    raise exceptions.HttpClientError(str(err), **err.__dict__) from err
+                response, reason = err.response, str(err.response.status_code)
             except slumber.exceptions.HttpServerError as err:
                 if err.response.status_code < 500:
                     raise exceptions.HttpServerError(str(err), **err.__dict__) from err
+                if policy.exhausted(retry):
+                    raise exceptions.HttpServerError(
+                        f"API endpoint still in maintenance after {retry + 1} attempts."
+                        "Stop trying.",
+                        **err.__dict__,
+                    ) from err
+                if not policy.should_retry(method, retry, err.response.status_code):
+                    raise exceptions.HttpServerError(str(err), **err.__dict__) from err
+                response, reason = err.response, str(err.response.status_code)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as err:
+                if not policy.should_retry(method, retry, error=err):
+                    raise
+                reason = type(err).__name__
 
+            breaker, key = self._circuit()
+            if breaker is not None:
+                breaker.check(key)
+
+            retry_in = policy.delay(retry, response)
             retry += 1
-            retry_in = self._retry_in(retry)
 
-            if retry >= self.MAX_RETRIES:
-                raise exceptions.HttpServerError(
-                    f"API endpoint still in maintenance after {retry} attempts."
-                    "Stop trying."
+            if self._store.get("metrics") is not None:
+                self._store["metrics"].observe_retry(
+                    method,
+                    self._store["base_url"].replace(self._store["host"], ""),
+                    reason,
                 )
 
             warning(
-                "API endpoint is currently in maintenance. Try again in "
-                f"{retry_in} seconds... (retry {retry} on {self.MAX_RETRIES})"
+                f"API endpoint is currently unavailable ({reason}). Try again in "
+                f"{retry_in:.1f} seconds... (retry {retry} on {policy.max_retries})"
             )
             time.sleep(retry_in)
 
+    def _circuit(self):
+        """
+        (CircuitBreaker of the client, circuit of this resource), or (None, None).
+        """
+
+        breaker = self._store.get("breaker")
+
+        if breaker is None:
+            return None, None
+
+        path = self._store["base_url"].replace(self._store["host"], "")
+
+        return breaker, breaker.key(self._store["host"], path)
+
+    def _send(self, *args, **kwargs):
+        """
+        Sends the request once, within the limits of the client's RateLimiter if any.
+
+        Exceptions:
+            tcp.exceptions.CircuitOpenError: if the client's CircuitBreaker is open for this route. The request is not sent.
+        """
+
+        limiter = self._store.get("limiter")
+        breaker, key = self._circuit()
+        resp = None
+        failed = True
+
+        if breaker is not None:
+            breaker.before(key)
+
+        if limiter is not None:
+            slot = limiter.acquire()
+
+        try:
+            if self._store.get("stream"):
+                resp = self._stream_request(*args, **kwargs)
+            elif self._store.get("ws") is not None and self._ws_eligible(*args):
+                resp = self._ws_request(*args, **kwargs)
+            elif self._store.get("cache") is not None and args[0] == "GET":
+                resp = self._cached_get(**kwargs)
+            else:
+                resp = super(clientResource, self)._request(*args, **kwargs)
+            failed = False
+            return resp
+        except slumber.exceptions.SlumberHttpBaseException as err:
+            resp = err.response
+            failed = resp.status_code >= 500
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release(slot, sum(_exchanged_bytes(resp)))
+            if breaker is not None:
+                breaker.record(key, failed)
+
+    def _ws_eligible(self, method):
+        """
+        True if the call may go over the websocket: its action is one of the transport's
+        actions (known and idempotent), and it is not cached.
+        """
+        from .ws import action_of
+
+        path = self._store["base_url"].replace(self._store["host"], "")
+        cache = self._store.get("cache")
+
+        if method == "GET" and cache is not None and cache.ttl(path):
+            return False
+
+        return action_of(method, path) in self._store["ws"].actions
+
+    def _ws_request(self, method, data=None, files=None, params=None):
+        """
+        Sends the call as an action over the client's WebSocketTransport.
+
+        Falls back to HTTP when the websocket is unavailable or loses the call, when it
+        answers a failure (the HTTP answer then gives its actual status), and when the call
+        has files or both a body and query parameters.
+        """
+        import json
+        import requests
+        from .ws import action_of
+
+        def over_http():
+            return super(clientResource, self)._request(
+                method, data=data, files=files, params=params
+            )
+
+        if files or (data is not None and params):
+            return over_http()
+
+        path = self._store["base_url"].replace(self._store["host"], "")
+        body = data if data is not None else (params or {})
+
+        try:
+            state, response = self._store["ws"].call(action_of(method, path), body)
+        except exceptions.WebSocketError as err:
+            return over_http()
+
+        if state != "done":
+            return over_http()
+
+        resp = requests.models.Response()
+        resp.status_code = 200
+        resp.headers = requests.structures.CaseInsensitiveDict(
+            {"Content-Type": "application/json"}
+        )
+        resp._content = json.dumps(response).encode()
+        resp.url = self.url()
+
+        return resp
+
+    def _stream_request(self, method, data=None, files=None, params=None):
+        """
+        Same as slumber's _request, leaving the body of successful responses unread.
+        """
+
+        serializer = self._store["serializer"]
+        url = self.url()
+
+        headers = {"accept": serializer.get_content_type()}
+
+        if not files:
+            headers["content-type"] = serializer.get_content_type()
+            if data is not None:
+                data = serializer.dumps(data)
+
+        resp = self._store["session"].request(
+            method,
+            url,
+            data=data,
+            params=params,
+            files=files,
+            headers=headers,
+            stream=True,
+        )
+
+        _raise_for_status(resp, url)
+
+        return resp
+
+    def _cached_get(self, params=None):
+        """
+        GET through the client's ResponseCache.
+
+        Fresh responses are replayed without any request; stale ones are revalidated with
+        If-None-Match when the API gave them an ETag.
+        """
+
+        cache = self._store["cache"]
+        session = self._store["session"]
+        url = self.url()
+
+        ttl = cache.ttl(url.replace(self._store["host"], ""))
+
+        if not ttl:
+            return super(clientResource, self)._request("GET", params=params)
+
+        key = cache.key(url, params, session.headers.get("Authorization"))
+        entry = cache.get(key)
+
+        if cache.is_fresh(entry):
+            cache.hits += 1
+            return self._replay(entry)
+
+        headers = {"accept": self._store["serializer"].get_content_type()}
+
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+
+        resp = session.request("GET", url, params=params, headers=headers)
+
+        if resp.status_code == 304 and entry is not None:
+            cache.revalidations += 1
+            cache.renew(entry)
+            return self._replay(entry)
+
+        cache.misses += 1
+
+        _raise_for_status(resp, url)
+
+        cache.put(key, ttl, resp.status_code, resp.headers, resp.content)
+
+        return resp
+
+    def _replay(self, entry):
+        import requests
+
+        resp = requests.models.Response()
+        resp.status_code = entry["status"]
+        resp.headers = requests.structures.CaseInsensitiveDict(entry["headers"])
+        resp._content = entry["content"]
+        resp.url = self.url()
+
+        return resp
+
     def _try_to_serialize_response(self, resp):
-        s = self._store["serializer"]
+        header = resp.headers.get("content-type", None)
 
-        if resp.headers.get("content-type", None):
-            content_type = resp.headers.get("content-type").split(";")[0].strip()
+        if header:
+            stype = _serializer_for(self._store["serializer"], header)
 
-            try:
-                stype = s.get_serializer(content_type=content_type)
-            except exceptions.SerializerNotAvailable:
+            if stype is None:
                 return resp.content
 
+            if self._store.get("stream") and resp._content is False:
+                from .jsonstream import JsonArrayStream
+
+                return JsonArrayStream(
+                    resp.iter_content(self.STREAM_CHUNK_SIZE),
+                    self._store["stream"],
+                    loads=stype.loads,
+                    close=resp.close,
+                )
+
             return stype.loads(resp.content)
 
         return resp.content
@@ -104,7 +423,21 @@ class clientAPI(slumber.API):
         session=None,
         serializer=None,
         keep_track=False,
+        cache=None,
+        metrics=None,
+        retry=None,
+        limiter=None,
+        breaker=None,
+        stream=None,
+        ws=None,
     ):
         super().__init__(base_url, auth, format, append_slash, session, serializer)
         self._store.update({"host": host})
         self._store.update({"keep_track": keep_track})
+        self._store.update({"cache": cache})
+        self._store.update({"metrics": metrics})
+        self._store.update({"retry": retry})
+        self._store.update({"limiter": limiter})
+        self._store.update({"breaker": breaker})
+        self._store.update({"stream": stream})
+        self._store.update({"ws": ws})
@@ -0,0 +1,199 @@
+import hashlib
+import threading
+
+
+MAX_BUFFER_SIZE = 1024 * 1024 * 1024
+
+
+class OrderedHasher(object):
+    """
+    Computes the md5 of a file from blocks fed in any order by parallel transfers.
+
+    Blocks fed at the current position are hashed right away, and blocks ahead of it are
+    kept up to `buffer_size` bytes. Past that budget, a background thread catches up by
+    reading back ranges that were already fed, while they are still in the page cache.
+    `hexdigest` reads whatever was never fed.
+
+    Transfers running n parts at once keep up to about n parts ahead of the slowest one:
+    `for_parts` sizes the buffer for that, up to MAX_BUFFER_SIZE. Only the bytes that do
+    not fit in the buffer are read twice.
+
+    Args:
+        path (str): file whose digest is computed
+        size (int): size of the file
+        buffer_size (int): memory budget for out-of-order blocks
+        read_size (int): chunk size when reading back from disk
+    """
+
+    def __init__(
+        self,
+        path,
+        size: int,
+        buffer_size: int = 64 * 1024 * 1024,
+        read_size: int = 1024 * 1024,
+    ):
+        self.path = path
+        self.size = size
+        self.buffer_size = buffer_size
+        self.read_size = read_size
+
+        self._md5 = hashlib.md5()
+        self._pos = 0
+        self._pending = {}
+        self._pending_size = 0
+        self._fed = {}
+        self._fed_ends = {}
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    @classmethod
+    def for_parts(cls, path, size: int, part_size: int, concurrency: int):
+        """
+        Returns a hasher whose buffer holds the parts sent ahead by concurrency workers.
+        """
+
+        buffer_size = min(MAX_BUFFER_SIZE, int(part_size) * max(1, concurrency))
+
+        return cls(path, size, buffer_size=max(buffer_size, 64 * 1024 * 1024))
+
+    @property
+    def position(self):
+        """
+        Number of bytes hashed so far.
+        """
+        return self._pos
+
+    def feed(self, offset: int, data):
+        """
+        Hands the bytes found at offset of the file.
+        """
+
+        with self._cond:
+            end = offset + len(data)
+
+            if end <= self._pos:
+                return
+
+            if offset < self._pos:
+                data = memoryview(data)[self._pos - offset :]
+                offset = self._pos
+
+            if offset == self._pos:
+                self._update(data)
+                self._drain()
+                self._cond.notify()
+                return
+
+            self._mark_fed(offset, end)
+
+            if (
+                offset not in self._pending
+                and self._pending_size + len(data) <= self.buffer_size
+            ):
+                self._pending[offset] = bytes(data)
+                self._pending_size += len(data)
+            elif self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._catch_up, name="tcp-hasher", daemon=True
+                )
+                self._thread.start()
+            else:
+                self._cond.notify()
+
+    def _mark_fed(self, start, end):
+        if start in self._fed_ends:
+            start = self._fed_ends.pop(start)
+        else:
+            self._fed.setdefault(start, start)
+
+        self._fed[start] = max(self._fed[start], end)
+        self._fed_ends[self._fed[start]] = start
+
+    def _fed_until(self, pos):
+        """
+        End of the fed range holding pos, or None.
+        """
+        for start, end in self._fed.items():
+            if start <= pos < end:
+                return end
+        return None
+
+    def _update(self, data):
+        self._md5.update(data)
+        self._pos += len(data)
+
+    def _drain(self):
+        while self._pos in self._pending:
+            data = self._pending.pop(self._pos)
+            self._pending_size -= len(data)
+            self._update(data)
+
+    def _discard(self):
+        """
+        Releases the pending blocks that start below the current position.
+        """
+
+        for offset in [off for off in self._pending if off < self._pos]:
+            data = self._pending.pop(offset)
+            self._pending_size -= len(data)
+
+            if offset + len(data) > self._pos and self._pos not in self._pending:
+                self._pending[self._pos] = data[self._pos - offset :]
+                self._pending_size += len(self._pending[self._pos])
+
+    def _catch_up(self):
+        with open(self.path, "rb") as f:
+            while True:
+                with self._cond:
+                    end = self._fed_until(self._pos)
+                    while not self._closed and end is None:
+                        self._cond.wait()
+                        end = self._fed_until(self._pos)
+
+                    if self._closed:
+                        return
+
+                    pos = self._pos
+
+                f.seek(pos)
+                chunk = f.read(min(self.read_size, end - pos))
+
+                with self._cond:
+                    if chunk and self._pos == pos:
+                        self._update(chunk)
+                        self._discard()
+                        self._drain()
+
+    def hexdigest(self):
+        """
+        Hashes whatever was not fed yet and returns the digest of the whole file.
+        """
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        with self._cond:
+            if self._pos < self.size:
+                with open(self.path, "rb") as f:
+                    f.seek(self._pos)
+                    while self._pos < self.size:
+                        if self._pos in self._pending:
+                            self._drain()
+                            f.seek(self._pos)
+                            continue
+
+                        chunk = f.read(min(self.read_size, self.size - self._pos))
+                        if not chunk:
+                            break
+                        self._update(chunk)
+
+            self._pending.clear()
+            self._pending_size = 0
+
+            return self._md5.hexdigest()
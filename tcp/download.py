@@ -0,0 +1,394 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import requests
+import urllib3
+
+from . import exceptions
+
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.HTTPError,
+    requests.exceptions.Timeout,
+    urllib3.exceptions.ProtocolError,
+)
+
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+
+class PresignedURL(object):
+    """
+    Presigned URL of an object, fetched again through `refresh` once it has expired.
+    """
+
+    def __init__(self, url: str, refresh=None):
+        self.url = url
+        self._refresh = refresh
+        self._lock = threading.Lock()
+
+    def refresh(self, stale: str):
+        with self._lock:
+            if self.url == stale and self._refresh:
+                self.url = self._refresh()
+            return self.url
+
+
+def _is_expired(err):
+    response = getattr(err, "response", None)
+    return response is not None and response.status_code == 403
+
+
+class Checkpoint(object):
+    """
+    Sidecar file recording the byte ranges of a download already written to disk.
+
+    Args:
+        dest_local (str): path of the file being downloaded
+        key (dict): identifies the remote object; a checkpoint written for another key is ignored.
+    """
+
+    suffix = ".tcpdl"
+
+    def __init__(self, dest_local, key: dict):
+        self.path = f"{dest_local}{self.suffix}"
+        self.dest_local = dest_local
+        self.key = key
+        self.done = []
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Returns True if a matching checkpoint was found next to an intact destination file.
+        """
+
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if state.get("key") != self.key:
+            return False
+
+        if not os.path.exists(self.dest_local):
+            return False
+
+        if os.path.getsize(self.dest_local) != self.key["size"]:
+            return False
+
+        self.done = [list(rr) for rr in state.get("done", [])]
+        return True
+
+    def add(self, start, end):
+        with self._lock:
+            merged = []
+            for rr in sorted(self.done + [[start, end]]):
+                if merged and rr[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], rr[1])
+                else:
+                    merged.append(list(rr))
+            self.done = merged
+            self._save()
+
+    def missing(self, segments):
+        """
+        Returns the parts of segments not covered yet.
+        """
+
+        out = []
+
+        for start, end in segments:
+            for done_start, done_end in self.done:
+                if done_end <= start or done_start >= end:
+                    continue
+                if done_start > start:
+                    out.append([start, done_start])
+                start = max(start, done_end)
+            if start < end:
+                out.append([start, end])
+
+        return out
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": self.key, "done": self.done}, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        for path in [self.path, f"{self.path}.tmp"]:
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def _content_length(session, url):
+    """
+    Returns the size of the object behind url, or None if the server ignores Range requests.
+    """
+
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True) as r:
+        if r.status_code == 416:
+            return None
+
+        r.raise_for_status()
+
+        if r.status_code != 206:
+            return None
+
+        total = r.headers.get("Content-Range", "").rpartition("/")[2]
+
+        return int(total) if total.isdigit() else None
+
+
+def _etag_md5(headers):
+    """
+    md5 of an object given by its ETag, or None if the ETag is not one (e.g. multipart objects).
+    """
+
+    etag = headers.get("ETag", "").strip('"')
+
+    return etag.lower() if re.fullmatch(r"[0-9a-fA-F]{32}", etag) else None
+
+
+def _remote_object(session, url):
+    """
+    Returns the size and md5 of the object behind url, each None if the server does not tell.
+    """
+
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True) as r:
+        if r.status_code == 416:
+            return 0, _etag_md5(r.headers)
+
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+        else:
+            total = r.headers.get("Content-Length", "")
+
+        return int(total) if total.isdigit() else None, _etag_md5(r.headers)
+
+
+def _file_md5(path, chunk_size=1024 * 1024):
+    hash_md5 = hashlib.md5()
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hash_md5.update(chunk)
+
+    return hash_md5.hexdigest()
+
+
+def _segments(total, num_connections, segment_size):
+    segment_size = max(
+        MIN_SEGMENT_SIZE, min(segment_size, -(-total // num_connections))
+    )
+
+    return [
+        [start, min(start + segment_size, total)]
+        for start in range(0, total, segment_size)
+    ]
+
+
+def _write_at(fd, data, offset):
+    view = memoryview(data)
+
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+
+        view = view[written:]
+        offset += written
+
+
+def _download_segment(session, url, dest_local, start, end, chunk_size, hasher=None):
+    """
+    Writes the bytes [start, end) of url at the same offset of dest_local.
+    """
+
+    headers = {"Range": f"bytes={start}-{end - 1}"}
+
+    with session.get(url, headers=headers, stream=True) as r:
+        r.raise_for_status()
+
+        if r.status_code != 206:
+            raise exceptions.DownloadError(f"Range {start}-{end - 1} not honoured")
+
+        offset = start
+        fd = os.open(dest_local, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+
+        try:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                _write_at(fd, chunk, offset)
+                if hasher:
+                    hasher.feed(offset, chunk)
+                offset += len(chunk)
+        finally:
+            os.close(fd)
+
+    if offset != end:
+        raise requests.exceptions.ChunkedEncodingError(
+            f"Range {start}-{end - 1} ended after {offset - start} bytes"
+        )
+
+
+def _fetch_segment(args):
+    session, source, dest_local, start, end, chunk_size, num_tries, delay = args[:8]
+    checkpoint, hasher, metrics = args[8:]
+
+    url = source.url
+
+    for try_num in range(num_tries):
+        if try_num > 0:
+            time.sleep(delay)
+
+        try:
+            started = time.perf_counter()
+            _download_segment(session, url, dest_local, start, end, chunk_size, hasher)
+            if metrics:
+                metrics.observe_transfer(
+                    "download", "part", end - start, time.perf_counter() - started
+                )
+            if checkpoint is not None:
+                checkpoint.add(start, end)
+            return start, end
+        except TRANSIENT_ERRORS as err:
+            if try_num == (num_tries - 1):
+                raise exceptions.DownloadError(str(err)) from err
+            if _is_expired(err):
+                url = source.refresh(url)
+
+
+def _download_ranges(
+    session,
+    source,
+    dest_local,
+    num_connections,
+    segment_size,
+    chunk_size,
+    num_tries,
+    delay_between_tries,
+    verbose,
+    checkpoint_key=None,
+    compute_md5=False,
+    metrics=None,
+):
+    """
+    Downloads source.url over num_connections parallel Range requests.
+
+    If checkpoint_key is set, completed ranges are recorded in a sidecar Checkpoint, and
+    ranges recorded by a previous attempt are not fetched again. The checkpoint is removed
+    once the download completes.
+
+    If compute_md5 is set, segments are hashed in order as they arrive. Ranges restored
+    from a checkpoint are read back from disk.
+
+    If metrics (a tcp.metrics.Metrics) is set, the throughput of every segment is recorded.
+
+    Returns:
+        (done, md5sum): done is False if the server does not honour Range requests (nothing
+        was written), md5sum is None unless compute_md5 is set.
+    """
+
+    from .digest import OrderedHasher
+    from .executor import make_executor
+
+    try:
+        total = _content_length(session, source.url)
+    except requests.exceptions.HTTPError as err:
+        if not _is_expired(err):
+            raise
+        total = _content_length(session, source.refresh(source.url))
+
+    if total is None:
+        return False, None
+
+    checkpoint = None
+
+    if checkpoint_key is not None:
+        checkpoint = Checkpoint(dest_local, dict(checkpoint_key, size=total))
+
+    if checkpoint is None or not checkpoint.load():
+        with open(dest_local, "wb") as f:
+            f.truncate(total)
+
+    segments = _segments(total, num_connections, segment_size)
+
+    if checkpoint is not None:
+        segments = checkpoint.missing(segments)
+
+    hasher = OrderedHasher(dest_local, total) if compute_md5 else None
+
+    if verbose:
+        sys.stderr.write(
+            f"download {dest_local}: {len(segments)} segments over {num_connections} connections"
+        )
+
+    with make_executor("thread", num_connections) as executor:
+        for _ in executor.imap_unordered(
+            _fetch_segment,
+            (
+                [session, source, dest_local, start, end, chunk_size]
+                + [num_tries, delay_between_tries, checkpoint, hasher, metrics]
+                for start, end in segments
+            ),
+        ):
+            pass
+
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    return True, hasher.hexdigest() if hasher else None
+
+
+def _download_stream(
+    session,
+    source,
+    dest_local,
+    chunk_size,
+    num_tries,
+    delay_between_tries,
+    verbose,
+    compute_md5=False,
+):
+    """
+    Downloads source.url over a single stream, starting over up to num_tries times.
+
+    Returns:
+        md5sum of the received bytes if compute_md5 is set, None otherwise.
+    """
+
+    for try_num in range(num_tries):
+        if try_num > 0:
+            if verbose:
+                sys.stderr.write(
+                    f"download {dest_local}: trying again ({try_num+1}/{num_tries})"
+                )
+            time.sleep(delay_between_tries)
+
+        try:
+            hash_md5 = hashlib.md5()
+            with session.get(source.url, stream=True) as r:
+                r.raise_for_status()
+                with open(dest_local, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        if compute_md5:
+                            hash_md5.update(chunk)
+            return hash_md5.hexdigest() if compute_md5 else None
+
+        except (requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.HTTPError,
+                urllib3.exceptions.ProtocolError) as err:
+            if try_num == (num_tries-1):
+                raise exceptions.DownloadError(str(err), err.__dict__)
+            if _is_expired(err):
+                source.refresh(source.url)
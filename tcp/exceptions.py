@@ -49,3 +49,15 @@ class UploadError(tcpHttpBaseException):
     """
     Upload has failed somehow.
     """
+
+
+class CircuitOpenError(tcpHttpBaseException):
+    """
+    The circuit breaker of the endpoint is open: the request was not sent.
+    """
+
+
+class WebSocketError(tcpHttpBaseException):
+    """
+    TCP websocket is unavailable, or did not answer. `sent` tells whether the message may have reached the backend.
+    """
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def default_concurrency():
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class ThreadExecutor(object):
+    """
+    Runs blocking I/O tasks on a pool of threads.
+
+    Args:
+        max_concurrency (int): number of tasks running at once.
+    """
+
+    def __init__(self, max_concurrency: int = None):
+        self.max_concurrency = max_concurrency or default_concurrency()
+        self._pool = ThreadPoolExecutor(
+            self.max_concurrency, thread_name_prefix="tcp-executor"
+        )
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) and returns a concurrent.futures.Future.
+        """
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def imap_unordered(self, fn, iterable):
+        """
+        Yields fn(x) for every x of iterable, in completion order.
+        """
+        futures = [self.submit(fn, x) for x in iterable]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+BACKENDS = {
+    "thread": ThreadExecutor,
+}
+
+
+def make_executor(backend: str = "thread", max_concurrency: int = None):
+    """
+    Creates an executor for I/O-bound tasks.
+
+    Args:
+        backend (str): "thread". Asyncio callers upload with tcp.aio.client instead.
+        max_concurrency (int): number of tasks running at once (default: min(32, cpu_count + 4)).
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown executor backend {backend} (expected one of {', '.join(BACKENDS)})"
+        )
+
+    return BACKENDS[backend](max_concurrency)
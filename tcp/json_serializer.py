@@ -0,0 +1,46 @@
+import json
+
+from slumber.serialize import JsonSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+_DECODE_ERRORS = (ValueError,) if msgspec is None else (ValueError, msgspec.DecodeError)
+
+
+class FastJsonSerializer(JsonSerializer):
+    """
+    JSON serializer decoding with orjson, or msgspec, when one is installed (pip install tcp-sdk[fast]).
+
+    Falls back to the standard json module when neither is available, and for the documents
+    they refuse but json accepts (NaN literals). Note that orjson decodes integers wider
+    than 64 bits as floats.
+
+    Request bodies are still encoded by the standard json module: orjson and msgspec would
+    silently write NaN and Infinity as null.
+    """
+
+    if orjson is not None:
+        backend = "orjson"
+    elif msgspec is not None:
+        backend = "msgspec"
+    else:
+        backend = "json"
+
+    def loads(self, data):
+        try:
+            if orjson is not None:
+                return orjson.loads(data)
+            if msgspec is not None:
+                return msgspec.json.decode(data)
+        except _DECODE_ERRORS:
+            pass
+
+        return json.loads(data)
@@ -0,0 +1,176 @@
+import re
+
+# Bytes changing the nesting of a JSON text, outside of strings
+_STRUCTURE = re.compile(rb'["\[\]{}]')
+# Bytes ending or escaping inside a string
+_STRING = re.compile(rb'["\\]')
+# Bytes ending a number or a literal
+_SCALAR_END = re.compile(rb"[,\]}\s]")
+
+_SPACES = b" \t\r\n"
+
+# Bytes of the buffer already decoded before it is compacted
+_COMPACT_AFTER = 1 << 16
+
+
+class JsonArrayStream(object):
+    """
+    Incremental decoder of a JSON object whose biggest members are arrays, e.g. a data listing.
+
+    Iterating yields (name, entry) for every entry of the arrays named in tables, as soon as
+    its bytes are received: only the entry being decoded, and the chunk it comes from, are
+    held in memory. The other members of the object (e.g. paging) are decoded whole, and are
+    available in fields once the iteration is over.
+
+    Args:
+        chunks: iterable of bytes, e.g. requests.Response.iter_content(chunk_size)
+        tables (list): names of the arrays to stream
+        loads (callable): optional. Decoder of one entry (default: tcp.json_serializer.FastJsonSerializer).
+        close (callable): optional. Called once the iteration is over or abandoned, e.g. to release the connection.
+
+    Exceptions:
+        ValueError: if the JSON text is malformed or truncated.
+    """
+
+    def __init__(self, chunks, tables, loads=None, close=None):
+        if loads is None:
+            from .json_serializer import FastJsonSerializer
+
+            loads = FastJsonSerializer().loads
+
+        self.tables = set(tables)
+        self.fields = {}
+
+        self._chunks = iter(chunks)
+        self._loads = loads
+        self._close = close
+        self._buf = bytearray()
+        self._pos = 0
+
+    def _fill(self):
+        """
+        Appends the next chunk to the buffer. Returns False once chunks are exhausted.
+        """
+
+        for chunk in self._chunks:
+            if chunk:
+                self._buf += chunk
+                return True
+
+        return False
+
+    def _peek(self):
+        """
+        Skips whitespace and returns the next byte, without consuming it.
+        """
+
+        if self._pos > _COMPACT_AFTER:
+            del self._buf[: self._pos]
+            self._pos = 0
+
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _SPACES:
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return bytes(self._buf[self._pos : self._pos + 1])
+
+            if not self._fill():
+                raise ValueError("Truncated JSON text")
+
+    def _next(self, expected):
+        char = self._peek()
+
+        if char not in expected:
+            raise ValueError(
+                f"Expected one of {expected!r} at byte {self._pos}, got {char!r}"
+            )
+
+        self._pos += 1
+        return char
+
+    def _value_end(self, start):
+        """
+        Offset of the end of the JSON value starting at start, receiving chunks as needed.
+        """
+
+        if self._buf[start : start + 1] not in (b'"', b"[", b"{"):
+            while True:
+                match = _SCALAR_END.search(self._buf, start)
+                if match is not None:
+                    return match.start()
+                if not self._fill():
+                    return len(self._buf)
+
+        pos, depth, in_string = start, 0, False
+
+        while True:
+            match = (_STRING if in_string else _STRUCTURE).search(self._buf, pos)
+
+            if match is None or (
+                match.group() == b"\\" and match.end() >= len(self._buf)
+            ):
+                pos = len(self._buf) if match is None else match.start()
+                if not self._fill():
+                    raise ValueError("Truncated JSON text")
+                continue
+
+            char = match.group()
+            pos = match.end()
+
+            if char == b"\\":
+                pos += 1
+                continue
+
+            if char == b'"':
+                in_string = not in_string
+            elif char in (b"[", b"{"):
+                depth += 1
+            else:
+                depth -= 1
+
+            if depth == 0 and not in_string:
+                return pos
+
+    def _value(self):
+        self._peek()
+
+        start = self._pos
+        end = self._value_end(start)
+        self._pos = end
+
+        return self._loads(bytes(self._buf[start:end]))
+
+    def __iter__(self):
+        try:
+            self._next(b"{")
+
+            if self._peek() == b"}":
+                return
+
+            while True:
+                key = self._value()
+                self._next(b":")
+
+                if key in self.tables and self._peek() == b"[":
+                    self._pos += 1
+
+                    if self._peek() == b"]":
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield key, self._value()
+                            if self._next(b",]") == b"]":
+                                break
+                else:
+                    self.fields[key] = self._value()
+
+                if self._next(b",}") == b"}":
+                    return
+        finally:
+            self.close()
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
@@ -0,0 +1,269 @@
+import json
+import re
+import threading
+import time
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = [
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+]
+
+# Upper bounds of the throughput buckets, in MB/s
+THROUGHPUT_BUCKETS = [0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+_ID_SEGMENT = re.compile(r"^([0-9]+|[0-9]+\-[0-9a-f\-]{36}|[0-9a-f\-]{36})$")
+
+
+def route_of(path: str):
+    """
+    Label of the route of path: numeric and uuid-like segments are replaced by <id>.
+    """
+
+    return "/".join(
+        "<id>" if _ID_SEGMENT.match(ss) else ss for ss in path.split("?")[0].split("/")
+    )
+
+
+class Histogram(object):
+    """
+    Counts of observations per bucket, plus their sum.
+
+    Args:
+        buckets (list): increasing upper bounds. Larger observations go to a last +Inf bucket.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        ii = 0
+        while ii < len(self.buckets) and value > self.buckets[ii]:
+            ii += 1
+
+        self.counts[ii] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """
+        Estimates the q-quantile, interpolating linearly inside its bucket.
+        """
+
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+
+        for ii, nn in enumerate(self.counts):
+            if nn and seen + nn >= rank:
+                lower = self.buckets[ii - 1] if ii > 0 else 0.0
+                if ii == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[ii] - lower) * (rank - seen) / nn
+            seen += nn
+
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip(self.buckets + ["+Inf"], self.counts)),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics(object):
+    """
+    Counters and histograms of the API calls and transfers of a client.
+
+    Per route ("<method> <path>", ids replaced by <id>): requests, latency histogram,
+    bytes sent and received, retries and errors by class (HTTP status or exception name).
+    Per transfer direction: files, parts, bytes and throughput histograms (MB/s).
+
+    Every update takes a single lock and a few additions, so metrics can stay enabled
+    in production.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+            self._transfers = {}
+            self._gauges = {}
+            self._started = time.time()
+
+    def _route(self, method, path):
+        key = f"{method} {route_of(path)}"
+        stats = self._routes.get(key)
+
+        if stats is None:
+            stats = self._routes[key] = {
+                "requests": 0,
+                "retries": 0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "errors": {},
+                "latency": Histogram(LATENCY_BUCKETS),
+            }
+
+        return stats
+
+    def observe_request(
+        self,
+        method: str,
+        path: str,
+        seconds: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        error: str = None,
+    ):
+        """
+        Records one API call, retries included, that took seconds.
+        """
+
+        with self._lock:
+            stats = self._route(method, path)
+            stats["requests"] += 1
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["latency"].observe(seconds)
+
+            if error:
+                stats["errors"][error] = stats["errors"].get(error, 0) + 1
+
+    def observe_retry(self, method: str, path: str, error: str = None):
+        with self._lock:
+            stats = self._route(method, path)
+            stats["retries"] += 1
+
+            if error:
+                stats["errors"][error] = stats["errors"].get(error, 0) + 1
+
+    def observe_transfer(self, direction: str, unit: str, nbytes: int, seconds: float):
+        """
+        Records a part or a file ("part" or "file" unit) moved in direction ("upload" or "download").
+        """
+
+        with self._lock:
+            stats = self._transfers.get(direction)
+
+            if stats is None:
+                stats = self._transfers[direction] = {
+                    "files": 0,
+                    "parts": 0,
+                    "file_bytes": 0,
+                    "part_bytes": 0,
+                    "part_throughput": Histogram(THROUGHPUT_BUCKETS),
+                    "file_throughput": Histogram(THROUGHPUT_BUCKETS),
+                }
+
+            stats[f"{unit}s"] += 1
+            stats[f"{unit}_bytes"] += nbytes
+
+            mb_per_second = nbytes / 1024 / 1024 / max(seconds, 1e-9)
+            stats[f"{unit}_throughput"].observe(mb_per_second)
+
+    def set_gauge(self, name: str, labels: dict, value: float):
+        """
+        Sets a named value, e.g. the state of a circuit breaker.
+        """
+
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self):
+        """
+        Returns a copy of every metric as plain dicts.
+        """
+
+        with self._lock:
+            return {
+                "since": self._started,
+                "routes": {
+                    key: dict(stats, errors=dict(stats["errors"]), latency=stats["latency"].snapshot())
+                    for key, stats in self._routes.items()
+                },
+                "transfers": {
+                    key: dict(
+                        stats,
+                        part_throughput=stats["part_throughput"].snapshot(),
+                        file_throughput=stats["file_throughput"].snapshot(),
+                    )
+                    for key, stats in self._transfers.items()
+                },
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._gauges.items()
+                ],
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "tcp"):
+        """
+        Returns the metrics in Prometheus text exposition format.
+        """
+
+        snap = self.snapshot()
+        families = {}
+
+        def sample(name, kind, value, **labels):
+            label = ",".join(f'{kk}="{vv}"' for kk, vv in labels.items())
+            family = families.setdefault(f"{prefix}_{name}", [kind, []])
+            family[1].append(f"{prefix}_{name}{{{label}}} {value}")
+
+        def histogram(name, hist, **labels):
+            cumulated = 0
+            for le, nn in hist["buckets"].items():
+                cumulated += nn
+                sample(name + "_bucket", None, cumulated, **labels, le=le)
+            sample(name + "_sum", None, hist["sum"], **labels)
+            sample(name + "_count", None, hist["count"], **labels)
+            families.setdefault(f"{prefix}_{name}", ["histogram", []])
+
+        for key, stats in snap["routes"].items():
+            method, route = key.split(" ", 1)
+
+            for name in ["requests", "retries", "bytes_sent", "bytes_received"]:
+                sample(f"{name}_total", "counter", stats[name], method=method, route=route)
+            for error, nn in stats["errors"].items():
+                sample("errors_total", "counter", nn, method=method, route=route, error=error)
+            histogram("request_duration_seconds", stats["latency"], method=method, route=route)
+
+        for direction, stats in snap["transfers"].items():
+            for name in ["files", "parts", "file_bytes", "part_bytes"]:
+                sample(f"transfer_{name}_total", "counter", stats[name], direction=direction)
+            for unit in ["part", "file"]:
+                histogram(
+                    f"transfer_{unit}_mb_per_second",
+                    stats[f"{unit}_throughput"],
+                    direction=direction,
+                )
+
+        for gauge in snap["gauges"]:
+            sample(gauge["name"], "gauge", gauge["value"], **gauge["labels"])
+
+        lines = []
+
+        for name, (kind, samples) in families.items():
+            if kind is None:
+                continue
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for suffix in ["_bucket", "_sum", "_count"]:
+                    lines += families[name + suffix][1]
+            else:
+                lines += samples
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def next_token(page):
+    """
+    Token of the page following page, or None on the last page.
+    """
+
+    url = (page or {}).get("paging", {}).get("next")
+
+    return url.rstrip("/").split("/")[-1] if url else None
+
+
+def iter_pages(endpoint, first_page):
+    """
+    Yields first_page, then every page reached through its `paging.next` tokens.
+
+    While a page is consumed, the next one is fetched in a background thread, so that
+    at most two pages are held at once.
+
+    Args:
+        endpoint: resource whose `next(token).get()` returns the page after token (e.g. client.query().data)
+        first_page: callable returning the first page
+    """
+
+    pool = ThreadPoolExecutor(1, thread_name_prefix="tcp-paging")
+
+    try:
+        page = first_page()
+
+        while page:
+            token = next_token(page)
+            future = pool.submit(endpoint.next(token).get) if token else None
+
+            yield page
+
+            page = future.result() if future else None
+    finally:
+        pool.shutdown(wait=False)
+
+
+def iter_items(pages, tables):
+    """
+    Yields the entries of the given tables of every page, table after table.
+    """
+
+    for page in pages:
+        for table in tables:
+            yield from page.get(table) or []
+
+
+def iter_streamed_items(endpoint, first_page):
+    """
+    Yields the entries of every page, pages being tcp.jsonstream.JsonArrayStream.
+
+    The token of the next page is only known once a page has been read through, so pages
+    are fetched one after the other.
+
+    Args:
+        endpoint: streaming resource whose `next(token).get()` returns the page after token (e.g. client.query(stream=["files", "dirs"]).data)
+        first_page: callable returning the first page
+    """
+
+    page = first_page()
+
+    while page:
+        try:
+            for _, entry in page:
+                yield entry
+        finally:
+            page.close()
+
+        token = next_token(page.fields)
+        page = endpoint.next(token).get() if token else None
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Paces the API calls of a client: requests per second, bytes per second, and calls in flight.
+
+    Rates are enforced by token buckets holding `burst` seconds of traffic. A call takes
+    its tokens when it starts, and the bytes it exchanged once it ends: a bucket may then
+    go into debt, and the calls that follow wait for it to be paid back.
+
+    With `shared_path`, the buckets and the in-flight slots live in files locked with
+    fcntl, so that every process using the same path shares the same limits (POSIX only).
+
+    Args:
+        requests_per_second (float): optional. Maximum rate of calls.
+        bytes_per_second (float): optional. Maximum rate of bytes sent and received.
+        max_in_flight (int): optional. Maximum number of calls running at once.
+        burst (float): seconds of traffic that may be sent at once after an idle period.
+        shared_path (str): optional. Path prefix of the files shared between processes.
+    """
+
+    POLL_INTERVAL = 0.005
+
+    def __init__(
+        self,
+        requests_per_second: float = None,
+        bytes_per_second: float = None,
+        max_in_flight: int = None,
+        burst: float = 1.0,
+        shared_path: str = None,
+    ):
+        self.rates = {}
+
+        if requests_per_second:
+            self.rates["requests"] = float(requests_per_second)
+        if bytes_per_second:
+            self.rates["bytes"] = float(bytes_per_second)
+
+        self.max_in_flight = max_in_flight
+        self.burst = burst
+        self.shared_path = shared_path
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._semaphore = None
+        self._slots = None
+
+        if shared_path:
+            try:
+                import fcntl
+            except ImportError:
+                raise ValueError("shared_path needs fcntl, which is not available here")
+
+            os.makedirs(os.path.dirname(os.path.abspath(shared_path)), exist_ok=True)
+
+            if max_in_flight:
+                self._slots = [None] * max_in_flight
+        elif max_in_flight:
+            self._semaphore = threading.BoundedSemaphore(max_in_flight)
+
+    def reserve(self, requests: int = 1, nbytes: int = 0):
+        """
+        Takes tokens for requests calls and nbytes bytes.
+
+        Returns:
+            The seconds to wait before the call may be sent (0 if tokens were available).
+        """
+
+        if not self.rates:
+            return 0.0
+
+        amounts = {"requests": requests, "bytes": nbytes}
+
+        with self._lock:
+            if self.shared_path:
+                return self._reserve_shared(amounts)
+            return self._take(self._buckets, amounts)
+
+    def _take(self, buckets, amounts):
+        now = time.time()
+        wait = 0.0
+
+        for name, rate in self.rates.items():
+            capacity = max(1.0, rate * self.burst)
+            tokens, updated = buckets.get(name, [capacity, now])
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            tokens -= amounts[name]
+            buckets[name] = [tokens, now]
+
+            if tokens < 0:
+                wait = max(wait, -tokens / rate)
+
+        return wait
+
+    def _reserve_shared(self, amounts):
+        import fcntl
+
+        with open(f"{self.shared_path}.buckets", "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+            try:
+                f.seek(0)
+                try:
+                    buckets = json.loads(f.read() or "{}")
+                except ValueError:
+                    buckets = {}
+
+                wait = self._take(buckets, amounts)
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(buckets))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+        return wait
+
+    def _try_enter(self):
+        """
+        Takes an in-flight slot if one is free. Returns the slot, or None.
+        """
+
+        if self._semaphore is not None:
+            return True if self._semaphore.acquire(blocking=False) else None
+
+        import fcntl
+
+        with self._lock:
+            for ii, fd in enumerate(self._slots):
+                if fd is not None:
+                    continue
+
+                fd = os.open(f"{self.shared_path}.slot{ii}", os.O_RDWR | os.O_CREAT, 0o666)
+
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+
+                self._slots[ii] = fd
+                return ii
+
+        return None
+
+    def acquire(self):
+        """
+        Blocks until a call may be sent.
+
+        Returns:
+            A slot to hand back to release.
+        """
+
+        time.sleep(self.reserve())
+
+        if not self.max_in_flight:
+            return None
+
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+            return True
+
+        while True:
+            slot = self._try_enter()
+            if slot is not None:
+                return slot
+            time.sleep(self.POLL_INTERVAL)
+
+    async def acquire_async(self):
+        """
+        Same as acquire, awaiting instead of blocking the event loop.
+        """
+
+        await asyncio.sleep(self.reserve())
+
+        if not self.max_in_flight:
+            return None
+
+        while True:
+            slot = self._try_enter()
+            if slot is not None:
+                return slot
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    def release(self, slot=None, nbytes: int = 0):
+        """
+        Ends a call started with acquire, that sent and received nbytes bytes.
+        """
+
+        if nbytes:
+            self.reserve(requests=0, nbytes=nbytes)
+
+        if slot is None:
+            return
+
+        if self._semaphore is not None:
+            self._semaphore.release()
+            return
+
+        import fcntl
+
+        with self._lock:
+            fd = self._slots[slot]
+            self._slots[slot] = None
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
@@ -0,0 +1,177 @@
+import email.utils
+import random
+import threading
+import time
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class RetryBudget(object):
+    """
+    Token bucket capping retries to a share of the traffic.
+
+    Every successful request deposits `ratio` token, and `min_per_second` tokens are
+    added every second, up to `capacity`. Every retry withdraws one token: once the
+    bucket is empty, failures are raised instead of retried, so that a struggling API
+    is not sent more requests than usual.
+
+    Args:
+        ratio (float): retries allowed per successful request.
+        min_per_second (float): retries allowed per second whatever the traffic.
+        capacity (float): maximum number of retries in a burst.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_second: float = 1.0, capacity: float = 20.0
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.min_per_second
+        )
+        self._updated = now
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Returns True if a retry may be sent.
+        """
+
+        with self._lock:
+            self._refill()
+
+            if self._tokens < 1:
+                return False
+
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before sending a failed API request again.
+
+    Delays follow an exponential backoff with full jitter: the n-th retry waits a random
+    time between 0 and min(max_delay, base_delay * 2**n). A Retry-After header sent
+    with a 429 or 503 answer is honoured instead, up to max_delay.
+
+    Args:
+        max_retries (int): attempts of a request, the first one included.
+        base_delay (float): seconds of the first backoff step.
+        max_delay (float): maximum seconds between two attempts.
+        jitter (bool): draw delays at random (full jitter). If false, wait the whole backoff step.
+        retry_statuses (tuple): HTTP statuses retried for every method.
+        retry_connection_errors (bool): retry connection errors and timeouts of idempotent methods.
+        idempotent_methods (tuple): methods safe to send again when their outcome is unknown.
+        budget (RetryBudget): optional. Shared budget of retries.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 8,
+        base_delay: float = 1.0,
+        max_delay: float = 32.0,
+        jitter: bool = True,
+        retry_statuses=(429, 500, 502, 503, 504),
+        retry_connection_errors: bool = True,
+        idempotent_methods=IDEMPOTENT_METHODS,
+        budget: RetryBudget = None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_connection_errors = retry_connection_errors
+        self.idempotent_methods = tuple(idempotent_methods)
+        self.budget = budget
+
+    def exhausted(self, retry: int):
+        """
+        True once retry retries were sent and no other attempt is allowed.
+        """
+
+        return retry + 1 >= self.max_retries
+
+    def should_retry(self, method: str, retry: int, status: int = None, error=None):
+        """
+        Returns True if a request that failed with status (or with the connection error error)
+        after retry retries should be sent again. A retry allowed by the policy is withdrawn
+        from the budget.
+        """
+
+        if self.exhausted(retry):
+            return False
+
+        if status is not None:
+            allowed = status in self.retry_statuses
+        else:
+            allowed = (
+                self.retry_connection_errors
+                and error is not None
+                and method.upper() in self.idempotent_methods
+            )
+
+        return allowed and (self.budget is None or self.budget.withdraw())
+
+    def on_success(self):
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def delay(self, retry: int, response=None):
+        """
+        Seconds to wait before the retry-th retry, response being the failed answer if any.
+        """
+
+        retry_after = self.retry_after(response)
+
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        step = min(self.max_delay, self.base_delay * 2**retry)
+
+        return random.uniform(0, step) if self.jitter else step
+
+    @staticmethod
+    def retry_after(response):
+        """
+        Seconds asked by the Retry-After header of response, or None.
+        """
+
+        if response is None:
+            return None
+
+        value = response.headers.get("Retry-After")
+
+        if not value:
+            return None
+
+        value = value.strip()
+
+        if value.isdigit():
+            return float(value)
+
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, date.timestamp() - time.time())
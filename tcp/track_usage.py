@@ -1,3 +1,6 @@
+import threading
+
+
 class MetaSingleton(type):
     __instances = {}
 
@@ -10,6 +13,10 @@ class MetaSingleton(type):
 
 
 class TrackUsage(object, metaclass=MetaSingleton):
+    _lock = threading.Lock()
+    _matcher = None
+    _groups = {}
+
     def init(self, client):
         if hasattr(self, "uses") and self.uses:
             return
@@ -33,3 +40,48 @@ class TrackUsage(object, metaclass=MetaSingleton):
                 )
 
                 self.uses[f"^{key}$"] = 0
+
+        self._compile()
+
+    def _compile(self):
+        """
+        Builds one alternation of every pattern of uses, each in its own named group.
+
+        Alternatives are tried in order, so a key is counted against the first pattern
+        it matches, as a scan of uses would.
+        """
+
+        import re
+
+        alternatives = []
+        groups = {}
+
+        for ii, pattern in enumerate(self.uses):
+            body = pattern.removeprefix("^").removesuffix("$")
+            body = re.sub(r"(?<!\\)\((?!\?)", "(?:", body)
+
+            groups[f"r{ii}"] = pattern
+            alternatives.append(f"(?P<r{ii}>{body})")
+
+        self._groups = groups
+        self._matcher = re.compile("|".join(alternatives)) if alternatives else None
+
+    def count(self, key):
+        """
+        Counts a request, key being f"{endpoint}+{method}".
+        """
+
+        if len(self._groups) != len(self.uses):
+            with self._lock:
+                self._compile()
+
+        if self._matcher is None:
+            return
+
+        match = self._matcher.fullmatch(key)
+
+        if match is None:
+            return
+
+        with self._lock:
+            self.uses[self._groups[match.lastgroup]] += 1
@@ -0,0 +1,262 @@
+import threading
+import time
+
+from . import exceptions
+from .watch import is_terminal
+
+# Seconds between two checks of a process, per kind of state
+DEFAULT_INTERVALS = {"pending": 5.0, "running": 30.0}
+
+
+def state_kind(state: str):
+    """
+    "terminal", "pending" or "running" (any other state of a live process).
+    """
+
+    if is_terminal(state):
+        return "terminal"
+
+    if state is None or state.startswith(("pending", "queued", "waiting")):
+        return "pending"
+
+    return "running"
+
+
+class ProcessTracker(object):
+    """
+    Keeps the states of many processes up to date, through listings of app.processes.
+
+    A refresh lists processes page after page until every process due for a check has been
+    seen, and updates every tracked process met on the way. Processes missing from the
+    listing are asked one by one with app.process(pid).get, from then on without walking the
+    listing for them. Processes the API does not know are dropped, and kept in missing.
+
+    Every process is checked at an interval depending on its kind of state (intervals),
+    which grows by backoff while its state stays the same, up to max_interval. Processes in
+    a terminal state (dead, terminated, failed*) are not checked anymore. Callbacks
+    registered with on_transition are called on every change of state.
+
+    Args:
+        client (tcp.client): client to query
+        pids (list): optional. Processes to track.
+        intervals (dict): optional. Seconds between two checks per kind of state ("pending", "running").
+        backoff (float): growth of the interval while a state does not change.
+        max_interval (float): maximum seconds between two checks.
+        page_size (int): optional. Number of processes per page of the listings.
+        filters: optional. Query parameters of app.processes restricting the listings.
+    """
+
+    def __init__(
+        self,
+        client,
+        pids=(),
+        intervals: dict = None,
+        backoff: float = 1.5,
+        max_interval: float = 300.0,
+        page_size: int = None,
+        **filters,
+    ):
+        self.client = client
+        self.intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.page_size = page_size
+        self.filters = filters
+
+        self.processes = {}
+        self.missing = set()
+        self._unlisted = set()
+        self._due = {}
+        self._interval = {}
+        self._callbacks = []
+        self._lock = threading.RLock()
+
+        for pid in pids:
+            self.add(pid)
+
+    def add(self, pid):
+        """
+        Tracks pid, checked at the next refresh.
+        """
+
+        pid = str(pid)
+
+        with self._lock:
+            if pid not in self.processes:
+                self.processes[pid] = None
+                self._due[pid] = 0.0
+                self._interval[pid] = self.intervals["pending"]
+
+    def remove(self, pid):
+        pid = str(pid)
+
+        with self._lock:
+            self.processes.pop(pid, None)
+            self._unlisted.discard(pid)
+            self._due.pop(pid, None)
+            self._interval.pop(pid, None)
+
+    def on_transition(self, callback):
+        """
+        Calls callback(pid, previous state, process) on every change of state, previous state
+        being None the first time a process is seen.
+        """
+
+        self._callbacks.append(callback)
+
+    @property
+    def states(self):
+        with self._lock:
+            return {
+                pid: None if pp is None else pp.get("state")
+                for pid, pp in self.processes.items()
+            }
+
+    @property
+    def pending(self):
+        """
+        Tracked processes not in a terminal state yet.
+        """
+
+        with self._lock:
+            return list(self._due)
+
+    def next_refresh(self):
+        """
+        Seconds until a process is due for a check, or None if every process has ended.
+        """
+
+        with self._lock:
+            if not self._due:
+                return None
+            return max(0.0, min(self._due.values()) - time.monotonic())
+
+    def _update(self, pid, process, checked, transitions):
+        previous = self.processes[pid]
+        previous = None if previous is None else previous.get("state")
+        state = process.get("state")
+        now = time.monotonic()
+
+        self.processes[pid] = process
+
+        if state != previous:
+            transitions.append((pid, previous, process))
+
+            if is_terminal(state):
+                self._due.pop(pid, None)
+                return
+
+            self._interval[pid] = self.intervals[state_kind(state)]
+        elif checked:
+            self._interval[pid] = min(
+                self.max_interval, self._interval[pid] * self.backoff
+            )
+        else:
+            return
+
+        self._due[pid] = now + self._interval[pid]
+
+    def refresh(self, force: bool = False):
+        """
+        Checks the processes due for a check (every pending one if force).
+
+        Returns:
+            list of the transitions (pid, previous state, process)
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            wanted = {pid for pid, at in self._due.items() if force or at <= now}
+
+        if not wanted:
+            return []
+
+        transitions = []
+
+        with self._lock:
+            direct = wanted & self._unlisted
+            wanted -= direct
+
+        if wanted:
+            listing = self.client.iter_processes(page_size=self.page_size, **self.filters)
+
+            try:
+                for process in listing:
+                    pid = str(process.get("id"))
+
+                    with self._lock:
+                        if pid in self._due:
+                            self._update(pid, process, pid in wanted, transitions)
+                            wanted.discard(pid)
+                            direct.discard(pid)
+
+                    if not wanted:
+                        break
+            finally:
+                listing.close()
+
+            with self._lock:
+                self._unlisted |= wanted
+
+        for pid in wanted | direct:
+            try:
+                process = self.client.query().app.process(pid).get()
+            except exceptions.HttpClientError as err:
+                from .logs import warning
+
+                warning(f"Process {pid} cannot be found, it is not tracked anymore.")
+                self.remove(pid)
+                self.missing.add(pid)
+                continue
+
+            with self._lock:
+                if pid in self._due:
+                    self._update(pid, process, True, transitions)
+
+        for transition in transitions:
+            for callback in list(self._callbacks):
+                callback(*transition)
+
+        return transitions
+
+    def run(self, timeout: float = None):
+        """
+        Refreshes until every process has ended, or for timeout seconds.
+
+        Returns:
+            True if every process has ended.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            wait = self.next_refresh()
+
+            if wait is None:
+                return True
+
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+
+            time.sleep(wait)
+            self.refresh()
+
+    async def events(self):
+        """
+        Asynchronous generator of the transitions (pid, previous state, process), until
+        every process has ended. Refreshes run in a worker thread.
+        """
+        import asyncio
+
+        while True:
+            wait = self.next_refresh()
+
+            if wait is None:
+                return
+
+            await asyncio.sleep(wait)
+
+            for transition in await asyncio.to_thread(self.refresh):
+                yield transition
@@ -1,22 +1,580 @@
-def _upload_part(args):
+import hashlib
+import json
+import os
+
+
+class FileSlice(object):
+    """
+    Read-only file object over the bytes [offset, offset + length) of a file.
+
+    A read never returns more than `block_size` bytes, so streaming a part keeps a
+    single block in memory whatever the part size. If set, `on_read` is called with
+    the file offset and the bytes of every read.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        offset: int,
+        length: int,
+        block_size: int = 65536,
+        on_read=None,
+    ):
+        self._file = open(path, "rb")
+        self._offset = offset
+        self._length = max(0, min(length, os.fstat(self._file.fileno()).st_size - offset))
+        self._pos = 0
+        self.block_size = block_size
+        self.on_read = on_read
+
+        self._file.seek(offset)
+
+    def __len__(self):
+        return self._length
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self._pos
+        elif whence == os.SEEK_END:
+            pos += self._length
+
+        self._pos = max(0, min(pos, self._length))
+        self._file.seek(self._offset + self._pos)
+
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.block_size:
+            size = self.block_size
+
+        size = min(size, self._length - self._pos)
+
+        if size <= 0:
+            return b""
+
+        data = self._file.read(size)
+
+        if self.on_read:
+            self.on_read(self._offset + self._pos, data)
+
+        self._pos += len(data)
+
+        return data
+
+    def __iter__(self):
+        return iter(self.read, b"")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class UploadJournal(object):
+    """
+    On-disk record of a multipart upload, so that another process can resume it.
+
+    Journals are keyed by (source path, size, mtime, destination): any change to the
+    source file starts a new upload.
+
+    A journal is a JSON lines file: the upload, then one line per completed part, appended
+    as parts complete. Presigned part urls are not kept, as they are asked again on resume.
+
+    Args:
+        src_local (str): path of the file being uploaded
+        dest_s3 (str): its path in TCP S3 bucket
+        journal_dir (str): optional. Directory holding journals (default: ~/.tcp/uploads)
+    """
+
+    def __init__(self, src_local: str, dest_s3: str, journal_dir: str = None):
+        st = os.stat(src_local)
+
+        self.key = {
+            "src": os.path.abspath(src_local),
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "dest": dest_s3,
+        }
+
+        if journal_dir is None:
+            journal_dir = os.path.join(os.path.expanduser("~"), ".tcp", "uploads")
+
+        digest = hashlib.sha1(json.dumps(self.key, sort_keys=True).encode()).hexdigest()
+        self.path = os.path.join(journal_dir, f"{digest}.jsonl")
+
+        self.upload_id = None
+        self.part_size = None
+        self.completed = {}
+
+    def load(self):
+        """
+        Returns True if a journal was found for this upload.
+        """
+
+        try:
+            with open(self.path) as f:
+                lines = f.read().splitlines()
+            state = json.loads(lines[0])
+        except (OSError, ValueError, IndexError):
+            return False
+
+        if state.get("key") != self.key:
+            return False
+
+        self.upload_id = state["upload_id"]
+        self.part_size = state["part_size"]
+        self.completed = {}
+
+        for line in lines[1:]:
+            try:
+                part = json.loads(line)
+            except ValueError:
+                # Line cut short by an interrupted write
+                continue
+            self.completed[part["PartNumber"]] = part["ETag"]
+
+        return True
+
+    def start(self, upload_id, part_size):
+        self.upload_id = upload_id
+        self.part_size = part_size
+        self.completed = {}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        state = {"key": self.key, "upload_id": upload_id, "part_size": part_size}
+
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps(state) + "\n")
+        os.replace(tmp, self.path)
+
+    def add(self, part):
+        self.completed[part["PartNumber"]] = part["ETag"]
+
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"PartNumber": part["PartNumber"], "ETag": part["ETag"]}) + "\n")
+
+    def completed_parts(self):
+        return [
+            {"ETag": etag, "PartNumber": part_no}
+            for part_no, etag in sorted(self.completed.items())
+        ]
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def _upload_part(args, session=None, hasher=None, metrics=None):
     url = args[0]
     part_no = args[1]
     src_local, part_size = args[2][0], args[2][1]
 
     import requests
+    import time
 
-    file_data = None
+    started = time.perf_counter()
 
-    with open(src_local, "rb") as f:
-        f.seek((part_no - 1) * part_size)
-        file_data = f.read(part_size)
+    if session is None:
+        session = requests
+
+    on_read = hasher.feed if hasher else None
 
     try:
-        resp = requests.put(url, data=file_data)
-    except requests.exceptions.SSLError as e:
+        with FileSlice(
+            src_local, (part_no - 1) * part_size, part_size, on_read=on_read
+        ) as body:
+            length = len(body)
+            resp = session.put(url, data=body)
+    except requests.exceptions.RequestException:
         return False, {"url": url, "PartNumber": part_no}
 
     if resp.status_code != 200:
         return False, {"url": url, "PartNumber": part_no}
 
+    if metrics:
+        metrics.observe_transfer(
+            "upload", "part", length, time.perf_counter() - started
+        )
+
     return True, {"ETag": resp.headers["ETag"].replace('"', ""), "PartNumber": part_no}
+
+
+def _split_group(uri):
+    """
+    Splits a group@path uri into (group, path). group is None for personal uris.
+    """
+
+    group, sep, path = uri.partition("@")
+
+    if not sep or "/" in group:
+        return None, uri
+
+    return group, path
+
+
+class _FileUpload(object):
+    def __init__(self, src_local, dest_s3):
+        self.src_local = src_local
+        self.dest_s3 = dest_s3
+        self.size = os.path.getsize(src_local)
+        self.upload_id = None
+        self.part_size = None
+        self.urls = []
+        self.completed = []
+        self.remaining = 0
+        self.hasher = None
+        self.journal = None
+        self.failed = False
+        self.started = None
+
+
+class DirectoryUpload(object):
+    """
+    Uploads many files, scheduling every file and every part over one executor.
+
+    Files up to `singlepart_threshold` bytes go through data.upload.singlepart, the
+    others through data.upload.multipart. At most twice `executor.max_concurrency`
+    tasks are queued at once, so memory does not grow with the number of files.
+    Unless overwrite is set, destinations are checked up front by listing their common prefix.
+
+    `run` returns a summary: {"files", "singlepart", "multipart", "bytes", "failed", "elapsed"},
+    where "failed" maps source paths to error messages.
+    """
+
+    def __init__(
+        self,
+        client,
+        executor,
+        max_part_size=None,
+        overwrite: bool = False,
+        num_tries: int = 3,
+        delay_between_tries: float = 1.0,
+        verbose: bool = False,
+        compute_md5sum: bool = True,
+        resume: bool = False,
+        journal_dir: str = None,
+        singlepart_threshold: int = 16 * 1024 * 1024,
+    ):
+        self.client = client
+        self.executor = executor
+        self.max_part_size = max_part_size
+        self.overwrite = overwrite
+        self.num_tries = num_tries
+        self.delay_between_tries = delay_between_tries
+        self.verbose = verbose
+        self.compute_md5sum = compute_md5sum
+        self.resume = resume
+        self.journal_dir = journal_dir
+        self.singlepart_threshold = singlepart_threshold
+
+        self.summary = {
+            "files": 0,
+            "singlepart": 0,
+            "multipart": 0,
+            "bytes": 0,
+            "failed": {},
+            "elapsed": 0.0,
+        }
+
+    def run(self, files):
+        """
+        Uploads files, a list of [src_local, dest_s3].
+
+        Exceptions:
+            tcp.exceptions.UploadError, once every other file was sent. Its `summary` attribute holds the summary.
+        """
+
+        import collections
+        import time
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from . import exceptions
+
+        start = time.perf_counter()
+        last_report = start
+
+        files = collections.deque(files)
+        num_files = len(files)
+
+        if not self.overwrite and files:
+            found = self._existing([dest_s3 for _, dest_s3 in files])
+
+            for fu in [_FileUpload(*ff) for ff in files if ff[1] in found]:
+                self._fail(
+                    fu, f"{fu.dest_s3} already exists. Please set overwrite to True."
+                )
+
+            files = collections.deque(ff for ff in files if ff[1] not in found)
+        queue = collections.deque()
+        pending = {}
+        limit = 2 * self.executor.max_concurrency
+
+        while True:
+            while len(pending) < limit and (queue or files):
+                if queue:
+                    task = queue.popleft()
+                else:
+                    task = [self._start, _FileUpload(*files.popleft())]
+
+                pending[self.executor.submit(*task)] = task
+
+            if not pending:
+                break
+
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                queue.extend(self._handle(pending.pop(future), future))
+
+            if self.verbose and time.perf_counter() - last_report > 1.0:
+                last_report = time.perf_counter()
+                self._report(num_files, last_report - start)
+
+        self.summary["elapsed"] = time.perf_counter() - start
+
+        if self.verbose:
+            self._report(num_files, self.summary["elapsed"])
+
+        if self.summary["failed"]:
+            raise exceptions.UploadError(
+                f"{len(self.summary['failed'])} files failed ({num_files} in total)",
+                summary=self.summary,
+            )
+
+        return self.summary
+
+    def _existing(self, uris):
+        """
+        Returns the set of uris that already exist.
+
+        Destinations share the path of the uploaded directory, so listing that prefix
+        costs one request per page of data.post. A group@path prefix is listed within
+        its group. Without a common prefix, uris are checked with client.exists_many.
+        """
+
+        import posixpath
+
+        groups = {_split_group(uu)[0] for uu in uris}
+        group = groups.pop() if len(groups) == 1 else None
+
+        try:
+            prefix = posixpath.commonpath([_split_group(uu)[1] for uu in uris])
+        except ValueError:
+            prefix = ""
+
+        if groups or not prefix:
+            found = self.client.exists_many(
+                uris, max_concurrency=self.executor.max_concurrency
+            )
+            return {uu for uu, exists in found.items() if exists}
+
+        kwargs = {"group": group, "personal": False} if group else {}
+        wanted = set(uris)
+
+        return {
+            uu for uu in self.client.iter_data(prefix=prefix, **kwargs) if uu in wanted
+        }
+
+    def _report(self, num_files, elapsed):
+        from sys import stderr
+
+        done = self.summary["files"] + len(self.summary["failed"])
+        mb = self.summary["bytes"] / 1024 / 1024
+
+        stderr.write(
+            f"  * {done}/{num_files} files, {mb:.1f}MB in {elapsed:.1f}s"
+            f" ({len(self.summary['failed'])} failed)\n"
+        )
+
+    def _handle(self, task, future):
+        """
+        Accounts for a finished task, and returns the tasks that follow it.
+        """
+
+        fn, fu = task[0], task[1]
+
+        if fu.failed:
+            return []
+
+        try:
+            result = future.result()
+        except Exception as err:
+            self._fail(fu, str(err))
+            return []
+
+        if fn == self._start:
+            if result:
+                self._succeed(fu, "singlepart")
+                return []
+
+            if fu.remaining == 0:
+                return [[self._complete, fu]]
+
+            return [
+                [self._send_part, fu, url, part_no, 0]
+                for part_no, url in enumerate(fu.urls, 1)
+                if part_no not in {pp["PartNumber"] for pp in fu.completed}
+            ]
+
+        if fn == self._send_part:
+            has_successed, out = result
+
+            if not has_successed:
+                try_num = task[4] + 1
+                if try_num < self.num_tries:
+                    return [[self._send_part, fu, out["url"], out["PartNumber"], try_num]]
+
+                self._fail(fu, f"Part number {out['PartNumber']} failed")
+                return []
+
+            fu.completed.append(out)
+            fu.remaining -= 1
+
+            if fu.journal:
+                fu.journal.add(out)
+
+            if fu.remaining == 0:
+                return [[self._complete, fu]]
+
+            return []
+
+        if fn == self._complete:
+            if fu.journal:
+                fu.journal.remove()
+            self._succeed(fu, "multipart")
+
+        return []
+
+    def _succeed(self, fu, kind):
+        import time
+
+        if self.client.metrics:
+            self.client.metrics.observe_transfer(
+                "upload", "file", fu.size, time.perf_counter() - fu.started
+            )
+
+        self.summary["files"] += 1
+        self.summary[kind] += 1
+        self.summary["bytes"] += fu.size
+
+    def _fail(self, fu, msg):
+        from sys import stderr
+
+        fu.failed = True
+        self.summary["failed"][fu.src_local] = msg
+
+        if self.verbose:
+            stderr.write(f"  * Failed {fu.src_local}: {msg}\n")
+
+        if fu.upload_id and not fu.journal:
+            try:
+                self.client.query().data.upload.multipart.abort.post(
+                    {"upload_id": fu.upload_id, "uri": fu.dest_s3}
+                )
+            except Exception:
+                pass
+
+    def _start(self, fu):
+        """
+        Sends a small file whole, or opens the multipart upload of a large one.
+
+        Returns:
+            True if the file was sent whole.
+        """
+
+        import time
+        from .digest import OrderedHasher
+
+        fu.started = time.perf_counter()
+
+        if fu.size <= self.singlepart_threshold and not self.resume:
+            self._send_whole(fu)
+            return True
+
+        presigned_body = {"uri": fu.dest_s3, "size": str(fu.size)}
+
+        if self.max_part_size:
+            presigned_body.update({"part_size": self.max_part_size})
+
+        if self.resume:
+            fu.journal = UploadJournal(fu.src_local, fu.dest_s3, self.journal_dir)
+
+        resp = self.client._start_multipart(presigned_body, fu.journal)
+
+        fu.upload_id = resp["upload_id"]
+        fu.urls = resp["parts"]
+        fu.part_size = resp["part_size"]
+        fu.completed = fu.journal.completed_parts() if fu.journal else []
+        fu.remaining = len(fu.urls) - len(fu.completed)
+
+        if self.compute_md5sum:
+            fu.hasher = OrderedHasher.for_parts(
+                fu.src_local, fu.size, fu.part_size, self.executor.max_concurrency
+            )
+
+        return False
+
+    def _send_whole(self, fu):
+        """
+        Sends a file over one PUT, trying again like parts are.
+        """
+
+        import requests
+        import time
+        from . import exceptions
+
+        api = self.client.query().data.upload.singlepart
+        resp = api.post({"uri": fu.dest_s3})
+
+        for try_num in range(self.num_tries):
+            if try_num > 0:
+                time.sleep(self.delay_between_tries)
+
+            try:
+                with FileSlice(fu.src_local, 0, fu.size) as body:
+                    put = self.client._get_transfer_session().put(resp["url"], data=body)
+            except requests.exceptions.RequestException as err:
+                error = str(err)
+                continue
+
+            if put.status_code == 200:
+                break
+
+            error = f"storage answered {put.status_code}"
+        else:
+            raise exceptions.UploadError(f"{fu.dest_s3}: {error}")
+
+        api.complete.post({"uri": fu.dest_s3})
+
+    def _send_part(self, fu, url, part_no, try_num):
+        import time
+
+        if try_num > 0:
+            time.sleep(self.delay_between_tries)
+
+        return _upload_part(
+            [url, part_no, [fu.src_local, fu.part_size]],
+            session=self.client._get_transfer_session(),
+            hasher=fu.hasher,
+            metrics=self.client.metrics,
+        )
+
+    def _complete(self, fu):
+        body = {
+            "upload_id": fu.upload_id,
+            "parts": sorted(fu.completed, key=lambda x: x["PartNumber"]),
+            "uri": fu.dest_s3,
+        }
+
+        if fu.hasher:
+            body["md5sum"] = fu.hasher.hexdigest()
+
+        self.client.query().data.upload.multipart.complete.post(body)
@@ -0,0 +1,227 @@
+import queue
+import time
+
+# States after which a process does not change anymore, besides failed* ones
+TERMINAL_STATES = ("dead", "terminated")
+
+
+def is_terminal(state: str):
+    return state in TERMINAL_STATES or (state or "").startswith("failed")
+
+
+class ProcessWatcher(object):
+    """
+    Follows the state of processes until they end.
+
+    Process states are asked over TCP websocket (see tcp.ws.WebSocketTransport), and the
+    messages pushed by the backend for a watched process are taken into account as soon as
+    they arrive. When the websocket is unavailable, or stops
+    answering, states are polled with app.process(pid).get instead.
+
+    Every process is checked at its own adaptive interval: min_interval after a change,
+    growing by backoff while its state stays the same, up to max_interval.
+
+    Args:
+        client (tcp.client): client whose token and websocket_host are used
+        pids (list): processes to watch
+        min_interval (float): seconds between two checks of a process that just changed.
+        max_interval (float): maximum seconds between two checks of a process.
+        backoff (float): growth of the interval while a state does not change.
+        reply_timeout (float): seconds without answer after which the websocket is given up.
+        transports (list): socket.io transports used to reach the websocket.
+    """
+
+    ACTION = "app_process_get"
+
+    def __init__(
+        self,
+        client,
+        pids,
+        min_interval: float = 1.0,
+        max_interval: float = 60.0,
+        backoff: float = 2.0,
+        reply_timeout: float = 10.0,
+        transports=("websocket",),
+    ):
+        self.client = client
+        self.pids = [str(pp) for pp in pids]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.reply_timeout = reply_timeout
+        self.transports = list(transports)
+
+        self._events = queue.Queue()
+        self._ws = None
+        self._own_ws = False
+        self._requests = {}
+
+    def _connect(self):
+        """
+        Takes the websocket of the client, or opens one to its websocket_host. Returns False
+        if there is none, or if it is unavailable.
+        """
+
+        ws = None
+
+        if hasattr(self.client, "_get_websocket"):
+            ws = self.client._get_websocket()
+
+        own = ws is None
+
+        if own:
+            host = getattr(self.client, "websocket_host", None)
+
+            if not host:
+                return False
+
+            from .ws import WebSocketTransport
+
+            ws = WebSocketTransport(
+                host,
+                self.client.token,
+                timeout=self.reply_timeout,
+                transports=self.transports,
+            )
+
+        if not ws.connect():
+            return False
+
+        ws.subscribe(self._on_push)
+        self._ws, self._own_ws = ws, own
+        return True
+
+    def _disconnect(self):
+        if self._ws is not None:
+            ws, self._ws = self._ws, None
+            ws.unsubscribe(self._on_push)
+
+            if self._own_ws:
+                ws.close()
+
+    def _on_push(self, data):
+        """
+        Takes a message pushed by the backend into account. Messages of failed actions are
+        ignored: they are not answers to our requests.
+        """
+
+        process = data.get("response")
+
+        if data.get("state") != "done" or not isinstance(process, dict):
+            return
+
+        if str(process.get("id")) in self.pids:
+            self._events.put((str(process["id"]), "done", process))
+
+    def _on_reply(self, pid, future):
+        self._requests.pop(future, None)
+
+        if future.exception() is not None:
+            self._events.put((pid, "lost", None))
+        else:
+            self._events.put((pid, *future.result()))
+
+    def _request(self, pid):
+        """
+        Asks the state of pid: its answer is put in the events queue.
+        """
+        from .exceptions import WebSocketError
+
+        if self._ws is not None:
+            try:
+                future = self._ws.submit(self.ACTION, {"id": pid})
+            except WebSocketError:
+                self._fallback("unavailable")
+            else:
+                self._requests[future] = (pid, time.monotonic())
+                future.add_done_callback(lambda ff: self._on_reply(pid, ff))
+                return
+
+        self._events.put((pid, "done", self.client.query().app.process(pid).get()))
+
+    def _fallback(self, reason):
+        """
+        Gives up the websocket. Returns the pids whose state was asked and not answered.
+        """
+        from .logs import warning
+
+        if self._ws is None:
+            return []
+
+        warning(f"Websocket {reason}, polling process states instead.")
+
+        self._disconnect()
+        pending, self._requests = self._requests, {}
+
+        return [pid for pid, _ in pending.values()]
+
+    def _check_replies(self):
+        now = time.monotonic()
+
+        if self._ws is not None and not self._ws.connected:
+            return self._fallback("disconnected")
+
+        sent = [at for _, at in list(self._requests.values())]
+
+        if any(now - at > self.reply_timeout for at in sent):
+            return self._fallback(f"silent for {self.reply_timeout} seconds")
+
+        return []
+
+    def __iter__(self):
+        """
+        Yields (pid, process) every time the state of a process changes, process being the
+        body of app.process(pid).get. Ends once every process is in a terminal state.
+        """
+
+        states = {}
+        intervals = {pid: self.min_interval for pid in self.pids}
+        due = {pid: 0.0 for pid in self.pids}
+
+        self._connect()
+
+        try:
+            while due:
+                for pid in self._check_replies():
+                    if pid in due:
+                        due[pid] = 0.0
+
+                now = time.monotonic()
+
+                for pid, at in list(due.items()):
+                    if at <= now:
+                        due[pid] = now + intervals[pid]
+                        self._request(pid)
+
+                wait = min(due.values()) - time.monotonic()
+
+                try:
+                    pid, state, process = self._events.get(
+                        timeout=max(0.0, min(wait, self.reply_timeout))
+                    )
+                except queue.Empty:
+                    continue
+
+                if pid not in due:
+                    continue
+
+                if state != "done" or not isinstance(process, dict):
+                    for other in self._fallback(f"answered {state}") + [pid]:
+                        if other in due:
+                            due[other] = 0.0
+                    continue
+
+                if process.get("state") == states.get(pid):
+                    intervals[pid] = min(self.max_interval, intervals[pid] * self.backoff)
+                    continue
+
+                states[pid] = process.get("state")
+                intervals[pid] = self.min_interval
+                due[pid] = time.monotonic() + intervals[pid]
+
+                if is_terminal(states[pid]):
+                    del due[pid]
+
+                yield pid, process
+        finally:
+            self._disconnect()
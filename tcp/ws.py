@@ -0,0 +1,234 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from . import exceptions
+
+
+# Actions of TCP websocket that only read, and may be sent again over HTTP if lost
+IDEMPOTENT_ACTIONS = frozenset(
+    [
+        "auth_get",
+        "help_get",
+        "app_get",
+        "app_processes_get",
+        "app_process_get",
+        "data_get",
+        "data_post",
+        "data_exists_post",
+        "data_download_post",
+    ]
+)
+
+
+def action_of(method: str, path: str):
+    """
+    Websocket action of an API call, e.g. "data_download_post" for POST /data/download.
+
+    Returns None for paths holding ids (e.g. /app/process/1234), which have no action.
+    """
+
+    from .metrics import route_of
+
+    segments = [ss for ss in path.split("?")[0].split("/") if ss]
+
+    if not segments or "<id>" in route_of("/".join(segments)).split("/"):
+        return None
+
+    return "_".join(segments + [method.lower()])
+
+
+class WebSocketTransport(object):
+    """
+    Persistent connection to TCP websocket, carrying API calls as `backend_message` actions.
+
+    Every message gets a unique id, and the `json` event answering it is matched by this
+    id: any number of calls may be in flight over the connection. Messages answering no
+    call (e.g. pushed by the backend) are handed to the subscribed callbacks.
+
+    The connection is opened on first use. Once lost, the calls in flight fail with
+    tcp.exceptions.WebSocketError and it is opened again by the next call, at most every
+    reconnect_delay seconds; in between, calls fail at once so that callers fall back to HTTP.
+
+    Queries (see tcp.client.query) only use the websocket for the actions listed in actions:
+    every other call goes over HTTP.
+
+    Args:
+        host (str): uri of TCP websocket
+        token (str): connection JWT
+        timeout (float): seconds to wait for an answer.
+        reconnect_delay (float): minimum seconds between two connection attempts.
+        transports (list): socket.io transports used to reach the websocket.
+        actions (list): optional. Actions queries may send (default: IDEMPOTENT_ACTIONS). They must be idempotent: a call lost with the connection is sent again over HTTP.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        token: str,
+        timeout: float = 30.0,
+        reconnect_delay: float = 5.0,
+        transports=("websocket",),
+        actions=IDEMPOTENT_ACTIONS,
+    ):
+        self.host = host
+        self.token = token
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.transports = list(transports)
+        self.actions = frozenset(actions)
+
+        self._sio = None
+        self._pending = {}
+        self._listeners = []
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self._sio is not None and self._sio.connected
+
+    def connect(self):
+        """
+        Opens the connection if needed. Returns False if the websocket is unavailable.
+        """
+
+        import socketio
+        from .logs import warning
+
+        with self._lock:
+            if self.connected:
+                return True
+
+            if time.monotonic() < self._retry_at:
+                return False
+
+            sio = socketio.Client(reconnection=False)
+            sio.on("json", self._on_message)
+            sio.on("disconnect", self._on_disconnect)
+
+            try:
+                sio.connect(
+                    self.host,
+                    transports=self.transports,
+                    headers={"Authorization": f"Bearer {self.token}"},
+                    wait_timeout=self.timeout,
+                )
+            except (socketio.exceptions.ConnectionError, ValueError) as err:
+                warning(
+                    f"Websocket unavailable ({err}). "
+                    f"Try again in {self.reconnect_delay} seconds."
+                )
+                self._retry_at = time.monotonic() + self.reconnect_delay
+                return False
+
+            self._sio = sio
+            return True
+
+    def subscribe(self, callback):
+        """
+        Calls callback(message) with every message answering no call.
+        """
+
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def submit(self, action: str, body=None):
+        """
+        Sends action without waiting for its answer.
+
+        Returns:
+            A concurrent.futures.Future of (state, response), state being "done" on success.
+
+        Exceptions:
+            tcp.exceptions.WebSocketError: if the websocket is unavailable. The message was not sent.
+        """
+
+        import socketio
+
+        if not self.connect():
+            raise exceptions.WebSocketError("Websocket unavailable", sent=False)
+
+        msg_id = str(uuid.uuid4())
+        future = Future()
+
+        with self._lock:
+            self._pending[msg_id] = future
+
+        try:
+            self._sio.emit(
+                "backend_message", {"action": action, "id": msg_id, "body": body or {}}
+            )
+        except (socketio.exceptions.SocketIOError, AttributeError) as err:
+            with self._lock:
+                self._pending.pop(msg_id, None)
+            raise exceptions.WebSocketError(str(err), sent=False) from err
+
+        future.msg_id = msg_id
+        return future
+
+    def call(self, action: str, body=None, timeout: float = None):
+        """
+        Sends action and waits for its answer.
+
+        Returns:
+            (state, response), state being "done" on success.
+
+        Exceptions:
+            tcp.exceptions.WebSocketError: if the websocket is unavailable, is lost or does not answer in time. sent is False if the message was not sent.
+        """
+
+        future = self.submit(action, body)
+
+        try:
+            return future.result(timeout or self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._pending.pop(future.msg_id, None)
+            raise exceptions.WebSocketError(
+                f"No answer to {action} after {timeout or self.timeout} seconds", sent=True
+            )
+
+    def close(self):
+        with self._lock:
+            sio, self._sio = self._sio, None
+
+        if sio is not None:
+            sio.disconnect()
+
+        self._fail_pending("Websocket closed")
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for future in pending.values():
+            future.set_exception(exceptions.WebSocketError(reason, sent=True))
+
+    def _on_disconnect(self, *args):
+        self._fail_pending("Websocket disconnected")
+
+    def _on_message(self, data):
+        if isinstance(data, (str, bytes)):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                return
+
+        if not isinstance(data, dict):
+            return
+
+        with self._lock:
+            future = self._pending.pop(data.get("id"), None)
+
+        if future is not None:
+            future.set_result((data.get("state"), data.get("response")))
+            return
+
+        for callback in list(self._listeners):
+            callback(data)
@@ -0,0 +1,67 @@
+"""
+Compares the decoding of large listing payloads by slumber's JsonSerializer and FastJsonSerializer.
+
+Run with: python -m tests.bench_serializer [num_entries] [repeat]
+"""
+
+import json
+import sys
+import time
+from slumber.serialize import JsonSerializer
+from tcp.json_serializer import FastJsonSerializer
+
+
+def listing(num_entries):
+    """
+    A page of data.post answered with expands_info, as raw bytes.
+    """
+
+    files = [
+        {
+            "uri": f"project/run-{ii // 100}/frame-{ii:06d}.tif",
+            "size": 1024 * ii,
+            "last_modified": "2024-11-18T10:24:31.000Z",
+            "etag": f'"{ii:032x}"',
+        }
+        for ii in range(num_entries)
+    ]
+    dirs = [
+        {"uri": f"project/run-{ii}/", "last_modified": "2024-11-18T10:24:31.000Z"}
+        for ii in range(num_entries // 100)
+    ]
+    paging = {
+        "count": len(files) + len(dirs),
+        "items_per_page": len(files) + len(dirs),
+        "next": "https://api.thecrossproduct.xyz/v1/data/next/4b5e7d0c",
+    }
+
+    return json.dumps({"files": files, "dirs": dirs, "paging": paging}).encode()
+
+
+def run(serializer, payload, repeat):
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        serializer.loads(payload)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main(num_entries=100000, repeat=5):
+    payload = listing(num_entries)
+    print(f"payload: {len(payload) / 1024 / 1024:.1f}MB, {num_entries} entries")
+
+    baseline = run(JsonSerializer(), payload, repeat)
+    fast = run(FastJsonSerializer(), payload, repeat)
+
+    print(f"{'json':<16} {baseline * 1e3:>8.1f}ms")
+    print(
+        f"{FastJsonSerializer.backend:<16} {fast * 1e3:>8.1f}ms  "
+        f"x{baseline / max(fast, 1e-9):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
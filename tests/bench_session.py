@@ -0,0 +1,52 @@
+"""
+Compares a fresh session per query against the client's pooled session.
+
+Run with: python -m tests.bench_session [num_calls]
+"""
+
+import sys
+import time
+import tcp
+from .stub import StubAPI
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(stub, client, num_calls):
+    connections = stub.connections
+    latencies = []
+
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        client.query().auth.get()
+        latencies.append(time.perf_counter() - start)
+
+    return stub.connections - connections, latencies
+
+
+def main(num_calls=500):
+    with StubAPI() as stub:
+        client = tcp.client(host=stub.host, token="stub")
+
+        class freshClient(tcp.client):
+            def _get_session(self):
+                return self._make_requests_session()
+
+        fresh = freshClient(host=stub.host, token="stub")
+
+        for name, cc in [("fresh session", fresh), ("pooled session", client)]:
+            connections, latencies = run(stub, cc, num_calls)
+            print(
+                f"{name:<16} connections: {connections:>5}  "
+                f"p50: {percentile(latencies, 50) * 1e3:.3f}ms  "
+                f"p99: {percentile(latencies, 99) * 1e3:.3f}ms"
+            )
+
+        client.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
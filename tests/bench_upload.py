@@ -0,0 +1,47 @@
+"""
+Compares hashing parts while they are uploaded against a second full read of the file.
+
+Run with: python -m tests.bench_upload [size_in_mb] [mb_per_second_per_connection]
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tcp
+from .stub import StubAPI
+
+
+def main(size_in_mb=512, mb_per_second_per_connection=50):
+    with StubAPI() as stub, tempfile.TemporaryDirectory() as tmpdir:
+        stub.part_size = 16 * 1024 * 1024
+        stub.bandwidth = mb_per_second_per_connection * 1024 * 1024
+        client = tcp.client(host=stub.host, token="stub")
+
+        path = os.path.join(tmpdir, "cloud.laz")
+        with open(path, "wb") as f:
+            for _ in range(size_in_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        start = time.perf_counter()
+        client.upload(path, "two_pass.laz", compute_md5sum=False)
+        hash_md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(8192), b""):
+                hash_md5.update(chunk)
+        hash_md5.hexdigest()
+        two_pass = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.upload(path, "in_stream.laz")
+        in_stream = time.perf_counter() - start
+
+        print(f"upload of {size_in_mb}MB then md5 pass: {two_pass:.2f}s")
+        print(f"upload of {size_in_mb}MB hashed in-stream: {in_stream:.2f}s")
+
+        client.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
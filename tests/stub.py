@@ -0,0 +1,565 @@
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        bandwidth = self.server.stub.bandwidth
+
+        if not bandwidth:
+            return self.rfile.read(length) if length else b""
+
+        chunks = []
+        while length > 0:
+            chunk = self.rfile.read(min(length, 256 * 1024))
+            time.sleep(len(chunk) / bandwidth)
+            chunks.append(chunk)
+            length -= len(chunk)
+        return b"".join(chunks)
+
+    def _send(self, status, payload=None, headers=None):
+        if isinstance(payload, (dict, list)):
+            content = json.dumps(payload).encode()
+            content_type = "application/json"
+        else:
+            content = payload or b""
+            content_type = "application/octet-stream"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for key, val in (headers or {}).items():
+            self.send_header(key, val)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _dispatch(self, method):
+        stub = self.server.stub
+        path = self.path.split("?")[0]
+
+        with stub.lock:
+            stub.requests.append((method, path))
+
+        body = self._read_body()
+
+        handler = stub.routes.get((method, path))
+
+        if handler is None:
+            for route_method, prefix, route in stub.prefix_routes:
+                if route_method == method and path.startswith(prefix):
+                    handler = route
+                    break
+
+        if handler is None:
+            return self._send(404, {"error": f"{method} {path} not found"})
+
+        return handler(self, body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class StubAPI(object):
+    """
+    Local stand-in for TCP API, serving a few routes over HTTP/1.1 keep-alive.
+
+    Routes are registered in `routes` as (method, path) -> handler(request, body).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.routes = {}
+        self.prefix_routes = []
+
+        self.part_size = 5 * 1024 * 1024
+        self.objects = {}
+        self.uploads = {}
+        self.pending = {}
+        self.processes = []
+        self.outputs = {}
+        self.runs = []
+        self.apps = {"test": ["helloworld"]}
+        self.listings = {}
+        self.support_range = True
+        self.broken_downloads = 0
+        self.url_version = 0
+        self.expired_before = 0
+        self.broken_parts = 0
+        self.broken_objects = 0
+        self.dropped_parts = 0
+        self.bandwidth = None
+
+        self.routes[("GET", "/v1/auth")] = lambda req, body: req._send(
+            200, {"id": "stub", "mail": "stub@thecrossproduct.com"}
+        )
+
+        self.routes[("GET", "/v1/help")] = self._help
+        self.routes[("GET", "/v1/app")] = self._apps
+        self.routes[("POST", "/v1/data")] = self._data_list
+        self.routes[("GET", "/v1/app/processes")] = self._processes_list
+        self.routes[("POST", "/v1/data/exists")] = self._data_exists
+        self.routes[("POST", "/v1/data/remove")] = self._data_remove
+        self.routes[("POST", "/v1/data/copy")] = self._data_copy
+        self.routes[("POST", "/v1/data/upload/singlepart")] = self._singlepart
+        self.routes[("POST", "/v1/data/upload/singlepart/complete")] = self._commit
+        self.routes[("POST", "/v1/data/upload/multipart")] = self._multipart
+        self.routes[("POST", "/v1/data/upload/multipart/complete")] = self._complete
+        self.routes[("POST", "/v1/data/upload/multipart/abort")] = self._abort
+        self.routes[("POST", "/v1/data/download")] = self._download
+        self.prefix_routes.append(("POST", "/v1/app/", self._run))
+        self.prefix_routes.append(("GET", "/v1/data/next/", self._next_page))
+        self.prefix_routes.append(("GET", "/v1/app/processes/next/", self._next_page))
+        self.prefix_routes.append(("GET", "/v1/app/process/outputs/", self._outputs))
+        self.prefix_routes.append(("PUT", "/s3/parts/", self._put_part))
+        self.prefix_routes.append(("PUT", "/s3/objects/", self._put_object))
+        self.prefix_routes.append(("GET", "/s3/objects/", self._get_object))
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    def _help(self, req, body):
+        routes = [
+            {"endpoint": "/auth", "methods": ["GET"]},
+            {"endpoint": "/app", "methods": ["GET"]},
+            {"endpoint": "/data", "methods": ["POST"]},
+        ]
+        return req._send(200, {"routes": routes})
+
+    def _apps(self, req, body):
+        etag = '"%s"' % hashlib.md5(json.dumps(self.apps).encode()).hexdigest()
+        if req.headers.get("If-None-Match") == etag:
+            return req._send(304, headers={"ETag": etag})
+        return req._send(200, self.apps, {"ETag": etag})
+
+    def _page(self, req, base, table, items, per_page, offset=0):
+        page = {table: items[offset : offset + per_page]}
+        paging = {"count": len(page[table]), "items_per_page": per_page}
+
+        if offset + per_page < len(items):
+            token = str(uuid.uuid4())
+            with self.lock:
+                self.listings[token] = (base, table, items, per_page, offset + per_page)
+            paging["next"] = f"{self.host}{base}/next/{token}"
+
+        page["paging"] = paging
+        if table == "files":
+            page["dirs"] = []
+
+        return req._send(200, page)
+
+    def _run(self, req, body):
+        path = req.path.split("?")[0].rstrip("/").split("/")
+        if len(path) != 6 or path[-1] != "run":
+            return req._send(404, {"error": f"POST {req.path} not found"})
+        if path[3] not in self.apps or path[4] not in self.apps[path[3]]:
+            return req._send(403, {"error": "no license"})
+        body = json.loads(body or b"{}")
+        with self.lock:
+            self.runs.append(body)
+            pid = len(self.runs)
+        return req._send(200, {"id": pid})
+
+    def _data_list(self, req, body):
+        body = json.loads(body or b"{}")
+        prefix = body.get("prefix", "")
+        group = body.get("group")
+        spaces = [f"{group}@"] if group else []
+        if body.get("personal", True):
+            spaces.append("")
+        files = sorted(
+            uu
+            for uu in self.objects
+            for space in spaces
+            if uu.startswith(space + prefix) and (space or "@" not in uu.split("/")[0])
+        )
+        per_page = int(body.get("items_per_page", 100))
+        return self._page(req, "/data", "files", files, per_page)
+
+    def _processes_list(self, req, body):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(req.path).query)
+        per_page = int(query.get("items_per_page", [100])[0])
+        return self._page(req, "/app/processes", "processes", self.processes, per_page)
+
+    def _outputs(self, req, body):
+        path = req.path.split("?")[0].rstrip("/")
+        if "/next/" in path:
+            return self._next_page(req, body)
+        pid = path.split("/")[-1]
+        if pid not in self.outputs:
+            return req._send(404, {"error": "unknown process"})
+        outputs = [
+            {"key": key, "url": f"{self.url}/s3/objects/{uri}?v={self.url_version}"}
+            for key, uri in self.outputs[pid]
+        ]
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(req.path).query)
+        per_page = int(query.get("items_per_page", [2])[0])
+        return self._page(req, f"/app/process/outputs/{pid}", "outputs", outputs, per_page)
+
+    def _next_page(self, req, body):
+        token = req.path.split("?")[0].rstrip("/").split("/")[-1]
+        with self.lock:
+            listing = self.listings.pop(token, None)
+        if listing is None:
+            return req._send(404, {"error": "unknown token"})
+        return self._page(req, *listing)
+
+    def _data_exists(self, req, body):
+        uris = json.loads(body)["uri"]
+        if not isinstance(uris, list):
+            uris = [uris]
+        if all(uu in self.objects for uu in uris):
+            return req._send(200, {"exists": True})
+        return req._send(404, {"error": "not found"})
+
+    def _data_remove(self, req, body):
+        uris = json.loads(body)["uri"]
+        if not isinstance(uris, list):
+            uris = [uris]
+        with self.lock:
+            for uu in uris:
+                self.objects.pop(uu, None)
+        return req._send(200, {"removed": uris})
+
+    def _data_copy(self, req, body):
+        body = json.loads(body)
+        src, dest = body["src"], body["dest"]
+        if not isinstance(src, list):
+            src, dest = [src], [dest]
+        if any(ss not in self.objects for ss in src):
+            return req._send(404, {"error": "not found"})
+        with self.lock:
+            for ss, dd in zip(src, dest):
+                if body.get("overwrite") or dd not in self.objects:
+                    self.objects[dd] = self.objects[ss]
+        return req._send(200, {"copied": dest})
+
+    def _singlepart(self, req, body):
+        uri = json.loads(body)["uri"]
+        return req._send(200, {"url": f"{self.url}/s3/objects/{uri}"})
+
+    def _put_object(self, req, body):
+        uri = req.path.split("?")[0][len("/s3/objects/") :]
+        with self.lock:
+            if self.broken_objects > 0:
+                self.broken_objects -= 1
+                return req._send(500, b"InternalError")
+            self.pending[uri] = body
+        return req._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def _commit(self, req, body):
+        uri = json.loads(body)["uri"]
+        with self.lock:
+            if uri not in self.pending:
+                return req._send(404, {"error": "nothing uploaded"})
+            self.objects[uri] = self.pending.pop(uri)
+        return req._send(200, {"uri": uri})
+
+    def _multipart(self, req, body):
+        body = json.loads(body)
+        size = int(body["size"])
+        part_size = int(body.get("part_size", self.part_size))
+        num_parts = max(1, -(-size // part_size))
+        upload_id = body.get("upload_id")
+
+        with self.lock:
+            if upload_id not in self.uploads:
+                upload_id = str(uuid.uuid4())
+                self.uploads[upload_id] = {"uri": body["uri"], "parts": {}}
+
+        urls = [f"{self.url}/s3/parts/{upload_id}/{ii + 1}" for ii in range(num_parts)]
+        return req._send(
+            200, {"upload_id": upload_id, "parts": urls, "part_size": part_size}
+        )
+
+    def _put_part(self, req, body):
+        upload_id, part_no = req.path.split("?")[0].split("/")[-2:]
+        etag = hashlib.md5(body).hexdigest()
+
+        with self.lock:
+            if upload_id not in self.uploads:
+                return req._send(404, b"NoSuchUpload")
+            if self.broken_parts > 0:
+                self.broken_parts -= 1
+                return req._send(500, b"InternalError")
+            if self.dropped_parts > 0:
+                self.dropped_parts -= 1
+                req.close_connection = True
+                return
+            self.uploads[upload_id]["parts"][int(part_no)] = (etag, body)
+
+        return req._send(200, headers={"ETag": f'"{etag}"'})
+
+    def _complete(self, req, body):
+        body = json.loads(body)
+
+        with self.lock:
+            upload = self.uploads.pop(body["upload_id"], None)
+
+        if upload is None:
+            return req._send(404, {"error": "no such upload"})
+
+        content = []
+        for part in body["parts"]:
+            etag, data = upload["parts"][part["PartNumber"]]
+            if etag != part["ETag"]:
+                return req._send(400, {"error": "ETag mismatch"})
+            content.append(data)
+        content = b"".join(content)
+
+        md5sum = hashlib.md5(content).hexdigest()
+        if body.get("md5sum", md5sum) != md5sum:
+            return req._send(400, {"error": "md5sum mismatch"})
+
+        with self.lock:
+            self.objects[body["uri"]] = content
+
+        return req._send(200, {"uri": body["uri"]})
+
+    def _abort(self, req, body):
+        with self.lock:
+            self.uploads.pop(json.loads(body)["upload_id"], None)
+        return req._send(200, {"aborted": True})
+
+    def _download(self, req, body):
+        uri = json.loads(body)["uri"]
+        if uri not in self.objects:
+            return req._send(404, {"error": "not found"})
+        with self.lock:
+            self.url_version += 1
+        return req._send(
+            200,
+            {
+                uri: f"{self.url}/s3/objects/{uri}?v={self.url_version}",
+                "md5sum": hashlib.md5(self.objects[uri]).hexdigest(),
+            },
+        )
+
+    def _get_object(self, req, body):
+        uri = req.path.split("?")[0][len("/s3/objects/") :]
+        content = self.objects.get(uri)
+
+        if content is None:
+            return req._send(404, b"NoSuchKey")
+
+        if int(req.path.split("?v=")[-1]) < self.expired_before:
+            return req._send(403, b"Request has expired")
+
+        status = 200
+        headers = {"ETag": '"%s"' % hashlib.md5(content).hexdigest()}
+        range_header = req.headers.get("Range")
+
+        if self.support_range and range_header:
+            start, end = range_header.split("=")[1].split("-")
+            start, end = int(start), min(int(end), len(content) - 1)
+            if start >= len(content):
+                return req._send(416, b"InvalidRange")
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+            content = content[start : end + 1]
+
+        with self.lock:
+            broken = self.broken_downloads > 0 and len(content) > 1
+            if broken:
+                self.broken_downloads -= 1
+
+        if broken:
+            req.send_response(status)
+            req.send_header("Content-Length", str(len(content)))
+            for key, val in headers.items():
+                req.send_header(key, val)
+            req.end_headers()
+            req.wfile.write(content[: len(content) // 2])
+            req.close_connection = True
+            return
+
+        return req._send(status, content, headers)
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self._server.server_address
+
+    @property
+    def host(self):
+        return self.url + "/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class StubSocket(object):
+    """
+    Local stand-in for TCP websocket: a socket.io server answering `backend_message` events.
+
+    Actions are registered in `actions` as name -> handler(body) returning the response.
+    A handler raising answers a "failed" state. Runs aiohttp in a background thread.
+    """
+
+    def __init__(self):
+        self.actions = {}
+        self.messages = []
+        self.connections = 0
+        self.sids = []
+        self.token = None
+
+        self._loop = None
+        self._runner = None
+        self._port = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def _serve(self):
+        import asyncio
+        import socketio
+        from aiohttp import web
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        # Short pings end long-polling requests quickly, so that clients disconnect fast
+        self.sio = socketio.AsyncServer(
+            async_mode="aiohttp", ping_interval=0.5, ping_timeout=1
+        )
+        app = web.Application()
+        self.sio.attach(app)
+
+        @self.sio.event
+        async def connect(sid, environ):
+            self.connections += 1
+            self.sids.append(sid)
+            self.token = environ.get("HTTP_AUTHORIZATION")
+            await self.sio.emit(
+                "info", {"message": "Connection to TCP Websocket"}, to=sid
+            )
+
+        @self.sio.on("backend_message")
+        async def backend_message(sid, data):
+            self.messages.append(data)
+            handler = self.actions.get(data["action"])
+
+            try:
+                if handler is None:
+                    raise KeyError(data["action"])
+                response = handler(data.get("body"))
+                if asyncio.iscoroutine(response):
+                    response = await response
+                state = "done"
+            except Exception as err:
+                response, state = {"error": str(err)}, "failed"
+
+            reply = {
+                "action": data["action"],
+                "state": state,
+                "response": response,
+                "id": data["id"],
+            }
+            await self.sio.emit("json", json.dumps(reply), to=sid)
+
+        async def start():
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            self._port = site._server.sockets[0].getsockname()[1]
+
+        self._loop.run_until_complete(start())
+        self._ready.set()
+        self._loop.run_forever()
+
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    def push(self, message):
+        """
+        Sends message, as a `json` event, to every connected client.
+        """
+        import asyncio
+
+        asyncio.run_coroutine_threadsafe(
+            self.sio.emit("json", json.dumps(message)), self._loop
+        ).result()
+
+    def disconnect_all(self):
+        import asyncio
+
+        async def disconnect():
+            for sid in self.sids:
+                await self.sio.disconnect(sid)
+            self.sids = []
+
+        asyncio.run_coroutine_threadsafe(disconnect(), self._loop).result()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d" % self._port
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        import asyncio
+
+        if self._thread is None:
+            return
+
+        async def shutdown():
+            await self.sio.shutdown()
+            await self._runner.cleanup()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
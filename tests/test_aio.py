@@ -0,0 +1,178 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import tcp
+from tcp.retry import RetryPolicy
+from .stub import StubAPI
+
+try:
+    import aiohttp
+    import tcp.aio
+except ImportError:
+    aiohttp = None
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AioTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._stub.part_size = 64 * 1024
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._stub.stop()
+        self._tmpdir.cleanup()
+
+    def run_with_client(self, coro_fn, **kwargs):
+        async def main():
+            async with tcp.aio.client(host=self._stub.host, token="stub", **kwargs) as cc:
+                return await coro_fn(cc)
+
+        return asyncio.run(main())
+
+    def test_query(self):
+        self._stub.objects.update({"a.laz": b"", "b.laz": b""})
+
+        async def queries(cc):
+            listing = await cc.query().data.post({"items_per_page": 1})
+            token = listing["paging"]["next"].split("/")[-1]
+            second = await cc.query().data.next(token).get()
+            many = await asyncio.gather(
+                *[cc.query().data.exists.post({"uri": "a.laz"}) for _ in range(50)]
+            )
+            with self.assertRaises(tcp.exceptions.HttpClientError):
+                await cc.query().data.exists.post({"uri": "c.laz"})
+            return listing["files"] + second["files"], many
+
+        files, many = self.run_with_client(queries, pool_size=4)
+
+        self.assertListEqual(files, ["a.laz", "b.laz"])
+        self.assertListEqual(many, [{"exists": True}] * 50)
+        self.assertLessEqual(self._stub.connections, 4)
+
+    def test_retry(self):
+        calls = []
+
+        def maintenance(req, body):
+            calls.append(1)
+            if len(calls) < 2:
+                return req._send(503, {"error": "maintenance"})
+            return req._send(200, {"id": "stub"})
+
+        self._stub.routes[("GET", "/v1/auth")] = maintenance
+
+        resp = self.run_with_client(
+            lambda cc: cc.query().auth.get(), retry=RetryPolicy(base_delay=0)
+        )
+
+        self.assertDictEqual(resp, {"id": "stub"})
+        self.assertEqual(len(calls), 2)
+
+    def test_errors(self):
+        async def missing(cc):
+            with self.assertRaises(tcp.exceptions.HttpClientError) as ctx:
+                await cc.query().data.exists.post({"uri": "c.laz"})
+            return ctx.exception
+
+        err = self.run_with_client(missing)
+
+        self.assertEqual(err.response.status_code, 404)
+        self.assertEqual(err.response.status, 404)
+        self.assertIn("error", err.response.text)
+
+    def test_keep_track(self):
+        from tcp.track_usage import TrackUsage
+
+        tracker = TrackUsage()
+        saved = getattr(tracker, "uses", None)
+        tracker.uses = {}
+
+        async def queries(cc):
+            await asyncio.gather(*[cc.query().auth.get() for _ in range(5)])
+
+        try:
+            self.run_with_client(queries, keep_track=True)
+            self.assertEqual(tracker.uses["^\\/auth\\+GET$"], 5)
+        finally:
+            tracker.uses = saved
+            if saved is None:
+                del tracker.uses
+
+        helps = [rr for rr in self._stub.requests if rr[1] == "/v1/help"]
+        self.assertEqual(len(helps), 1)
+
+    def test_upload_download(self):
+        path = os.path.join(self._tmpdir.name, "cloud.laz")
+        with open(path, "wb") as f:
+            f.write(os.urandom(300 * 1024 + 17))
+
+        os.makedirs(os.path.join(self._tmpdir.name, "tiles", "sub"))
+        for name in ["a.laz", "sub/b.laz"]:
+            with open(os.path.join(self._tmpdir.name, "tiles", name), "wb") as f:
+                f.write(os.urandom(1000))
+
+        self._stub.broken_parts = 1
+        dest = os.path.join(self._tmpdir.name, "download.laz")
+
+        async def transfers(cc):
+            await cc.upload(path, "cloud.laz", delay_between_tries=0)
+            await cc.upload(os.path.join(self._tmpdir.name, "tiles"), "dest")
+            await cc.download("cloud.laz", dest, ignore_md5=False)
+            with open(dest, "rb") as f:
+                single = f.read()
+            await cc.download(
+                "cloud.laz",
+                dest,
+                ignore_md5=False,
+                num_connections=3,
+                segment_size=64 * 1024,
+            )
+            with self.assertRaises(tcp.exceptions.UploadError):
+                await cc.upload(path, "cloud.laz")
+            return single
+
+        single = self.run_with_client(transfers)
+
+        with open(path, "rb") as f:
+            content = f.read()
+
+        self.assertEqual(self._stub.objects["cloud.laz"], content)
+        self.assertEqual(single, content)
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertIn("dest/tiles/sub/b.laz", self._stub.objects)
+
+
+    def test_download_refresh(self):
+        content = os.urandom(4 * 1024 * 1024)
+        self._stub.objects["cloud.laz"] = content
+        dest = os.path.join(self._tmpdir.name, "download.laz")
+
+        def expired_after_probe(req, body):
+            if "?v=1" in req.path and req.headers.get("Range") != "bytes=0-0":
+                return req._send(403, b"Request has expired")
+            return self._stub._get_object(req, body)
+
+        self._stub.prefix_routes.insert(0, ("GET", "/s3/objects/", expired_after_probe))
+
+        self.run_with_client(
+            lambda cc: cc.download(
+                "cloud.laz",
+                dest,
+                num_connections=4,
+                segment_size=1024 * 1024,
+                delay_between_tries=0,
+            )
+        )
+
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), content)
+
+        # Segments refused at once share a single fresh link
+        posts = [rr for rr in self._stub.requests if rr[1] == "/v1/data/download"]
+        self.assertEqual(len(posts), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
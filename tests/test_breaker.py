@@ -0,0 +1,85 @@
+import time
+import unittest
+import tcp
+from tcp.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from tcp.metrics import Metrics
+from tcp.retry import RetryPolicy
+from .stub import StubAPI
+
+
+class BreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+
+    def tearDown(self):
+        self._stub.stop()
+
+    def test_states(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        key = breaker.key("http://api", "/data/123")
+
+        self.assertEqual(key, ("http://api", "/data/<id>"))
+
+        for _ in range(2):
+            breaker.before(key)
+            breaker.record(key, failed=True)
+        self.assertEqual(breaker.state(key), OPEN)
+
+        with self.assertRaises(tcp.exceptions.CircuitOpenError):
+            breaker.before(key)
+
+        time.sleep(0.06)
+        breaker.before(key)
+        self.assertEqual(breaker.state(key), HALF_OPEN)
+
+        with self.assertRaises(tcp.exceptions.CircuitOpenError):
+            breaker.before(key)
+
+        breaker.record(key, failed=True)
+        self.assertEqual(breaker.state(key), OPEN)
+
+        time.sleep(0.06)
+        breaker.before(key)
+        breaker.record(key, failed=False)
+        self.assertEqual(breaker.state(key), CLOSED)
+
+    def test_client(self):
+        calls = []
+
+        def down(req, body):
+            calls.append(1)
+            return req._send(503, {"error": "maintenance"})
+
+        self._stub.routes[("GET", "/v1/auth")] = down
+
+        metrics = Metrics()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, metrics=metrics)
+
+        with tcp.client(
+            host=self._stub.host,
+            token="stub",
+            retry=RetryPolicy(base_delay=0),
+            collect_metrics=metrics,
+            circuit_breaker=breaker,
+        ) as client:
+            with self.assertRaises(tcp.exceptions.CircuitOpenError):
+                client.query().auth.get()
+            self.assertEqual(len(calls), 3)
+
+            with self.assertRaises(tcp.exceptions.CircuitOpenError):
+                client.query().auth.get()
+            self.assertEqual(len(calls), 3)
+
+            # Other routes are not affected
+            self.assertIsInstance(client.query().app.get(), dict)
+
+            gauges = {
+                gg["labels"]["route"]: gg["value"]
+                for gg in client.metrics.snapshot()["gauges"]
+            }
+            self.assertEqual(gauges["/auth"], 1)
+            self.assertEqual(gauges["/app"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import tcp
+from .stub import StubAPI
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._client = tcp.client(host=self._stub.host, token="stub")
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+
+    def count_requests(self, path):
+        return len([rr for rr in self._stub.requests if rr[1] == path])
+
+    def test_exists_many(self):
+        uris = [f"tiles/{ii}.laz" for ii in range(25)]
+        self._stub.objects.update({uu: b"" for uu in uris})
+
+        self.assertDictEqual(
+            self._client.exists_many(uris, batch_size=10), {uu: True for uu in uris}
+        )
+        self.assertEqual(self.count_requests("/v1/data/exists"), 3)
+
+        del self._stub.requests[:]
+        del self._stub.objects["tiles/3.laz"]
+        found = self._client.exists_many(uris + ["tiles/0.laz"], batch_size=10)
+
+        self.assertListEqual(list(found), uris)
+        self.assertListEqual([uu for uu in uris if not found[uu]], ["tiles/3.laz"])
+        # The refused batch is split in halves: [0-4] [5-9], [0-1] [2-4], [2] [3-4], [3] [4]
+        self.assertEqual(self.count_requests("/v1/data/exists"), 3 + 8)
+
+        self.assertDictEqual(self._client.exists_many([]), {})
+
+    def test_remove_many(self):
+        uris = [f"tiles/{ii}.laz" for ii in range(25)]
+        self._stub.objects.update({uu: b"" for uu in uris + ["keep.laz"]})
+
+        self.assertEqual(len(self._client.remove_many(uris, batch_size=10)), 3)
+        self.assertListEqual(list(self._stub.objects), ["keep.laz"])
+
+    def test_copy_many(self):
+        self._stub.objects.update({"a.laz": b"a", "b.laz": b"b", "c.laz": b"c"})
+
+        self._client.copy_many(
+            ["a.laz", "c.laz"], ["b.laz", "d.laz"], batch_size=1, overwrite=True
+        )
+
+        self.assertEqual(self._stub.objects["b.laz"], b"a")
+        self.assertEqual(self._stub.objects["d.laz"], b"c")
+        self.assertEqual(self.count_requests("/v1/data/copy"), 2)
+
+        with self.assertRaises(ValueError):
+            self._client.copy_many(["a.laz"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
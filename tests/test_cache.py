@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import tcp
+from tcp.cache import ResponseCache, route_matches
+from .stub import StubAPI
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._stub.stop()
+        self._tmpdir.cleanup()
+
+    def count_requests(self, path):
+        return len([rr for rr in self._stub.requests if rr[1] == path])
+
+    def test_route_matches(self):
+        self.assertTrue(route_matches("/app/*/*/inputs", "/app/test/helloworld/inputs"))
+        self.assertFalse(route_matches("/app/*/*/inputs", "/app/test/inputs"))
+        self.assertTrue(route_matches("/help/**", "/help/app/test"))
+        self.assertFalse(route_matches("/app", "/app/processes"))
+
+    def test_ttl(self):
+        cache = ResponseCache(ttls={"/app": 60})
+        with tcp.client(host=self._stub.host, token="stub", cache=cache) as client:
+            for _ in range(3):
+                self.assertDictEqual(client.query().app.get(), self._stub.apps)
+                client.query().auth.get()
+
+        self.assertEqual(self.count_requests("/v1/app"), 1)
+        self.assertEqual(self.count_requests("/v1/auth"), 3)
+        self.assertEqual(cache.hits, 2)
+
+    def test_revalidation(self):
+        cache = ResponseCache(ttls={"/app": 60})
+        with tcp.client(host=self._stub.host, token="stub", cache=cache) as client:
+            client.query().app.get()
+
+            cache.get(cache.key(self._stub.host + "/app", {}, "Bearer stub"))["expires"] = 0
+            self.assertDictEqual(client.query().app.get(), self._stub.apps)
+            self.assertEqual(cache.revalidations, 1)
+
+            cache.get(cache.key(self._stub.host + "/app", {}, "Bearer stub"))["expires"] = 0
+            self._stub.apps = {"test": ["helloworld", "other"]}
+            self.assertDictEqual(client.query().app.get(), self._stub.apps)
+
+        self.assertEqual(self.count_requests("/v1/app"), 3)
+
+    def test_lru_and_persistence(self):
+        path = os.path.join(self._tmpdir.name, "cache.json")
+        cache = ResponseCache(default_ttl=60, max_entries=2, path=path)
+
+        for ii in range(3):
+            cache.put(cache.key(f"url{ii}"), 60, 200, {}, b"%d" % ii)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(cache.key("url0")))
+
+        reloaded = ResponseCache(path=path)
+        self.assertEqual(reloaded.get(cache.key("url2"))["content"], b"2")
+
+    def test_endpoints(self):
+        with tcp.client(host=self._stub.host, token="stub", cache=True) as client:
+            self.assertEqual(len(client._get_endpoints()), 3)
+            client._get_endpoints()
+
+        self.assertEqual(self.count_requests("/v1/help"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
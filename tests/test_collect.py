@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+import tcp
+from .stub import StubAPI
+
+
+class CollectTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._client = tcp.client(host=self._stub.host, token="stub")
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+        self._contents = {}
+        outputs = []
+
+        for ii, key in enumerate(["a.laz", "b.laz", "tiles/0.laz", "tiles/1.laz", "c.json"]):
+            uri = f"outputs/{key}"
+            self._contents[key] = os.urandom(1000 * (ii + 1))
+            self._stub.objects[uri] = self._contents[key]
+            outputs.append((key, uri))
+
+        self._stub.outputs["7"] = outputs
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+        self._tmpdir.cleanup()
+
+    def object_gets(self):
+        return [
+            path for method, path in self._stub.requests
+            if method == "GET" and path.startswith("/s3/objects/")
+        ]
+
+    def check_outputs(self, dest):
+        for key, content in self._contents.items():
+            with open(os.path.join(dest, key), "rb") as f:
+                self.assertEqual(f.read(), content)
+
+    def test_collect_outputs(self):
+        dest = os.path.join(self._tmpdir.name, "7")
+
+        res = self._client.collect_outputs(7, dest, max_concurrency=2)
+
+        self.assertEqual(
+            res, {os.path.join(dest, key): "downloaded" for key in self._contents}
+        )
+        self.check_outputs(dest)
+
+        listings = [
+            path for _, path in self._stub.requests
+            if path.startswith("/v1/app/process/outputs/")
+        ]
+        self.assertEqual(len(listings), 3)
+
+    def test_skip_collected_outputs(self):
+        dest = os.path.join(self._tmpdir.name, "7")
+        self._client.collect_outputs(7, dest)
+
+        with open(os.path.join(dest, "b.laz"), "r+b") as f:
+            f.write(b"changed")
+        os.truncate(os.path.join(dest, "c.json"), 10)
+
+        del self._stub.requests[:]
+        res = self._client.collect_outputs(7, dest)
+
+        self.assertEqual(res[os.path.join(dest, "a.laz")], "skipped")
+        self.assertEqual(res[os.path.join(dest, "b.laz")], "downloaded")
+        self.assertEqual(res[os.path.join(dest, "c.json")], "downloaded")
+        self.assertEqual(list(res.values()).count("skipped"), 3)
+        self.check_outputs(dest)
+
+        # One probe per output, and a download of the two changed ones
+        self.assertEqual(len(self.object_gets()), 7)
+
+    def test_collect_outputs_retries(self):
+        dest = os.path.join(self._tmpdir.name, "7")
+        self._stub.broken_downloads = 2
+
+        for num_connections in [1, 2]:
+            res = self._client.collect_outputs(
+                7, dest, num_tries=3, delay_between_tries=0, num_connections=num_connections
+            )
+            self.check_outputs(dest)
+
+        self.assertEqual(set(res.values()), {"skipped"})
+
+    def test_collect_outputs_outside_of_dest(self):
+        self._stub.outputs["7"].append(("../escape.laz", "outputs/a.laz"))
+
+        with self.assertRaises(tcp.exceptions.DownloadError):
+            self._client.collect_outputs(7, os.path.join(self._tmpdir.name, "7"))
+
+        self.assertFalse(os.path.exists(os.path.join(self._tmpdir.name, "escape.laz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
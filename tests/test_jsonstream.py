@@ -0,0 +1,57 @@
+import json
+import random
+import unittest
+import tcp
+from tcp.jsonstream import JsonArrayStream
+from .stub import StubAPI
+
+
+class JsonStreamTestCase(unittest.TestCase):
+    def test_chunks(self):
+        doc = {
+            "files": [
+                {"uri": f'a "quoted" [{ii}] {{x}} \\ é', "size": ii, "tags": [True, None]}
+                for ii in range(200)
+            ]
+            + [1, -2.5e3, "s", None],
+            "paging": {"next": "https://api/v1/data/next/abc", "count": 204},
+            "dirs": [],
+        }
+        raw = json.dumps(doc, indent=2).encode()
+        rng = random.Random(0)
+
+        for _ in range(50):
+            cuts = sorted(rng.sample(range(1, len(raw)), rng.randint(0, 100)))
+            chunks = [raw[a:b] for a, b in zip([0] + cuts, cuts + [len(raw)])]
+
+            stream = JsonArrayStream(chunks, ["files", "dirs"])
+            self.assertListEqual([entry for _, entry in stream], doc["files"])
+            self.assertDictEqual(stream.fields, {"paging": doc["paging"]})
+
+        for bad in [b'{"files": [1, 2', b'{"files": [1 2]}', b"[1]", b'{"files": ["a]}']:
+            with self.assertRaises(ValueError):
+                list(JsonArrayStream([bad], ["files"]))
+
+    def test_iter_data(self):
+        uris = [f"tiles/{ii:03d}.laz" for ii in range(25)]
+
+        with StubAPI() as stub:
+            stub.objects.update({uu: b"" for uu in uris + ["other.laz"]})
+            client = tcp.client(host=stub.host, token="stub", collect_metrics=True)
+
+            self.assertListEqual(
+                list(client.iter_data(prefix="tiles/", page_size=10, stream=True)), uris
+            )
+            self.assertEqual(
+                len([rr for rr in stub.requests if rr[1].startswith("/v1/data")]), 3
+            )
+            self.assertListEqual(list(client.iter_data(prefix="none/", stream=True)), [])
+
+            routes = client.metrics.snapshot()["routes"]
+            self.assertGreater(routes["POST /data"]["bytes_received"], 0)
+
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
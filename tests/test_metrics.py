@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import unittest
+import tcp
+from tcp.metrics import Histogram, route_of
+from tcp.retry import RetryPolicy
+from .stub import StubAPI
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._stub.part_size = 64 * 1024
+        self._client = tcp.client(
+            host=self._stub.host, token="stub", collect_metrics=True
+        )
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+        self._tmpdir.cleanup()
+
+    def test_histogram(self):
+        hist = Histogram([1, 2, 4])
+        for value in [0.5] * 50 + [1.5] * 45 + [3] * 4 + [10]:
+            hist.observe(value)
+
+        self.assertEqual(hist.count, 100)
+        self.assertAlmostEqual(hist.quantile(0.5), 1.0)
+        self.assertTrue(1 < hist.quantile(0.95) <= 2)
+        self.assertEqual(hist.quantile(1.0), 4)
+        self.assertIsNone(Histogram([1]).quantile(0.5))
+
+    def test_route_of(self):
+        self.assertEqual(route_of("/app/process/12/outputs"), "/app/process/<id>/outputs")
+        self.assertEqual(route_of("/data/exists"), "/data/exists")
+
+    def test_requests(self):
+        calls = []
+
+        def maintenance(req, body):
+            calls.append(1)
+            if len(calls) < 2:
+                return req._send(503, {"error": "maintenance"})
+            return req._send(200, {"id": "stub"})
+
+        self._stub.routes[("GET", "/v1/auth")] = maintenance
+        self._client.retry = RetryPolicy(base_delay=0)
+
+        self._client.query().auth.get()
+
+        with self.assertRaises(tcp.exceptions.HttpClientError):
+            self._client.query().data.exists.post({"uri": "nothing.laz"})
+
+        routes = self._client.metrics.snapshot()["routes"]
+
+        self.assertEqual(routes["GET /auth"]["requests"], 1)
+        self.assertEqual(routes["GET /auth"]["retries"], 1)
+        self.assertDictEqual(routes["GET /auth"]["errors"], {"503": 1})
+        self.assertDictEqual(routes["POST /data/exists"]["errors"], {"404": 1})
+        self.assertGreater(routes["POST /data/exists"]["bytes_sent"], 0)
+        self.assertEqual(routes["GET /auth"]["latency"]["count"], 1)
+
+    def test_transfers(self):
+        path = os.path.join(self._tmpdir.name, "cloud.laz")
+        with open(path, "wb") as f:
+            f.write(os.urandom(200 * 1024))
+
+        self._client.upload(path, "cloud.laz")
+        self._client.download("cloud.laz", path + ".copy")
+
+        transfers = self._client.metrics.snapshot()["transfers"]
+
+        self.assertEqual(transfers["upload"]["parts"], 4)
+        self.assertEqual(transfers["upload"]["part_bytes"], 200 * 1024)
+        self.assertEqual(transfers["upload"]["files"], 1)
+        self.assertEqual(transfers["download"]["file_bytes"], 200 * 1024)
+
+        exported = self._client.metrics.to_prometheus()
+        self.assertIn('tcp_requests_total{method="POST",route="/data/upload/multipart"} 1', exported)
+        self.assertEqual(exported.count("# TYPE tcp_request_duration_seconds histogram"), 1)
+        self.assertIn("upload", json.loads(self._client.metrics.to_json())["transfers"])
+
+
+if __name__ == "__main__":
+    unittest.main()
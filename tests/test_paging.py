@@ -0,0 +1,52 @@
+import itertools
+import unittest
+import tcp
+from .stub import StubAPI
+
+
+class PagingTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._client = tcp.client(host=self._stub.host, token="stub")
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+
+    def count_pages(self):
+        return len(
+            [rr for rr in self._stub.requests if rr[1].startswith("/v1/data")]
+        )
+
+    def test_iter_data(self):
+        uris = [f"tiles/{ii:03d}.laz" for ii in range(25)]
+        self._stub.objects.update({uu: b"" for uu in uris + ["other.laz"]})
+
+        self.assertListEqual(
+            list(self._client.iter_data(prefix="tiles/", page_size=10)), uris
+        )
+        self.assertEqual(self.count_pages(), 3)
+
+        # pages are fetched lazily, one ahead of the caller
+        del self._stub.requests[:]
+        it = self._client.iter_data(prefix="tiles/", page_size=5)
+        self.assertListEqual(list(itertools.islice(it, 3)), uris[:3])
+        self.assertLessEqual(self.count_pages(), 2)
+        it.close()
+
+        self.assertListEqual(list(self._client.iter_data(prefix="nothing/")), [])
+
+    def test_iter_processes(self):
+        self._stub.processes = [{"id": ii, "state": "dead"} for ii in range(7)]
+
+        self.assertListEqual(
+            [pp["id"] for pp in self._client.iter_processes(page_size=3)],
+            list(range(7)),
+        )
+        self.assertEqual(
+            len([rr for rr in self._stub.requests if "processes" in rr[1]]), 3
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
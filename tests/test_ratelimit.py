@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+import tcp
+from tcp.ratelimit import RateLimiter
+from .stub import StubAPI
+
+try:
+    import aiohttp
+    import tcp.aio
+except ImportError:
+    aiohttp = None
+
+
+def _shared_worker(path, n):
+    limiter = RateLimiter(requests_per_second=20, burst=0.05, shared_path=path)
+    for _ in range(n):
+        limiter.acquire()
+
+
+class RateLimitTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._stub.stop()
+        self._tmpdir.cleanup()
+
+    def test_requests_per_second(self):
+        limiter = RateLimiter(requests_per_second=50, burst=0.1)
+
+        with tcp.client(host=self._stub.host, token="stub", rate_limiter=limiter) as client:
+            start = time.perf_counter()
+            for _ in range(15):
+                client.query().auth.get()
+            elapsed = time.perf_counter() - start
+
+        # 5 requests of burst, then 10 at 50 per second
+        self.assertGreater(elapsed, 0.18)
+
+    def test_bytes_per_second(self):
+        limiter = RateLimiter(bytes_per_second=10000, burst=0.1)
+
+        self.assertEqual(limiter.reserve(requests=0, nbytes=1000), 0)
+        self.assertAlmostEqual(limiter.reserve(requests=0, nbytes=2000), 0.2, places=2)
+
+    def test_bytes_per_second_acquire(self):
+        limiter = RateLimiter(bytes_per_second=1000, burst=1.0)
+
+        start = time.perf_counter()
+        for _ in range(5):
+            limiter.release(limiter.acquire(), nbytes=1000)
+        elapsed = time.perf_counter() - start
+
+        # 1000 bytes of burst, then each call waits for the debt of the one before
+        self.assertGreater(elapsed, 2.9)
+
+    def test_max_in_flight(self):
+        limiter = RateLimiter(max_in_flight=2)
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow(req, body):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return req._send(200, {"id": "stub"})
+
+        self._stub.routes[("GET", "/v1/auth")] = slow
+
+        with tcp.client(host=self._stub.host, token="stub", rate_limiter=limiter) as client:
+            threads = [
+                threading.Thread(target=client.query().auth.get) for _ in range(8)
+            ]
+            for tt in threads:
+                tt.start()
+            for tt in threads:
+                tt.join()
+
+        self.assertEqual(peak[0], 2)
+
+    @unittest.skipIf(not hasattr(os, "fork"), "needs fork")
+    def test_shared(self):
+        path = os.path.join(self._tmpdir.name, "limits")
+        ctx = multiprocessing.get_context("fork")
+
+        start = time.perf_counter()
+        procs = [ctx.Process(target=_shared_worker, args=(path, 3)) for _ in range(3)]
+        for pp in procs:
+            pp.start()
+        for pp in procs:
+            pp.join()
+        elapsed = time.perf_counter() - start
+
+        # 9 requests shared at 20 per second
+        self.assertGreater(elapsed, 0.35)
+
+        limiter = RateLimiter(max_in_flight=1, shared_path=path)
+        other = RateLimiter(max_in_flight=1, shared_path=path)
+        slot = limiter.acquire()
+        self.assertIsNone(other._try_enter())
+        limiter.release(slot)
+        other.release(other.acquire())
+
+    @unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+    def test_aio(self):
+        limiter = RateLimiter(requests_per_second=50, burst=0.1)
+
+        async def main():
+            async with tcp.aio.client(
+                host=self._stub.host, token="stub", rate_limiter=limiter
+            ) as cc:
+                start = time.perf_counter()
+                await asyncio.gather(*[cc.query().auth.get() for _ in range(15)])
+                return time.perf_counter() - start
+
+        self.assertGreater(asyncio.run(main()), 0.18)
+
+
+if __name__ == "__main__":
+    unittest.main()
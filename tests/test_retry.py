@@ -0,0 +1,95 @@
+import requests
+import time
+import unittest
+import tcp
+from email.utils import formatdate
+from tcp.retry import RetryBudget, RetryPolicy
+from .stub import StubAPI
+
+
+class FakeResponse(object):
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RetryTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+
+    def tearDown(self):
+        self._stub.stop()
+
+    def failing_route(self, statuses, headers=None):
+        calls = []
+
+        def route(req, body):
+            calls.append(1)
+            if len(calls) <= len(statuses):
+                return req._send(statuses[len(calls) - 1], {"error": "x"}, headers)
+            return req._send(200, {"id": "stub"})
+
+        self._stub.routes[("GET", "/v1/auth")] = route
+        return calls
+
+    def test_delays(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+
+        for retry in range(6):
+            self.assertLessEqual(policy.delay(retry), min(10, 2**retry))
+
+        self.assertEqual(RetryPolicy(jitter=False, max_delay=10).delay(5), 10)
+        self.assertEqual(policy.delay(0, FakeResponse({"Retry-After": "3"})), 3)
+        self.assertEqual(policy.delay(0, FakeResponse({"Retry-After": "300"})), 10)
+
+        later = formatdate(timeval=time.time() + 5, usegmt=True)
+        self.assertTrue(3 <= policy.delay(0, FakeResponse({"Retry-After": later})) <= 5)
+
+    def test_should_retry(self):
+        policy = RetryPolicy(max_retries=3)
+
+        self.assertTrue(policy.should_retry("POST", 0, 503))
+        self.assertTrue(policy.should_retry("POST", 0, 429))
+        self.assertFalse(policy.should_retry("POST", 0, 404))
+        self.assertFalse(policy.should_retry("POST", 2, 503))
+        self.assertTrue(policy.should_retry("GET", 0, error=ConnectionError()))
+        self.assertFalse(policy.should_retry("POST", 0, error=ConnectionError()))
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=2)
+
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_client(self):
+        calls = self.failing_route([503, 429], {"Retry-After": "0"})
+        retry = RetryPolicy(base_delay=0)
+
+        with tcp.client(host=self._stub.host, token="stub", retry=retry) as client:
+            self.assertDictEqual(client.query().auth.get(), {"id": "stub"})
+        self.assertEqual(len(calls), 3)
+
+        calls = self.failing_route([503] * 10)
+        retry = RetryPolicy(base_delay=0, budget=RetryBudget(min_per_second=0, capacity=2))
+
+        with tcp.client(host=self._stub.host, token="stub", retry=retry) as client:
+            with self.assertRaises(tcp.exceptions.HttpServerError):
+                client.query().auth.get()
+        self.assertEqual(len(calls), 3)
+
+    def test_connection_errors(self):
+        retry = RetryPolicy(base_delay=0, max_retries=3)
+        host = self._stub.host
+        self._stub.stop()
+
+        with tcp.client(host=host, token="stub", retry=retry) as client:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                client.query().auth.get()
+
+
+if __name__ == "__main__":
+    unittest.main()
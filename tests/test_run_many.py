@@ -0,0 +1,68 @@
+import time
+import unittest
+import tcp
+from tcp.ratelimit import RateLimiter
+from .stub import StubAPI
+
+
+class RunManyTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._client = tcp.client(host=self._stub.host, token="stub")
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+
+    def test_run_many(self):
+        bodies = [{"inputs": {"n": ii}} for ii in range(50)]
+        tags = [f"sweep-{ii}" for ii in range(50)]
+
+        pids = dict(
+            self._client.run_many("test", "helloworld", bodies, max_concurrency=8, tags=tags)
+        )
+
+        self.assertEqual(sorted(pids.values()), list(range(1, 51)))
+        self.assertEqual(sorted(pids), sorted(tags))
+
+        for run in self._stub.runs:
+            self.assertEqual(run["tags"], [f"sweep-{run['inputs']['n']}"])
+
+        # tag defaults to the index of the body
+        keys = [key for key, _ in self._client.run_many("test", "helloworld", bodies[:5])]
+        self.assertEqual(sorted(keys), list(range(5)))
+
+    def test_concurrency(self):
+        def slow(req, body):
+            time.sleep(0.05)
+            return self._stub._run(req, body)
+
+        self._stub.prefix_routes.insert(0, ("POST", "/v1/app/", slow))
+        bodies = ({"inputs": {}} for _ in range(40))
+
+        start = time.perf_counter()
+        self.assertEqual(
+            len(list(self._client.run_many("test", "helloworld", bodies, max_concurrency=10))),
+            40,
+        )
+        self.assertLess(time.perf_counter() - start, 1)
+
+        limiter = RateLimiter(requests_per_second=50, burst=0.1)
+        start = time.perf_counter()
+        list(self._client.run_many("test", "helloworld", [{}] * 15, rate_limiter=limiter))
+        self.assertGreater(time.perf_counter() - start, 0.18)
+
+    def test_errors(self):
+        with self.assertRaises(tcp.exceptions.HttpClientError):
+            list(self._client.run_many("test", "unlicensed", [{}] * 3))
+
+        results = list(
+            self._client.run_many("test", "unlicensed", [{}] * 3, return_exceptions=True)
+        )
+        self.assertEqual(len(results), 3)
+        for _, err in results:
+            self.assertIsInstance(err, tcp.exceptions.HttpClientError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import unittest
+import tcp
+from slumber.serialize import JsonSerializer
+from tcp.clientAPI import _serializer_for
+from tcp.json_serializer import FastJsonSerializer
+from .stub import StubAPI
+
+
+class SerializerTestCase(unittest.TestCase):
+    def test_same_results(self):
+        fast, slow = FastJsonSerializer(), JsonSerializer()
+
+        for doc in [
+            b'{"a": [1, 2.5, "\\u00e9", null, true], "b": {"c": {}}}',
+            b"[NaN, 1]",
+        ]:
+            self.assertEqual(repr(fast.loads(doc)), repr(slow.loads(doc)))
+
+        for data in [{"a": [1, 2.5, None]}, {1: "int key"}, [2**70]]:
+            self.assertEqual(json.loads(fast.dumps(data)), json.loads(slow.dumps(data)))
+
+        for data in [[float("nan"), 1], {"a": float("inf")}]:
+            self.assertEqual(fast.dumps(data), slow.dumps(data))
+
+        with self.assertRaises(ValueError):
+            fast.loads(b"{not json")
+
+    def test_content_types(self):
+        with StubAPI() as stub:
+            client = tcp.client(host=stub.host, token="stub")
+            serializer = client._serializer
+
+            json_ = _serializer_for(serializer, "application/json; charset=utf-8")
+            self.assertIsInstance(json_, FastJsonSerializer)
+            self.assertIs(_serializer_for(serializer, "application/json; charset=utf-8"), json_)
+            self.assertIsNone(_serializer_for(serializer, "application/octet-stream"))
+
+            stub.routes[("GET", "/v1/auth")] = lambda req, body: req._send(200, b"\x00\x01")
+            self.assertEqual(client.query().auth.get(), b"\x00\x01")
+            self.assertDictEqual(client.query().app.get(), {"test": ["helloworld"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import tcp
+from concurrent.futures import ThreadPoolExecutor
+from .stub import StubAPI
+
+
+class SessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._client = tcp.client(host=self._stub.host, token="stub")
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+
+    def test_queries_share_session(self):
+        self.assertIs(
+            self._client.query()._store["session"],
+            self._client.query()._store["session"],
+        )
+
+    def test_connection_reused(self):
+        for _ in range(20):
+            self._client.query().auth.get()
+
+        self.assertEqual(self._stub.connections, 1)
+
+    def test_session_rebuilt_on_new_token(self):
+        session = self._client.query()._store["session"]
+        self._client.query().auth.get()
+        self._client.token = "other"
+
+        new_session = self._client.query()._store["session"]
+
+        self.assertIsNot(session, new_session)
+        self.assertEqual(new_session.headers["Authorization"], "Bearer other")
+        # the connections of the previous session are closed
+        self.assertEqual(len(session.get_adapter(self._stub.host).poolmanager.pools), 0)
+
+    def test_threaded_queries(self):
+        with ThreadPoolExecutor(4) as pool:
+            resps = list(pool.map(lambda _: self._client.query().auth.get(), range(40)))
+
+        self.assertEqual(len(resps), 40)
+        self.assertLessEqual(self._stub.connections, self._client.pool_size)
+
+    def test_no_keep_alive(self):
+        client = tcp.client(host=self._stub.host, token="stub", keep_alive=False)
+
+        for _ in range(3):
+            client.query().auth.get()
+
+        self.assertEqual(self._stub.connections, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import re
+import threading
+import unittest
+from tcp.track_usage import TrackUsage
+
+
+class EndpointsStub(object):
+    def _get_endpoints(self):
+        return [
+            {"endpoint": "/auth", "methods": ["GET"]},
+            {"endpoint": "/app/<string:domain>/<string:app>", "methods": ["GET"]},
+            {"endpoint": "/app/process/<int:pid>/<float:v>", "methods": ["GET"]},
+            {"endpoint": "/data/<path:uri>", "methods": ["POST"]},
+            {"endpoint": "/data/download", "methods": ["POST"]},
+        ]
+
+
+class TrackUsageTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tracker = TrackUsage()
+        self._saved = getattr(self._tracker, "uses", None)
+        self._tracker.uses = {}
+        self._tracker.init(EndpointsStub())
+
+    def tearDown(self):
+        self._tracker.uses = self._saved
+        if self._saved is None:
+            del self._tracker.uses
+
+    def test_same_counts_as_a_scan(self):
+        keys = [
+            "/auth+GET",
+            "/auth+POST",
+            "/app/a/b+GET",
+            "/app/ab/b+GET",
+            "/app/process/12/3.5+GET",
+            "/data/download+POST",
+            "/data/a/b.laz+POST",
+        ]
+
+        expected = dict.fromkeys(self._tracker.uses, 0)
+        for key in keys:
+            for pattern in expected:
+                if re.fullmatch(pattern, key):
+                    expected[pattern] += 1
+                    break
+
+        for key in keys:
+            self._tracker.count(key)
+
+        self.assertDictEqual(self._tracker.uses, expected)
+
+    def test_threads(self):
+        def count():
+            for _ in range(1000):
+                self._tracker.count("/auth+GET")
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for tt in threads:
+            tt.start()
+        for tt in threads:
+            tt.join()
+
+        self.assertEqual(self._tracker.uses["^\\/auth\\+GET$"], 8000)
+
+
+if __name__ == "__main__":
+    unittest.main()
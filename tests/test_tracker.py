@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+import tcp
+from .stub import StubAPI
+
+
+class TrackerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._client = tcp.client(host=self._stub.host, token="stub")
+        self._stub.processes = [{"id": str(ii), "state": "pending"} for ii in range(30)]
+        self._stub.prefix_routes.append(("GET", "/v1/app/process/", self.process))
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+
+    def process(self, req, body):
+        pid = req.path.split("?")[0].rstrip("/").split("/")[-1]
+        if pid == "unknown":
+            return req._send(404, {"error": "no such process"})
+        state = "running" if pid == "unlisted" else "dead"
+        return req._send(200, {"id": pid, "state": state})
+
+    def set_state(self, pids, state):
+        for pp in self._stub.processes:
+            if pp["id"] in pids:
+                pp["state"] = state
+
+    def calls(self, prefix):
+        return len([rr for rr in self._stub.requests if rr[1].startswith(prefix)])
+
+    def test_refresh(self):
+        tracker = self._client.track_processes(
+            [str(ii) for ii in range(20)],
+            intervals={"pending": 0.0, "running": 0.0},
+            backoff=1,
+            page_size=10,
+        )
+        seen = []
+        tracker.on_transition(
+            lambda pid, previous, pp: seen.append((pid, previous, pp["state"]))
+        )
+
+        self.assertEqual(len(tracker.refresh()), 20)
+        # one listing of 2 pages, plus maybe the prefetch of the third one
+        self.assertLessEqual(self.calls("/v1/app/process"), 3)
+        self.assertEqual(set(tracker.states.values()), {"pending"})
+
+        # no change, no transition
+        self.assertEqual(tracker.refresh(), [])
+
+        self.set_state({"3", "4"}, "running")
+        self.set_state({"5"}, "dead")
+        self.assertEqual(sorted(tt[0] for tt in tracker.refresh()), ["3", "4", "5"])
+        self.assertIn(("5", "pending", "dead"), seen)
+        self.assertNotIn("5", tracker.pending)
+
+        # processes missing from the listing are asked one by one
+        tracker.add("missing")
+        del self._stub.requests[:]
+        tracker.refresh()
+        self.assertEqual(tracker.states["missing"], "dead")
+        self.assertEqual(self.calls("/v1/app/process/missing"), 1)
+
+        self.set_state({str(ii) for ii in range(20)}, "failed-oom")
+        self.assertTrue(tracker.run(timeout=5))
+        self.assertEqual(tracker.pending, [])
+
+    def test_unlisted(self):
+        tracker = self._client.track_processes(
+            ["1", "unlisted", "unknown"], intervals={"pending": 0.0, "running": 0.0}
+        )
+
+        tracker.refresh()
+        self.assertEqual(tracker.states["unlisted"], "running")
+        self.assertEqual(tracker.missing, {"unknown"})
+        self.assertNotIn("unknown", tracker.pending)
+
+        # a process missing from the listing is not searched there anymore
+        del self._stub.requests[:]
+        tracker.remove("1")
+        tracker.refresh(force=True)
+        self.assertEqual(self.calls("/v1/app/processes"), 0)
+        self.assertEqual(self.calls("/v1/app/process/unlisted"), 1)
+
+    def test_intervals(self):
+        tracker = self._client.track_processes(
+            ["1", "2"], intervals={"pending": 0.2, "running": 60}, backoff=2
+        )
+        tracker.refresh()
+        self.assertAlmostEqual(tracker.next_refresh(), 0.2, places=1)
+
+        self.set_state({"1"}, "running")
+        tracker.refresh(force=True)
+        # "2" is still pending and checked again, its interval growing
+        self.assertAlmostEqual(tracker.next_refresh(), 0.4, places=1)
+
+        del self._stub.requests[:]
+        self.assertEqual(tracker.refresh(), [])
+        self.assertEqual(self._stub.requests, [])
+
+    def test_events(self):
+        tracker = self._client.track_processes(
+            ["1"], intervals={"pending": 0.01, "running": 0.01}
+        )
+        states = iter(["running", "dead"])
+
+        async def main():
+            out = []
+            async for pid, previous, pp in tracker.events():
+                out.append(pp["state"])
+                self.set_state({"1"}, next(states, "dead"))
+            return out
+
+        self.assertEqual(asyncio.run(main()), ["pending", "running", "dead"])
+
+
+if __name__ == "__main__":
+    unittest.main()
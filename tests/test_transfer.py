@@ -0,0 +1,341 @@
+import hashlib
+import os
+import random
+import tempfile
+import time
+import unittest
+import tcp
+from tcp.digest import OrderedHasher
+from tcp.executor import make_executor
+from tcp.upload import FileSlice
+from .stub import StubAPI
+
+
+class TransferTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._stub.part_size = 64 * 1024
+        self._client = tcp.client(host=self._stub.host, token="stub")
+        self._tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._client.close()
+        self._stub.stop()
+        self._tmpdir.cleanup()
+
+    def create_temp_file(self, size, name="cloud.laz"):
+        path = os.path.join(self._tmpdir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    def test_file_slice(self):
+        path = self.create_temp_file(1000)
+
+        with open(path, "rb") as f:
+            content = f.read()
+
+        with FileSlice(path, 300, 500, block_size=64) as ss:
+            self.assertEqual(len(ss), 500)
+            self.assertEqual(len(ss.read()), 64)
+            ss.seek(0)
+            self.assertEqual(b"".join(ss), content[300:800])
+
+        with FileSlice(path, 900, 500) as ss:
+            self.assertEqual(len(ss), 100)
+            self.assertEqual(b"".join(ss), content[900:])
+
+    def test_ordered_hasher(self):
+        path = self.create_temp_file(10000)
+
+        with open(path, "rb") as f:
+            content = f.read()
+
+        blocks = [[off, content[off : off + 100]] for off in range(0, 10000, 100)]
+        random.shuffle(blocks)
+
+        for buffer_size in [0, 2000, 10000]:
+            hasher = OrderedHasher(path, len(content), buffer_size=buffer_size)
+            for off, data in blocks + blocks[:10]:
+                hasher.feed(off, data)
+            self.assertEqual(hasher.hexdigest(), hashlib.md5(content).hexdigest())
+
+    def test_ordered_hasher_catch_up(self):
+        path = self.create_temp_file(10000)
+
+        with open(path, "rb") as f:
+            content = f.read()
+
+        blocks = [[off, content[off : off + 100]] for off in range(0, 10000, 100)]
+        hasher = OrderedHasher(path, len(content), buffer_size=2000, read_size=1000)
+
+        # 5000:7000 is buffered, then 100:10000 is read back once 0 comes in
+        for off, data in blocks[50:70] + [[100, content[100:]]] + blocks[:1]:
+            hasher.feed(off, data)
+
+        deadline = time.time() + 10
+        while hasher.position < len(content) and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(hasher.position, len(content))
+        self.assertEqual(hasher._pending_size, 0)
+        self.assertEqual(hasher.hexdigest(), hashlib.md5(content).hexdigest())
+
+        hasher = OrderedHasher.for_parts(path, 10**12, 100 * 1024 * 1024, 4)
+        self.assertEqual(hasher.buffer_size, 400 * 1024 * 1024)
+
+    def test_multipart_upload(self):
+        path = self.create_temp_file(300 * 1024 + 17)
+
+        self._client.upload(path, "cloud.laz")
+
+        with open(path, "rb") as f:
+            self.assertEqual(self._stub.objects["cloud.laz"], f.read())
+
+    def test_multipart_upload_dropped(self):
+        path = self.create_temp_file(300 * 1024)
+        self._stub.dropped_parts = 2
+
+        self._client.upload(path, "cloud.laz", delay_between_tries=0)
+
+        with open(path, "rb") as f:
+            self.assertEqual(self._stub.objects["cloud.laz"], f.read())
+
+    def test_resume_upload(self):
+        path = self.create_temp_file(300 * 1024)
+        journal_dir = os.path.join(self._tmpdir.name, "journals")
+
+        self._stub.broken_parts = 2
+        with self.assertRaises(tcp.exceptions.UploadError):
+            self._client.upload(
+                path, "cloud.laz", num_tries=1, resume=True, journal_dir=journal_dir
+            )
+        self.assertEqual(len(os.listdir(journal_dir)), 1)
+
+        # The upload, then one line per completed part
+        with open(os.path.join(journal_dir, os.listdir(journal_dir)[0])) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 1 + 3)
+        self.assertNotIn("parts", lines[0])
+
+        del self._stub.requests[:]
+        self._client.upload(path, "cloud.laz", resume=True, journal_dir=journal_dir)
+
+        with open(path, "rb") as f:
+            self.assertEqual(self._stub.objects["cloud.laz"], f.read())
+        self.assertListEqual(os.listdir(journal_dir), [])
+
+        parts = [rr for rr in self._stub.requests if rr[0] == "PUT"]
+        self.assertEqual(len(parts), 2)
+
+    def test_executors(self):
+        with make_executor("thread", 3) as executor:
+            self.assertEqual(executor.max_concurrency, 3)
+            self.assertListEqual(
+                sorted(executor.imap_unordered(lambda x: x + 1, range(10))),
+                list(range(1, 11)),
+            )
+
+        for backend in ["process", "asyncio"]:
+            with self.assertRaises(ValueError):
+                make_executor(backend)
+
+    def test_directory_upload(self):
+        files = {
+            "tiles/a.laz": 100 * 1024,
+            "tiles/b.laz": 10,
+            "tiles/sub/c.laz": 300 * 1024,
+            "tiles/sub/deeper/d.laz": 0,
+        }
+        content = {}
+
+        for name, size in files.items():
+            with open(self.create_temp_file(size, name), "rb") as f:
+                content["dest/" + name] = f.read()
+
+        with make_executor("thread", 2) as executor:
+            summary = self._client.upload(
+                os.path.join(self._tmpdir.name, "tiles"),
+                "dest",
+                executor=executor,
+                singlepart_threshold=128 * 1024,
+            )
+
+        self.assertDictEqual(self._stub.objects, content)
+        self.assertNotIn(("POST", "/v1/data/exists"), self._stub.requests)
+        self.assertEqual(summary["files"], 4)
+        self.assertEqual(summary["singlepart"], 3)
+        self.assertEqual(summary["multipart"], 1)
+        self.assertEqual(summary["bytes"], sum(files.values()))
+
+    def test_directory_upload_failures(self):
+        self.create_temp_file(10, "tiles/a.laz")
+        self.create_temp_file(200 * 1024, "tiles/b.laz")
+        self._stub.objects["dest/tiles/a.laz"] = b""
+        self._stub.broken_parts = 10
+
+        with self.assertRaises(tcp.exceptions.UploadError) as ctx:
+            self._client.upload(
+                os.path.join(self._tmpdir.name, "tiles"),
+                "dest",
+                delay_between_tries=0,
+                singlepart_threshold=64 * 1024,
+            )
+
+        self.assertEqual(len(ctx.exception.summary["failed"]), 2)
+        self.assertDictEqual(self._stub.uploads, {})
+
+    def test_directory_upload_group(self):
+        self.create_temp_file(10, "tiles/a.laz")
+        path = self.create_temp_file(10, "tiles/b.laz")
+        self._stub.objects["unit_tests@dest/tiles/a.laz"] = b""
+        self._stub.objects["dest/tiles/b.laz"] = b""
+
+        with self.assertRaises(tcp.exceptions.UploadError) as ctx:
+            self._client.upload(
+                os.path.join(self._tmpdir.name, "tiles"), "unit_tests@dest"
+            )
+
+        self.assertEqual(len(ctx.exception.summary["failed"]), 1)
+        self.assertEqual(self._stub.objects["unit_tests@dest/tiles/a.laz"], b"")
+        with open(path, "rb") as f:
+            self.assertEqual(self._stub.objects["unit_tests@dest/tiles/b.laz"], f.read())
+        self.assertNotIn(("POST", "/v1/data/exists"), self._stub.requests)
+
+    def test_directory_upload_singlepart_retries(self):
+        path = self.create_temp_file(1000, "tiles/a.laz")
+        self._stub.broken_objects = 2
+
+        summary = self._client.upload(
+            os.path.join(self._tmpdir.name, "tiles"), "dest", delay_between_tries=0
+        )
+
+        with open(path, "rb") as f:
+            self.assertEqual(self._stub.objects["dest/tiles/a.laz"], f.read())
+        self.assertEqual(summary["singlepart"], 1)
+
+        self._stub.broken_objects = 3
+        with self.assertRaises(tcp.exceptions.UploadError):
+            self._client.upload(
+                os.path.join(self._tmpdir.name, "tiles"),
+                "dest",
+                overwrite=True,
+                delay_between_tries=0,
+            )
+
+    def test_directory_upload_resume_complete(self):
+        path = self.create_temp_file(200 * 1024, "tiles/a.laz")
+        journal_dir = os.path.join(self._tmpdir.name, "journals")
+        complete = self._stub.routes[("POST", "/v1/data/upload/multipart/complete")]
+
+        self._stub.routes[("POST", "/v1/data/upload/multipart/complete")] = (
+            lambda req, body: req._send(400, {"error": "unavailable"})
+        )
+        with self.assertRaises(tcp.exceptions.UploadError):
+            self._client.upload(
+                os.path.join(self._tmpdir.name, "tiles"),
+                "dest",
+                resume=True,
+                journal_dir=journal_dir,
+                delay_between_tries=0,
+            )
+        self.assertEqual(len(os.listdir(journal_dir)), 1)
+
+        self._stub.routes[("POST", "/v1/data/upload/multipart/complete")] = complete
+        del self._stub.requests[:]
+        summary = self._client.upload(
+            os.path.join(self._tmpdir.name, "tiles"),
+            "dest",
+            resume=True,
+            overwrite=True,
+            journal_dir=journal_dir,
+        )
+
+        with open(path, "rb") as f:
+            self.assertEqual(self._stub.objects["dest/tiles/a.laz"], f.read())
+        self.assertEqual(summary["files"], 1)
+        self.assertListEqual(os.listdir(journal_dir), [])
+        self.assertEqual(len([rr for rr in self._stub.requests if rr[0] == "PUT"]), 0)
+
+    def check_download(self, content, **kwargs):
+        self._stub.objects["cloud.laz"] = content
+        path = os.path.join(self._tmpdir.name, "download.laz")
+
+        self._client.download(
+            "cloud.laz", path, delay_between_tries=0, ignore_md5=False, **kwargs
+        )
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_download(self):
+        self.check_download(os.urandom(1000))
+
+    def test_parallel_download(self):
+        content = os.urandom(5 * 1024 * 1024 + 3)
+
+        self.check_download(content, num_connections=4)
+        ranges = [rr for rr in self._stub.requests if rr[1].startswith("/s3/")]
+        self.assertEqual(len(ranges), 1 + 4)
+
+        self._stub.broken_downloads = 2
+        self.check_download(content, num_connections=4)
+
+        self._stub.support_range = False
+        self.check_download(content, num_connections=4)
+
+        self.check_download(b"", num_connections=4)
+
+    def test_download_md5(self):
+        content = os.urandom(3 * 1024 * 1024)
+
+        self.check_download(content, num_connections=3, verify_after_write=True)
+        self.check_download(content, verify_after_write=True)
+
+        self._stub.routes[("POST", "/v1/data/download")] = lambda req, body: req._send(
+            200,
+            {
+                "cloud.laz": f"{self._stub.url}/s3/objects/cloud.laz?v=0",
+                "md5sum": "0" * 32,
+            },
+        )
+
+        for num_connections in [1, 3]:
+            with self.assertRaises(tcp.exceptions.DownloadError):
+                self.check_download(content, num_connections=num_connections)
+
+    def test_resume_download(self):
+        content = os.urandom(4 * 1024 * 1024)
+        path = os.path.join(self._tmpdir.name, "download.laz")
+        self._stub.objects["cloud.laz"] = content
+
+        self._stub.broken_downloads = 1
+        with self.assertRaises(tcp.exceptions.DownloadError):
+            self._client.download(
+                "cloud.laz", path, num_tries=1, num_connections=4, resume=True
+            )
+        self.assertTrue(os.path.exists(path + ".tcpdl"))
+
+        del self._stub.requests[:]
+        self._stub.expired_before = self._stub.url_version + 2
+        self._client.download("cloud.laz", path, resume=True, delay_between_tries=0)
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(os.path.exists(path + ".tcpdl"))
+
+        # one refused probe, one probe with a fresh link, the missing segment
+        ranges = [rr for rr in self._stub.requests if rr[1].startswith("/s3/")]
+        self.assertEqual(len(ranges), 3)
+
+    def test_upload_no_overwrite(self):
+        path = self.create_temp_file(10)
+        self._stub.objects["cloud.laz"] = b""
+
+        with self.assertRaises(tcp.exceptions.UploadError):
+            self._client.upload(path, "cloud.laz")
+
+
+if __name__ == "__main__":
+    unittest.main()
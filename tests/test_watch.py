@@ -0,0 +1,144 @@
+import unittest
+import tcp
+from .stub import StubAPI, StubSocket
+
+
+class WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._sock = StubSocket().start()
+        self.states = {
+            "1": ["pending", "pending", "running", "running", "running", "dead"],
+            "2": ["pending", "failed-oom"],
+        }
+        self.calls = []
+
+        self._stub.prefix_routes.append(("GET", "/v1/app/process/", self.http_process))
+        self._sock.actions["app_process_get"] = lambda body: self.process(body["id"])
+
+    def tearDown(self):
+        self._sock.stop()
+        self._stub.stop()
+
+    def process(self, pid):
+        self.calls.append(pid)
+        states = self.states[pid]
+        state = states.pop(0) if len(states) > 1 else states[0]
+        return {"id": pid, "state": state, "errors": ""}
+
+    def http_process(self, req, body):
+        pid = req.path.split("?")[0].rstrip("/").split("/")[-1]
+        return req._send(200, self.process(pid))
+
+    def http_calls(self):
+        return [rr for rr in self._stub.requests if rr[1].startswith("/v1/app/process/")]
+
+    def watch(self, client, pids, **kwargs):
+        kwargs.setdefault("min_interval", 0.01)
+        kwargs.setdefault("transports", ["polling"])
+        return [
+            (pid, pp["state"]) for pid, pp in client.watch_processes(pids, **kwargs)
+        ]
+
+    def test_polling(self):
+        client = tcp.client(host=self._stub.host, token="stub")
+        client.websocket_host = None
+
+        self.assertListEqual(
+            [pp["state"] for pp in client.watch_process(1, min_interval=0.01)],
+            ["pending", "running", "dead"],
+        )
+        self.assertEqual(len(self.http_calls()), 6)
+
+    def test_websocket(self):
+        client = tcp.client(
+            host=self._stub.host, token="stub", websocket_host=self._sock.url
+        )
+
+        events = self.watch(client, ["1", "2"])
+
+        self.assertListEqual(
+            [ee for ee in events if ee[0] == "1"],
+            [("1", "pending"), ("1", "running"), ("1", "dead")],
+        )
+        self.assertListEqual(
+            [ee for ee in events if ee[0] == "2"], [("2", "pending"), ("2", "failed-oom")]
+        )
+        self.assertEqual(self.http_calls(), [])
+        self.assertEqual(self._sock.token, "Bearer stub")
+
+    def test_pushed(self):
+        client = tcp.client(
+            host=self._stub.host, token="stub", websocket_host=self._sock.url
+        )
+        self.states["1"] = ["running"]
+
+        it = client.watch_processes(["1"], min_interval=60, transports=["polling"])
+        self.assertEqual(next(it)[1]["state"], "running")
+
+        self._sock.push(
+            {"action": "app_process", "state": "failed", "response": {"id": "1"}}
+        )
+        self._sock.push(
+            {"action": "app_process", "state": "done", "response": {"id": "1", "state": "dead"}}
+        )
+        self.assertEqual(next(it)[1]["state"], "dead")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.http_calls(), [])
+        it.close()
+
+    def test_ended_before_fallback(self):
+        import asyncio
+        import json
+        import threading
+
+        client = tcp.client(
+            host=self._stub.host, token="stub", websocket_host=self._sock.url
+        )
+        self.states["1"] = ["pending", "dead"]
+
+        async def process(body):
+            if body["id"] == "2":
+                # The process ends while its request stays unanswered
+                message = {
+                    "action": "app_process",
+                    "state": "done",
+                    "response": {"id": "2", "state": "dead"},
+                }
+                await self._sock.sio.emit("json", json.dumps(message))
+                await asyncio.sleep(5)
+            return self.process(body["id"])
+
+        self._sock.actions["app_process_get"] = process
+
+        events = []
+        watcher = threading.Thread(
+            target=lambda: events.extend(self.watch(client, ["1", "2"], reply_timeout=0.5)),
+            daemon=True,
+        )
+        watcher.start()
+        watcher.join(timeout=10)
+
+        self.assertFalse(watcher.is_alive())
+        self.assertIn(("2", "dead"), events)
+        self.assertEqual(events[-1], ("1", "dead"))
+        self.assertFalse([pp for _, pp in self.http_calls() if pp.endswith("/2")])
+
+    def test_fallback(self):
+        client = tcp.client(
+            host=self._stub.host, token="stub", websocket_host=self._sock.url
+        )
+        del self._sock.actions["app_process_get"]
+
+        self.assertListEqual(
+            self.watch(client, ["2"]), [("2", "pending"), ("2", "failed-oom")]
+        )
+        self.assertEqual(len(self.http_calls()), 2)
+
+        client.websocket_host = "http://127.0.0.1:1"
+        self.states["2"] = ["dead"]
+        self.assertListEqual(self.watch(client, ["2"]), [("2", "dead")])
+
+
+if __name__ == "__main__":
+    unittest.main()
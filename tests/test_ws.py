@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import unittest
+import tcp
+from tcp.retry import RetryPolicy
+from tcp.ws import WebSocketTransport, action_of
+from .stub import StubAPI, StubSocket
+
+
+class WebSocketTestCase(unittest.TestCase):
+    def setUp(self):
+        self._stub = StubAPI().start()
+        self._sock = StubSocket().start()
+        self._ws = WebSocketTransport(
+            self._sock.url, "stub", timeout=5, reconnect_delay=0, transports=["polling"]
+        )
+        self._client = tcp.client(
+            host=self._stub.host,
+            token="stub",
+            websocket=self._ws,
+            retry=RetryPolicy(base_delay=0),
+        )
+
+    def tearDown(self):
+        self._client.close()
+        self._sock.stop()
+        self._stub.stop()
+
+    def http_calls(self, path):
+        return [rr for rr in self._stub.requests if rr[1] == path]
+
+    def test_action_of(self):
+        self.assertEqual(action_of("POST", "/data/download"), "data_download_post")
+        self.assertEqual(action_of("GET", "/auth"), "auth_get")
+        self.assertIsNone(action_of("GET", "/app/process/1234"))
+        self.assertIsNone(action_of("GET", "/"))
+
+    def test_query(self):
+        self._sock.actions["data_download_post"] = lambda body: {
+            body["uri"]: "https://s3/presigned"
+        }
+        self._sock.actions["auth_get"] = lambda body: {"id": "ws", "params": body}
+
+        resp = self._client.query().data.download.post({"uri": "hello.txt"})
+        self.assertDictEqual(resp, {"hello.txt": "https://s3/presigned"})
+        self.assertDictEqual(
+            self._client.query().auth.get(verbose=1),
+            {"id": "ws", "params": {"verbose": 1}},
+        )
+        self.assertEqual(self._stub.requests, [])
+        self.assertEqual(self._sock.token, "Bearer stub")
+        self.assertEqual(self._sock.connections, 1)
+
+    def test_in_flight(self):
+        async def echo(body):
+            await asyncio.sleep(0.2)
+            return body
+
+        self._sock.actions["echo_post"] = echo
+        self._ws.actions |= {"echo_post"}
+        results = {}
+
+        def call(ii):
+            results[ii] = self._client.query().echo.post({"n": ii})
+
+        # at most 16 messages may be batched by the polling transport used here
+        start = time.perf_counter()
+        threads = [threading.Thread(target=call, args=(ii,)) for ii in range(10)]
+        for tt in threads:
+            tt.start()
+        for tt in threads:
+            tt.join()
+
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertDictEqual(results, {ii: {"n": ii} for ii in range(10)})
+        self.assertEqual(self._sock.connections, 1)
+
+    def test_fallback(self):
+        # no action, failed action, and ids in the path go over HTTP
+        self._sock.actions["app_get"] = lambda body: 1 / 0
+
+        self.assertEqual(self._client.query().auth.get()["id"], "stub")
+        self.assertDictEqual(self._client.query().app.get(), {"test": ["helloworld"]})
+        self.assertEqual(len(self.http_calls("/v1/auth")), 1)
+        self.assertEqual(len(self.http_calls("/v1/app")), 1)
+
+        # unanswered calls are sent again over HTTP
+        self._sock.actions["auth_get"] = lambda body: asyncio.sleep(10)
+        self._ws.timeout = 0.2
+
+        self.assertEqual(self._client.query().auth.get()["id"], "stub")
+
+    def test_unknown_actions(self):
+        # actions that are unknown or not idempotent never go over the websocket
+        self._sock.actions["app_test_helloworld_run_post"] = lambda body: {"id": 0}
+
+        self.assertEqual(self._client.query().app.test.helloworld.run.post({})["id"], 1)
+        self.assertEqual(len(self._stub.runs), 1)
+
+        messages = [mm["action"] for mm in self._sock.messages]
+        self.assertNotIn("app_test_helloworld_run_post", messages)
+
+    def test_reconnect(self):
+        self._sock.actions["auth_get"] = lambda body: {"id": "ws"}
+
+        self.assertEqual(self._client.query().auth.get()["id"], "ws")
+        self._sock.disconnect_all()
+
+        for _ in range(100):
+            if not self._ws.connected:
+                break
+            time.sleep(0.05)
+
+        self.assertEqual(self._client.query().auth.get()["id"], "ws")
+        self.assertEqual(self._sock.connections, 2)
+
+        self._sock.stop()
+        self.assertEqual(self._client.query().auth.get()["id"], "stub")
+
+
+if __name__ == "__main__":
+    unittest.main()